@@ -0,0 +1,256 @@
+"""
+archive.py: Index of downloaded items, to skip them in later downloads
+"""
+
+import hashlib
+import math
+import os
+import sqlite3
+import time
+from pathlib import Path
+from threading import Lock
+
+
+class DownloadArchive:
+    """
+    Archive of downloaded items as (extractor, video ID, output profile), like yt-dlp's download archive file.
+    Items are kept in an indexed SQLite table. A Bloom filter in memory answers most lookups of items that aren't in
+    the archive without touching the table, so a check takes the same time for a few items or millions.
+    New items are written in batches. The Bloom filter is saved when the archive is closed
+    """
+
+    DB_FILENAME: str = "archive.sqlite3"
+
+    # Items written at once. Also written when `DownloadArchive.flush` is called
+    BATCH_SIZE: int = 500
+
+    # Seconds after which waiting items are written, even if the batch isn't full
+    FLUSH_INTERVAL: float = 5.0
+
+    class BloomFilter:
+        """
+        Set that can give false positives but never false negatives. Uses a fixed amount of memory
+        """
+
+        def __init__(self, capacity: int, error_rate: float = 0.01, bits: bytes = None):
+            """
+            :param capacity: Number of items the filter is sized for. More items raise the error rate
+            :param error_rate: Chance of a false positive at full capacity
+            :param bits: Bits of a saved filter with the same capacity and error rate
+            """
+
+            self.capacity: int = max(capacity, 1)
+            self.error_rate: float = error_rate
+
+            # Optimal number of bits and hashes for the capacity and error rate
+            self.size: int = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+            self.hashes: int = max(round(self.size / self.capacity * math.log(2)), 1)
+
+            self.bits: bytearray = bytearray(bits) if bits else bytearray((self.size + 7) // 8)
+
+        def positions(self, key: str) -> list[int]:
+            """
+            Get the bits of a key. Two halves of one hash are combined, instead of computing a hash for each bit
+            """
+
+            digest: bytes = hashlib.blake2b(key.encode(), digest_size=16).digest()
+            h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+            return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+        def add(self, key: str) -> None:
+            for pos in self.positions(key):
+                self.bits[pos >> 3] |= 1 << (pos & 7)
+
+        def __contains__(self, key: str) -> bool:
+            return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self.positions(key))
+
+    def __init__(self, directory: str, min_capacity: int = 100_000):
+        """
+        :param directory: Directory of the archive database. Created if it doesn't exist
+        :param min_capacity: Smallest number of items the Bloom filter is sized for
+        """
+
+        self.directory: Path = Path(os.path.expandvars(os.path.expanduser(directory)))
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self.db_path: Path = self.directory / DownloadArchive.DB_FILENAME
+        self.min_capacity: int = min_capacity
+
+        # Downloads run on their own thread
+        self.lock: Lock = Lock()
+        self.db: sqlite3.Connection = sqlite3.connect(self.db_path, check_same_thread=False)
+
+        self.db.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+
+            CREATE TABLE IF NOT EXISTS items (
+                extractor TEXT NOT NULL,
+                video_id TEXT NOT NULL,
+                profile TEXT NOT NULL,
+                added INTEGER NOT NULL,
+                UNIQUE (extractor, video_id, profile)
+            );
+
+            CREATE TABLE IF NOT EXISTS bloom (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                capacity INTEGER NOT NULL,
+                error_rate REAL NOT NULL,
+                last_row INTEGER NOT NULL,
+                bits BLOB NOT NULL
+            );
+        """)
+
+        # Items waiting to be written as (extractor, video_id, profile, added)
+        self.pending: list[tuple[str, str, str, int]] = []
+        self.pending_keys: set[str] = set()
+        self.last_flush: float = time.monotonic()
+
+        self.bloom: DownloadArchive.BloomFilter = self.load_bloom()
+
+    @staticmethod
+    def profile(dwn_type: int, file_format: int, quality: str = None, outputs: list[str] = None) -> str:
+        """
+        Get the output profile of a download. The same item in another format or quality is a different item
+        :param dwn_type: Download type
+        :param file_format: File format
+        :param quality: Video quality, if chosen
+        :param outputs: Extra outputs made from each video. e.g. ['audio', 'artwork']
+        :return: Profile string. e.g. '1:1:1080p' or '1:1:+artwork+audio'
+        """
+
+        return f"{dwn_type}:{file_format}:{quality or ''}" + "".join(f"+{output}" for output in sorted(outputs or []))
+
+    @staticmethod
+    def key(extractor: str, video_id: str, profile: str) -> str:
+        """
+        Get the key of an item in the Bloom filter
+        """
+
+        return f"{extractor.lower()}\0{video_id}\0{profile}"
+
+    def row_count(self) -> int:
+        """
+        Get the rowid of the last item. Items are never deleted, so this is the number of items
+        """
+
+        return self.db.execute("SELECT COALESCE(MAX(rowid), 0) FROM items").fetchone()[0]
+
+    def load_bloom(self) -> "DownloadArchive.BloomFilter":
+        """
+        Load the saved Bloom filter. Rebuilt from the table if it is missing, out of date or full
+        """
+
+        last_row: int = self.row_count()
+        saved = self.db.execute("SELECT capacity, error_rate, last_row, bits FROM bloom WHERE id = 0").fetchone()
+
+        if saved and saved[2] == last_row and last_row <= saved[0]:
+            return DownloadArchive.BloomFilter(capacity=saved[0], error_rate=saved[1], bits=saved[3])
+
+        bloom: DownloadArchive.BloomFilter = self.build_bloom(last_row=last_row)
+        self.save_bloom(bloom=bloom, last_row=last_row)
+
+        return bloom
+
+    def build_bloom(self, last_row: int) -> "DownloadArchive.BloomFilter":
+        """
+        Build a Bloom filter from the table, with room for the archive to double before the next rebuild
+        :param last_row: Number of items in the table
+        """
+
+        bloom = DownloadArchive.BloomFilter(capacity=max(self.min_capacity, last_row * 2))
+
+        for extractor, video_id, profile in self.db.execute("SELECT extractor, video_id, profile FROM items"):
+            bloom.add(DownloadArchive.key(extractor=extractor, video_id=video_id, profile=profile))
+
+        return bloom
+
+    def save_bloom(self, bloom: "DownloadArchive.BloomFilter", last_row: int) -> None:
+        """
+        Save the Bloom filter with the rowid it is up to date with
+        """
+
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO bloom VALUES (0, ?, ?, ?, ?)",
+                            (bloom.capacity, bloom.error_rate, last_row, bytes(bloom.bits)))
+
+    def __contains__(self, item: tuple[str, str, str]) -> bool:
+        """
+        Check if an item is in the archive
+        :param item: (extractor, video ID, profile)
+        """
+
+        extractor, video_id, profile = item
+        key: str = DownloadArchive.key(extractor=extractor, video_id=video_id, profile=profile)
+
+        with self.lock:
+            if key not in self.bloom:
+                return False
+
+            if key in self.pending_keys:
+                return True
+
+            # Maybe a false positive. The unique index makes this a single lookup
+            return self.db.execute("SELECT 1 FROM items WHERE extractor = ? AND video_id = ? AND profile = ? LIMIT 1",
+                                   (extractor.lower(), video_id, profile)).fetchone() is not None
+
+    def add(self, extractor: str, video_id: str, profile: str) -> None:
+        """
+        Add an item. Written with the next batch
+        :param extractor: yt-dlp extractor key. e.g. 'Youtube'
+        :param video_id: Video ID
+        :param profile: Output profile. See `DownloadArchive.profile`
+        """
+
+        key: str = DownloadArchive.key(extractor=extractor, video_id=video_id, profile=profile)
+
+        with self.lock:
+            if key in self.pending_keys:
+                return
+
+            self.bloom.add(key)
+            self.pending.append((extractor.lower(), video_id, profile, int(time.time())))
+            self.pending_keys.add(key)
+
+            full: bool = (len(self.pending) >= DownloadArchive.BATCH_SIZE or
+                          time.monotonic() - self.last_flush >= DownloadArchive.FLUSH_INTERVAL)
+
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write the waiting items in one transaction
+        """
+
+        with self.lock:
+            self.last_flush = time.monotonic()
+
+            if not self.pending:
+                return
+
+            with self.db:
+                self.db.executemany("INSERT OR IGNORE INTO items VALUES (?, ?, ?, ?)", self.pending)
+
+            self.pending.clear()
+            self.pending_keys.clear()
+
+    def close(self) -> None:
+        """
+        Write the waiting items, save the Bloom filter and close the database.
+        If not closed, the Bloom filter is rebuilt from the table next time
+        """
+
+        self.flush()
+
+        with self.lock:
+            last_row: int = self.row_count()
+
+            # Too full for the error rate. Resize it now, so the next session can load it
+            if last_row > self.bloom.capacity:
+                self.bloom = self.build_bloom(last_row=last_row)
+
+            self.save_bloom(bloom=self.bloom, last_row=last_row)
+
+            self.db.close()
@@ -0,0 +1,311 @@
+"""
+artwork.py: Fetches thumbnails straight from playlist metadata, and tracks the progress of Artwork downloads
+"""
+
+import http.client
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import yt_dlp as yt
+
+
+class ArtworkFetcher:
+    """
+    Downloads the thumbnails of a playlist without extracting each video. Flat playlist entries already have their
+    thumbnail URLs, so the best one is fetched directly, in parallel over kept-alive connections
+    """
+
+    # Full size YouTube thumbnail. Flat entries only list the smaller ones. Tried first, since not every video has it
+    YOUTUBE_MAXRES: str = "https://i.ytimg.com/vi/{id}/maxresdefault.jpg"
+
+    # Seconds to wait for a server
+    TIMEOUT: float = 20.0
+
+    def __init__(self, workers: int = 8):
+        """
+        :param workers: Number of thumbnails to fetch at once
+        """
+
+        self.workers: int = workers
+
+        # Each worker keeps one connection per host: (scheme, host): connection
+        self.local: threading.local = threading.local()
+
+        # All open connections, closed when the fetch is done
+        self.open_connections: list[http.client.HTTPConnection] = []
+
+    @staticmethod
+    def get_entries(url: str) -> list[dict]:
+        """
+        Get the flat entries of a URL, without extracting each video
+        :param url: URL of a playlist or single item
+        :return: List of yt-dlp info dictionaries. A single item is a list of one
+        """
+
+        ydl_args: dict = {
+            "logger": None,
+            "extract_flat": "in_playlist",
+            "quiet": True
+        }
+
+        with yt.YoutubeDL(ydl_args) as ydl:
+            result: dict = ydl.extract_info(url, download=False)
+
+        return list(result["entries"]) if "entries" in result else [result]
+
+    @staticmethod
+    def candidates(entry: dict) -> list[str]:
+        """
+        Get the thumbnail URLs of an entry, best first
+        :param entry: yt-dlp info dictionary. Can be a flat entry
+        :return: List of URLs
+        """
+
+        thumbnails: list[dict] = [t for t in entry.get("thumbnails") or [] if t.get("url")]
+
+        # Largest first. yt-dlp lists thumbnails from worst to best, so the position breaks ties
+        ranked: list[dict] = [t for _, t in sorted(enumerate(thumbnails), reverse=True,
+                                                    key=lambda it: ((it[1].get("width") or 0) *
+                                                                    (it[1].get("height") or 0), it[0]))]
+
+        urls: list[str] = [t["url"] for t in ranked]
+
+        if not urls and entry.get("thumbnail"):
+            urls.append(entry["thumbnail"])
+
+        if entry.get("ie_key", entry.get("extractor_key")) == "Youtube" and entry.get("id"):
+            urls.insert(0, ArtworkFetcher.YOUTUBE_MAXRES.format(id=entry["id"]))
+
+        return urls
+
+    def connection(self, scheme: str, host: str) -> http.client.HTTPConnection:
+        """
+        Get this worker's kept-alive connection to a host
+        """
+
+        connections: dict = self.local.__dict__.setdefault("connections", {})
+
+        if (scheme, host) not in connections:
+            conn_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            connections[(scheme, host)] = conn_class(host, timeout=ArtworkFetcher.TIMEOUT)
+            self.open_connections.append(connections[(scheme, host)])
+
+        return connections[(scheme, host)]
+
+    @staticmethod
+    def send(conn: http.client.HTTPConnection, path: str) -> tuple[int, str, bytes]:
+        """
+        Send a GET request
+        :return: (HTTP status, content type, body)
+        """
+
+        conn.request("GET", path, headers={"User-Agent": yt.utils.networking.random_user_agent()})
+        response: http.client.HTTPResponse = conn.getresponse()
+
+        # Always read the body, so the connection can be reused
+        body: bytes = response.read()
+
+        return response.status, response.getheader("Content-Type", ""), body
+
+    def get(self, url: str) -> tuple[int, str, bytes]:
+        """
+        Fetch a URL over this worker's kept-alive connection to the host
+        :return: (HTTP status, content type, body)
+        """
+
+        parts = urlsplit(url)
+        path: str = parts.path + (f"?{parts.query}" if parts.query else "")
+        conn: http.client.HTTPConnection = self.connection(scheme=parts.scheme, host=parts.netloc)
+
+        try:
+            return ArtworkFetcher.send(conn=conn, path=path)
+
+        except (http.client.HTTPException, OSError):
+            # The server may have closed the kept-alive connection. Retry once on a new one
+            conn.close()
+
+            return ArtworkFetcher.send(conn=conn, path=path)
+
+    def fetch(self, urls: list[str]) -> bytes | None:
+        """
+        Fetch the first thumbnail that can be fetched, into memory. Only the converted image is written to disk
+        :param urls: Thumbnail URLs, best first
+        :return: The thumbnail, or None if no thumbnail could be fetched
+        """
+
+        for url in urls:
+            try:
+                status, _, body = self.get(url)
+
+            except (http.client.HTTPException, OSError):
+                continue
+
+            if status == 200 and body:
+                return body
+
+        return None
+
+    def fetch_all(self, entries: list[dict], callback) -> int:
+        """
+        Fetch the thumbnails of all entries. Each one is passed to the callback as soon as it is fetched, and not kept
+        :param entries: yt-dlp info dictionaries. Can be flat entries
+        :param callback: Called as callback(index, thumbnail) when a thumbnail is done. thumbnail is None if it failed
+        :return: Number of thumbnails fetched
+        """
+
+        fetched: int = 0
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures: dict = {pool.submit(self.fetch, ArtworkFetcher.candidates(entry)): i
+                             for i, entry in enumerate(entries)}
+
+            for future in as_completed(futures):
+                thumbnail: bytes | None = future.result()
+                fetched += thumbnail is not None
+
+                callback(futures[future], thumbnail)
+
+        for conn in self.open_connections:
+            conn.close()
+
+        self.open_connections.clear()
+
+        return fetched
+
+
+class ArtworkProgress:
+    """
+    Progress of an Artwork download. The thumbnails are fetched and converted at once, so each stage counts its items,
+    bytes and rates, and the download ends when the slower stage does
+    """
+
+    class Stage:
+        """
+        Counts of one stage: fetching or converting
+        """
+
+        def __init__(self):
+            self.done: int = 0
+            self.failed: int = 0
+
+            # Bytes of the thumbnails fetched or converted
+            self.bytes: int = 0
+
+        def add(self, size: int | None) -> None:
+            """
+            Count an item
+            :param size: Bytes of the thumbnail. None if it failed
+            """
+
+            if size is None:
+                self.failed += 1
+
+            else:
+                self.done += 1
+                self.bytes += size
+
+    def __init__(self, total: int):
+        """
+        :param total: Number of items
+        """
+
+        self.total: int = total
+        self.start: float = time.perf_counter()
+
+        self.fetch: ArtworkProgress.Stage = ArtworkProgress.Stage()
+        self.convert: ArtworkProgress.Stage = ArtworkProgress.Stage()
+
+        # Bytes of each fetched thumbnail by index, until it is converted
+        self.sizes: dict[int, int] = {}
+
+        # Items are fetched on the download thread and converted on the converter's thread
+        self.lock: threading.Lock = threading.Lock()
+
+    def fetched(self, index: int, size: int | None) -> None:
+        """
+        Count a thumbnail that was fetched
+        :param index: Index of the item
+        :param size: Bytes of the thumbnail. None if no thumbnail was found
+        """
+
+        with self.lock:
+            self.fetch.add(size)
+
+            if size is not None:
+                self.sizes[index] = size
+
+    def converted(self, index: int, ok: bool) -> None:
+        """
+        Count a thumbnail that was converted. Its bytes are those fetched, so both stages are measured alike
+        :param index: Index of the item
+        :param ok: False if the conversion failed
+        """
+
+        with self.lock:
+            size: int = self.sizes.pop(index, 0)
+            self.convert.add(size if ok else None)
+
+    def rates(self, stage: "ArtworkProgress.Stage") -> tuple[float, float]:
+        """
+        Get the average rates of a stage since the start
+        :return: (images per second, bytes per second)
+        """
+
+        elapsed: float = max(time.perf_counter() - self.start, 1e-6)
+
+        return stage.done / elapsed, stage.bytes / elapsed
+
+    def eta(self) -> float | None:
+        """
+        Estimate the time left. The conversions can't end before the fetches, so it is the longer of the two
+        :return: Seconds left, or None if a stage hasn't finished an item yet
+        """
+
+        with self.lock:
+            fetch_left: int = self.total - self.fetch.done - self.fetch.failed
+
+            # Items without a thumbnail are never converted
+            convert_left: int = self.total - self.fetch.failed - self.convert.done - self.convert.failed
+
+            estimates: list[float] = []
+
+            for stage, left in ((self.fetch, fetch_left), (self.convert, convert_left)):
+                if left <= 0:
+                    continue
+
+                rate: float = self.rates(stage)[0]
+
+                if not rate:
+                    return None
+
+                estimates.append(left / rate)
+
+        return max(estimates, default=0.0)
+
+    def status(self) -> dict:
+        """
+        Get the progress for display
+        :return: Dictionary of 'total', 'fetched', 'converted' and 'failed' counts, 'fetch_rate' and 'convert_rate'
+        in images per second, 'fetch_speed' and 'convert_speed' in bytes per second, and 'eta' in seconds (None if
+        unknown)
+        """
+
+        eta: float | None = self.eta()
+
+        with self.lock:
+            fetch_rate, fetch_speed = self.rates(self.fetch)
+            convert_rate, convert_speed = self.rates(self.convert)
+
+            return {
+                "total": self.total,
+                "fetched": self.fetch.done,
+                "converted": self.convert.done,
+                "failed": self.fetch.failed + self.convert.failed,
+                "fetch_rate": fetch_rate,
+                "fetch_speed": fetch_speed,
+                "convert_rate": convert_rate,
+                "convert_speed": convert_speed,
+                "eta": eta
+            }
@@ -2,14 +2,20 @@
 backend.py: The backend of the program
 """
 import os.path
+import time
 from pathlib import Path
-from sys import stdout
-
-from wand.image import Image
+from sys import stdin
 
+from archive import DownloadArchive
+from artwork import ArtworkFetcher, ArtworkProgress
 from confighandler import ConfigHandler, ConfigValidator, ConfigError
-from downloader import Downloader
+from downloader import Downloader, DownloadControl
+from ffmpegbudget import FFmpegBudget
 from filenamecreator import FilenameCreator, PlaylistNameCreator, GetPartAt
+from formatselector import FormatSelector
+from imageconverter import ImageConverter
+from library import Library
+from progressrenderer import ProgressRenderer
 # Menus
 from menu.menu_downloader import DwnMenu
 from menu.menu_filenamecreator import FilenameMenu, PlaylistNameMenu
@@ -24,10 +30,12 @@ from videoquality import VideoQuality
 
 
 class Backend:
-    def __init__(self, bypass_defaults: bool = False):
+    def __init__(self, bypass_defaults: bool = False, limits: dict[str, int] = None, sections: str = None):
         """
         Backend for yt-dlp-adv2
         :param bypass_defaults: If true, will bypass any default preferences in config file.
+        :param limits: Size and bitrate limits passed as arguments. Override the limits in the config file
+        :param sections: Sections to download passed as an argument. See `DwnUtilities.parse_sections`
         """
 
         # Argument Vars
@@ -72,12 +80,34 @@ class Backend:
         self.duplicate = None
 
         # Only use for video downloads
+        self.video_info: dict = {}
         self.video_qualities = None
         self.video_quality = None
+        self.video_choice: FormatSelector.VideoChoice | None = None
 
         self.num_items = None
         self.dwn_size = None
-        self.failed_downloads: list[str] = []
+
+        # Failed or skipped items as (title, reason)
+        self.failed_downloads: list[tuple[str, str]] = []
+
+        # Only download these sections of each item (time ranges or chapters)
+        self.sections: str | None = sections
+
+        # Paths of the finished files
+        self.dwn_files: list[str] = []
+
+        # Converts the thumbnails of Artwork downloads as they arrive
+        self.image_converter: ImageConverter | None = None
+
+        # Thumbnails fetched and converted so far, for the status display
+        self.artwork_progress: ArtworkProgress | None = None
+
+        # Draws the download status at a fixed rate
+        self.progress_renderer: ProgressRenderer | None = None
+
+        # Extra outputs made from each video: {'audio'/'artwork': {'file_format', 'file_ext', 'dwn_dir'}}
+        self.outputs: dict[str, dict] = {}
 
         # Directory Path for download
         self.download_dir = None
@@ -93,6 +123,21 @@ class Backend:
 
         self.ytdlp_options: dict = {}
 
+        # Pause/resume/cancel for the running download
+        self.dwn_control: DownloadControl = DownloadControl()
+
+        # Statistics from the downloader
+        self.dwn_stats: dict[str, int] = {}
+
+        # Items re-encoded to fit the file format as (title, reason)
+        self.reencoded: list[tuple[str, str]] = []
+
+        # Items downloaded because their local copy couldn't be used as (title, reason)
+        self.local_failed: list[tuple[str, str]] = []
+
+        # CPU budget of the ffmpeg processes
+        self.cpu_budget: FFmpegBudget | None = None
+
         # Get config file
         self.ch: ConfigHandler = ConfigHandler(file="config.yml")
         self.CONFIG: dict = self.ch.get_config()
@@ -110,6 +155,18 @@ class Backend:
             ConfigProblem.Error.config_error(e=e, config_path=self.ch.config_path)
             exit(1)
 
+        # Size and bitrate limits. Arguments take priority over the config file
+        self.limits: dict[str, int] = {key: self.CONFIG[key] for key in
+                                       ("max_item_size", "max_job_size", "max_video_bitrate")}
+        self.limits.update(limits or {})
+
+        # Index of downloaded files, used to reuse local copies
+        self.library: Library = Library(directory=self.CONFIG["library_directory"], use_store=self.CONFIG["use_store"])
+
+        # Archive of downloaded items, used to skip them
+        self.archive: DownloadArchive | None = (DownloadArchive(directory=self.CONFIG["library_directory"])
+                                                if self.CONFIG["use_archive"] else None)
+
         # Display program header and version if enabled
         if self.CONFIG["show_header"]:
             DwnMenu.Main.program_header(v=MiscUtilities.VERSION if self.CONFIG["show_version"] else None)
@@ -129,44 +186,30 @@ class Backend:
         MiscMenu.gap(1)
 
         # Download Type
-        self.dwn_type: int = Input.Integer.get_input_num(num_entries=3, default_option=1)
+        self.dwn_type: int = Input.Integer.get_input_num(num_entries=4, default_option=1)
 
         # File Format
         # Get download directory from config
         match self.dwn_type:
             case 1:
                 # Video
-                path: str = os.path.expandvars(os.path.expanduser(self.CONFIG["video_directory"]))
-
-                # Remove trailing slash if it exists
-                if path[-1] == "/":
-                    path = path[:-1]
-
-                self.download_dir = f"{Path(path).resolve()}/"
+                self.download_dir = self.get_directory(key="video_directory")
                 self.menu_video()
 
             case 2:
                 # Audio
-                path: str = os.path.expandvars(os.path.expanduser(self.CONFIG["audio_directory"]))
-
-                # Remove trailing slash if it exists
-                if path[-1] == "/":
-                    path = path[:-1]
-
-                self.download_dir = f"{Path(path).resolve()}/"
+                self.download_dir = self.get_directory(key="audio_directory")
                 self.menu_audio()
 
             case 3:
                 # Artwork
-                path: str = os.path.expandvars(os.path.expanduser(self.CONFIG["artwork_directory"]))
-
-                # Remove trailing slash if it exists
-                if path[-1] == "/":
-                    path = path[:-1]
-
-                self.download_dir = f"{Path(path).resolve()}/"
+                self.download_dir = self.get_directory(key="artwork_directory")
                 self.menu_artwork()
 
+            case 4:
+                # Video, Audio and Artwork from a single download
+                self.menu_outputs()
+
         # Item Count
         self.menu_item_count()
 
@@ -216,6 +259,16 @@ class Backend:
             DwnMenu.Video.video_quality_status()
             self.menu_video_quality()
 
+            # Pick the smallest formats for the chosen quality
+            if self.video_quality and self.CONFIG["prefer_smaller_formats"]:
+                self.video_choice = FormatSelector.smallest_video(info=self.video_info,
+                                                                  video_quality=self.video_quality,
+                                                                  file_format=self.file_format)
+
+        # Sections
+        if self.dwn_type != 3:
+            self.menu_sections()
+
         # Confirmation
         self.menu_confirmation()
 
@@ -228,6 +281,44 @@ class Backend:
 
     ### Get file formats ###
 
+    def get_directory(self, key: str) -> str:
+        """
+        Get a download directory from the config
+        :param key: Config key of the directory
+        :return: Resolved directory, with a trailing slash
+        """
+
+        path: str = os.path.expandvars(os.path.expanduser(self.CONFIG[key]))
+
+        # Remove trailing slash if it exists
+        if path[-1] == "/":
+            path = path[:-1]
+
+        return f"{Path(path).resolve()}/"
+
+    def menu_outputs(self):
+        """
+        Get the formats for a download of the video, audio and artwork together. The video is downloaded, and the
+        audio and artwork are made from it. Continues as a Video download
+        """
+
+        self.dwn_type = 1
+        self.download_dir = self.get_directory(key="video_directory")
+        self.menu_video()
+
+        video: tuple[int, str, str] = (self.file_format, self.file_ext, self.download_dir)
+
+        for output, key, menu in (("audio", "audio_directory", self.menu_audio),
+                                  ("artwork", "artwork_directory", self.menu_artwork)):
+            self.download_dir = self.get_directory(key=key)
+            menu()
+
+            self.outputs[output] = {"file_format": self.file_format, "file_ext": self.file_ext,
+                                    "dwn_dir": self.download_dir}
+
+        # Continue with the video's choices
+        self.file_format, self.file_ext, self.download_dir = video
+
     def menu_video(self):
         DwnMenu.Video.video_menu()
         MiscMenu.gap(1)
@@ -251,8 +342,9 @@ class Backend:
 
     def menu_video_quality(self):
 
-        # Get qualities
-        self.video_qualities: list[str] = Downloader.get_video_qualities(self.yt_url)
+        # Get qualities. Keep the info for the format choice
+        self.video_info: dict = Downloader.get_video_info(self.yt_url)
+        self.video_qualities: list[str] = Downloader.get_video_qualities(self.yt_url, info=self.video_info)
 
         # Skip if no qualities found
         if not self.video_qualities:
@@ -289,7 +381,7 @@ class Backend:
         DwnMenu.Audio.audio_menu()
         MiscMenu.gap(1)
 
-        self.file_format: int = Input.Integer.get_input_num(num_entries=4, default_option=1)
+        self.file_format: int = Input.Integer.get_input_num(num_entries=6, default_option=1)
 
         match self.file_format:
             case 1:
@@ -308,6 +400,14 @@ class Backend:
                 # FLAC
                 self.file_ext: str = "flac"
 
+            case 5:
+                # OPUS
+                self.file_ext: str = "opus"
+
+            case 6:
+                # M4A
+                self.file_ext: str = "m4a"
+
         self.download_dir += f"{self.file_ext.upper()}/"
 
     def menu_artwork(self):
@@ -344,6 +444,9 @@ class Backend:
                 # Playlist
                 self.download_dir += "Playlists/"
 
+        for output in self.outputs.values():
+            output["dwn_dir"] += "Singles/" if self.item_count == 1 else "Playlists/"
+
     ### Get playlist name format ###
     def menu_playlist_name_format(self):
 
@@ -437,11 +540,47 @@ class Backend:
 
         self.yt_url: str = Input.String.get_input_url()
 
+    ### Get sections ###
+
+    def menu_sections(self):
+
+        # Sections passed as an argument
+        if self.sections:
+            DwnMenu.Main.sections_from_args(sections=self.sections)
+            return
+
+        if not self.CONFIG["ask_sections"]:
+            return
+
+        DwnMenu.Main.ask_sections()
+
+        if not Input.Boolean.get_input_bool(default_option=False):
+            return
+
+        DwnMenu.Main.get_sections()
+        self.sections = Input.String.get_input_sections()
+
     def menu_confirmation(self):
         DwnMenu.Main.confirmation_screen(dwn_type=self.dwn_type, file_format=self.file_format,
                                          item_count=self.item_count, pn_mode=self.pn_mode, pn_format=self.pn_format,
                                          ff_mode=self.ff_mode, fn_format=self.filename_format,
-                                         video_quality=self.video_quality)
+                                         video_quality=self.video_quality,
+                                         sections=self.sections if self.dwn_type != 3 else None)
+
+        # Show the audio and artwork made from the video
+        if self.outputs:
+            DwnMenu.Main.confirmation_outputs(outputs={output.capitalize(): values["file_ext"].upper()
+                                                       for output, values in self.outputs.items()})
+
+        # Show the chosen formats and their estimated size
+        if self.video_choice:
+            DwnMenu.Main.confirmation_formats(
+                formats=self.video_choice.description(),
+                size=MiscUtilities.convert_bytes(self.video_choice.est_bytes),
+                saved=MiscUtilities.convert_bytes(self.video_choice.saved_bytes)
+                if self.video_choice.saved_bytes else "")
+
+        DwnMenu.Main.confirmation_prompt()
 
         choice: bool = Input.Boolean.get_input_bool(default_option=False)
 
@@ -546,8 +685,7 @@ class Backend:
         return True
 
     # Get data from downloader and execute code based on it
-    @staticmethod
-    def download_callback(status: str, post_processing: bool, downloaded: int, total: int, dwn_percent: float,
+    def download_callback(self, status: str, post_processing: bool, downloaded: int, total: int, dwn_percent: float,
                           cur_item: int, total_items: int, title: str) -> [int, int]:
         """
         Get progress from progress_hook from yt-dlp in downloader
@@ -575,16 +713,78 @@ class Backend:
                 # Finished
                 n_status: int = 0
 
+            case "paused":
+                # Paused
+                n_status: int = 3
+
+            case "skipped":
+                # Skipped by the size/bitrate limits
+                n_status: int = 4
+
+            case "local":
+                # Extracted from a local copy
+                n_status: int = 5
+
             case _:
                 # Error
                 n_status: int = -1
 
-        DwnMenu.Download.download_status(cur_item=cur_item, total_items=total_items, downloaded=downloaded,
-                                         total=total, dwn_percent=dwn_percent, status=n_status, title=title)
-        stdout.flush()
+        report: dict = {"cur_item": cur_item, "total_items": total_items, "downloaded": downloaded, "total": total,
+                        "dwn_percent": dwn_percent, "status": n_status, "title": title}
+
+        # Reports of a running download are drawn at the refresh rate. Every other report is drawn right away, since
+        # it ends the line or stays on screen
+        if n_status in (1, 2):
+            self.progress_renderer.update(**report)
+
+        else:
+            self.progress_renderer.draw(**report)
 
         return n_status, cur_item
 
+    def dedup_summary(self):
+        """
+        Display the bytes and time saved by linking local copies
+        """
+
+        stats: dict[str, int] = self.dwn_stats
+
+        # Estimate the time from the transfer rate of this download. Unknown if nothing was downloaded
+        time_saved: str = ""
+
+        if stats.get("fetch_bytes") and stats.get("fetch_ms"):
+            fetch_ms: int = round(stats["dedup_bytes"] * stats["fetch_ms"] / stats["fetch_bytes"])
+            time_saved = MiscUtilities.convert_time(max(fetch_ms - stats["dedup_ms"], 0))
+
+        DwnMenu.Download.linked_copies(count=stats["dedup_files"],
+                                       methods={method: stats[f"dedup_{method}"]
+                                                for method in ("hardlink", "reflink", "symlink", "copy")
+                                                if stats.get(f"dedup_{method}")},
+                                       size=MiscUtilities.convert_bytes(stats["dedup_bytes"]),
+                                       time_saved=time_saved)
+
+    def output_summary(self, elapsed_ms: int, completed: int):
+        """
+        Display the time of the video and each output made from it
+        :param elapsed_ms: Time of the whole download in milliseconds
+        :param completed: Number of videos downloaded
+        """
+
+        stats: dict[str, int] = self.dwn_stats
+        derived_ms: int = sum(stats.get(f"output_ms_{output}", 0) for output in self.outputs)
+
+        # The video's time includes fetching and merging. The outputs are made during its post-processing
+        timings: list[tuple[str, str, int, str]] = [
+            (f"Video ({self.file_ext.upper()})", MiscUtilities.convert_time(elapsed_ms - derived_ms), completed,
+             self.download_dir)]
+
+        for output, values in self.outputs.items():
+            timings.append((f"{output.capitalize()} ({values['file_ext'].upper()})",
+                            MiscUtilities.convert_time(stats.get(f"output_ms_{output}", 0)),
+                            stats.get(f"output_count_{output}", 0), values["dwn_dir"]))
+
+        DwnMenu.Download.output_timings(timings=timings)
+
     def construct_paths(self, cur_item: int):
         """
         Construct download paths for non-Artwork downloads
@@ -601,44 +801,79 @@ class Backend:
             self.download_path = self.download_dir + self.filename_format[1].format_map(
                 GetPartAt(self.ff_sanitized_info, index=i)) + f".{self.file_ext}"
 
-    def convert_images(self, titles: list[str]):
+    def fetch_artwork(self) -> tuple[int, int]:
         """
-        Custom version of construct_paths for Artwork only
-        :param titles: List of video titles
+        Fetch the thumbnails straight from the flat playlist entries, without extracting each video. Each thumbnail
+        is converted as soon as it is fetched. Items without a thumbnail are added to the failed downloads
+        :return: Download status and current item, like `Downloader.download`
         """
 
-        for i in range(len(titles)):
-            # Artwork only uses title filename format
+        directory: str = self.download_dir + (f"{self.playlist_name}/" if self.item_count == 2 else "")
+
+        entries: list[dict] = ArtworkFetcher.get_entries(url=self.yt_url)
+        self.artwork_progress.total = len(entries)
 
-            # If item is a thumbnail, convert to specific format
-            if self.item_count == 1:
-                # Single Artwork
-                self.download_path = f"{self.download_dir}{titles[i]}.webp"
+        def fetched(i: int, thumbnail: bytes | None) -> None:
+            self.artwork_fetched(i=i, thumbnail=thumbnail, target=f"{directory}{self.titles_safe[i]}.{self.file_ext}")
 
-                Image(filename=self.download_path).convert(self.file_ext).save(
-                    filename=f"{self.download_dir}{titles[i]}.{self.file_ext}")
+        ArtworkFetcher(workers=self.CONFIG["artwork_workers"]).fetch_all(entries=entries, callback=fetched)
 
-            elif self.item_count == 2:
-                # Playlist Artwork
-                self.download_path = f"{self.download_dir}{self.playlist_name}/{titles[i]}.webp"
+        return 0, len(entries)
+
+    def artwork_fetched(self, i: int, thumbnail: bytes | None, target: str) -> None:
+        """
+        Hand a thumbnail to the image converter. Called as each thumbnail is fetched, by `ArtworkPP` or
+        `Backend.fetch_artwork`. Items without a thumbnail are added to the failed downloads
+        :param i: Index of the item
+        :param thumbnail: The thumbnail, or None if none was found
+        :param target: Path of the artwork
+        """
 
-                Image(filename=self.download_path).convert(self.file_ext).save(
-                    filename=f"{self.download_dir}{self.playlist_name}/{titles[i]}.{self.file_ext}"
-                )
+        # Counted before submitting, since thumbnails already in the artwork format are saved right away
+        self.artwork_progress.fetched(index=i, size=None if thumbnail is None else len(thumbnail))
 
-            # Delete original thumbnail
-            DwnUtilities.delete_from_disk(path=self.download_path)
+        if thumbnail is None:
+            self.failed_downloads.append((self.titles_safe[i], "No thumbnail found"))
 
-            # For PNG Downloads, remove any stray JPGs
-            if self.file_ext.upper() == "PNG":
-                if DwnUtilities.exists_on_disk(path=self.download_path.replace(".webp", ".jpg")):
-                    DwnUtilities.delete_from_disk(path=self.download_path.replace(".webp", ".jpg"))
+        else:
+            # Converted from memory. Only the converted image is written
+            self.image_converter.submit(source=thumbnail, target=target, tag=i)
 
-            # Update path
-            self.download_path = f"{self.download_dir}{titles[i]}.{self.file_ext}"
+        self.progress_renderer.update(**self.artwork_progress.status())
 
-            # Display status
-            DwnMenu.Download.download_status_a(cur_item=i + 1, total_items=len(titles), title=self.titles[i])
+    def converted_artwork(self, i: int, result: str | Exception) -> None:
+        """
+        Count a thumbnail that finished converting. Called by the image converter, in the order they finish
+        :param i: Index of the item
+        :param result: Path of the converted thumbnail, or the exception if it failed
+        """
+
+        self.artwork_progress.converted(index=i, ok=not isinstance(result, Exception))
+
+        if isinstance(result, Exception):
+            self.failed_downloads.append((self.titles_safe[i], f"Conversion failed: {result}"))
+
+        else:
+            # Last converted path, for the download size of single items
+            self.download_path = result
+
+        self.progress_renderer.update(**self.artwork_progress.status())
+
+    def finish_artwork(self) -> None:
+        """
+        Wait for the thumbnails that are still converting. Thumbnails that failed to convert are added to the failed
+        downloads by `Backend.converted_artwork`
+        """
+
+        # Only the conversions still running when the downloads end delay the result
+        start: float = time.perf_counter()
+        results: list[str | Exception] = self.image_converter.finish()
+
+        self.dwn_stats["artwork_converted"] = sum(not isinstance(result, Exception) for result in results)
+        self.dwn_stats["artwork_skipped"] = self.image_converter.skipped
+        self.dwn_stats["artwork_tail_ms"] = round((time.perf_counter() - start) * 1000)
+
+        self.progress_renderer.draw(**self.artwork_progress.status(), final=True)
 
     def download(self):
         """
@@ -680,32 +915,114 @@ class Backend:
         if not self.download_checks():
             return
 
+        self.cpu_budget = FFmpegBudget(threads=self.CONFIG["ffmpeg_threads"],
+                                       max_processes=self.CONFIG["ffmpeg_processes"],
+                                       nice=self.CONFIG["ffmpeg_nice"], ionice=self.CONFIG["ffmpeg_ionice"])
+
+        # Encode settings of the artwork
+        encode: dict = {key: self.CONFIG[key] for key in ("png_compression_level", "png_compression_filter",
+                                                          "jpeg_quality", "jpeg_progressive", "jpeg_optimize")}
+
+        if "artwork" in self.outputs:
+            self.outputs["artwork"]["settings"] = encode
+
+        if self.dwn_type == 3:
+            self.artwork_progress = ArtworkProgress(total=self.num_items)
+            self.image_converter = ImageConverter(workers=self.CONFIG["image_workers"],
+                                                  memory_limit=self.CONFIG["image_memory_limit"],
+                                                  callback=self.converted_artwork,
+                                                  variants=ImageConverter.parse_variants(
+                                                      variants=self.CONFIG["artwork_variants"],
+                                                      default_ext=self.file_ext),
+                                                  settings=encode)
+
         # Set up yt-dlp options
         self.ytdlp_options = Downloader.setup_ytdlp_options(dwn_type=self.dwn_type, file_format=self.file_format,
                                                             item_count=self.item_count, dwn_dir=self.download_dir,
                                                             ff_mode=self.ff_mode,
                                                             filename_format=self.filename_format,
                                                             playlist_name=self.playlist_name,
-                                                            video_quality=self.video_quality)
+                                                            video_quality=self.video_quality,
+                                                            embed={"metadata": self.CONFIG["embed_metadata"],
+                                                                   "thumbnail": self.CONFIG["embed_thumbnail"],
+                                                                   "chapters": self.CONFIG["embed_chapters"]},
+                                                            video_format=self.video_choice.format_string()
+                                                            if self.video_choice else None,
+                                                            limits=self.limits,
+                                                            sections=self.sections,
+                                                            exact_cuts=self.CONFIG["exact_cuts"],
+                                                            library=self.library,
+                                                            derive_audio=self.CONFIG["use_local_copies"],
+                                                            dedup=self.CONFIG["link_duplicates"] or
+                                                            self.CONFIG["use_store"],
+                                                            outputs=self.outputs,
+                                                            connections=self.CONFIG["download_connections"],
+                                                            cpu_budget=self.cpu_budget,
+                                                            reencoded=self.reencoded,
+                                                            archive=self.archive,
+                                                            artwork_callback=self.artwork_fetched
+                                                            if self.image_converter else None)
 
         DwnMenu.Download.starting_download(count=self.num_items)
 
+        # Show key bindings for pausing/cancelling
+        if self.dwn_type != 3 and stdin.isatty():
+            DwnMenu.Download.download_controls(k_pause=DownloadControl.KEY_PAUSE,
+                                               k_resume=DownloadControl.KEY_RESUME,
+                                               k_cancel=DownloadControl.KEY_CANCEL)
+
+        self.progress_renderer = ProgressRenderer(render=DwnMenu.Download.artwork_status if self.dwn_type == 3
+                                                  else DwnMenu.Download.download_status)
+
         # Download
+        start: float = time.perf_counter()
+        self.progress_renderer.start()
+
         try:
-            dwn_status, cur_item = Downloader.download(url=self.yt_url, ytdlp_options=self.ytdlp_options,
-                                                       dwn_type=self.dwn_type,
-                                                       item_count=self.item_count,
-                                                       ff_mode=self.ff_preset,
-                                                       filename_format=self.filename_format,
-                                                       titles=self.titles,
-                                                       extracted_info=self.ff_extracted_info,
-                                                       progress_callback=Backend.download_callback)
+            if self.dwn_type == 3 and self.CONFIG["fast_artwork"]:
+                dwn_status, cur_item = self.fetch_artwork()
+
+            else:
+                dwn_status, cur_item = Downloader.download(url=self.yt_url, ytdlp_options=self.ytdlp_options,
+                                                           dwn_type=self.dwn_type,
+                                                           item_count=self.item_count,
+                                                           ff_mode=self.ff_preset,
+                                                           filename_format=self.filename_format,
+                                                           titles=self.titles,
+                                                           extracted_info=self.ff_extracted_info,
+                                                           progress_callback=self.download_callback,
+                                                           control=self.dwn_control,
+                                                           stats=self.dwn_stats,
+                                                           skipped=self.failed_downloads,
+                                                           files=self.dwn_files,
+                                                           local_failed=self.local_failed)
 
         except Exception as e:
             MiscProblem.Error.error_msg_crash(error=e)
             exit(1)
 
-        if dwn_status == 0:
+        finally:
+            # Write the files added to the library, and the items added to the archive. Not while a cancelled
+            # download still runs, since it can be in a post-processor that writes to them
+            if self.dwn_control.idle.is_set():
+                self.library.flush()
+
+                if self.archive:
+                    self.archive.close()
+
+        # Thumbnails are converted during the download. Wait for the last ones
+        if self.image_converter:
+            self.finish_artwork()
+
+        self.progress_renderer.stop()
+
+        elapsed_ms: int = round((time.perf_counter() - start) * 1000)
+
+        # Items that were downloaded. Items already in the archive weren't downloaded again
+        completed: int = self.num_items - len(self.failed_downloads) - self.dwn_stats.get("archived", 0)
+
+        # Nothing to convert or measure if every item was skipped by the limits
+        if dwn_status == 0 and completed > 0:
             # Download complete.
 
             # For non-Artwork downloads, construct download path only for Single Item downloads
@@ -717,36 +1034,98 @@ class Backend:
                     MiscProblem.Error.error_msg_crash(error=e)
                     exit(1)
 
-            # For Artwork downloads, construct download path for all items
-            elif self.dwn_type == 3:
-                self.convert_images(titles=self.titles_safe)
-
         elif dwn_status == -1:
             # Download failed
-            self.failed_downloads.append(self.titles_safe[cur_item])
-
-        # Get download size. Use different path based on download type
-        try:
-            match self.item_count:
-                case 1:
-                    # Single item
-                    self.dwn_size: str = Downloader.get_download_size(path=self.download_path, unit="auto")
+            self.failed_downloads.append((self.titles_safe[cur_item - 1], ""))
+            completed -= 1
 
-                case 2:
-                    # Playlist
-                    self.dwn_size: str = Downloader.get_download_size(path=self.download_dir + self.playlist_name,
-                                                                      unit="auto")
+        elif dwn_status == -2:
+            # Download cancelled. Partial files are kept so the download can be resumed later
+            DwnProblem.Warning.download_cancelled(completed=cur_item - 1, total=self.num_items)
+            return
 
-            DwnMenu.Download.all_downloads_complete(completed=self.num_items, total=self.num_items,
-                                                    path_dir=self.download_dir, size=self.dwn_size)
+        if completed <= 0:
+            # Nothing was downloaded
+            DwnMenu.Download.all_downloads_complete(completed=0, total=self.num_items, path_dir=self.download_dir)
 
-        except Exception as e:
-            # Catch any errors when getting download size
-            DwnProblem.Error.dwn_size_error(error=e)
+        else:
+            # Get download size. Use different path based on download type
+            try:
+                match self.item_count:
+                    case 1:
+                        # Single item. Sections of an item can be several files
+                        self.dwn_size: str = Downloader.get_download_size(path=self.dwn_files or self.download_path,
+                                                                          unit="auto")
 
-            # Display downloads complete without size
-            DwnMenu.Download.all_downloads_complete(completed=self.num_items, total=self.num_items,
-                                                    path_dir=self.download_dir)
+                    case 2:
+                        # Playlist
+                        self.dwn_size: str = Downloader.get_download_size(path=self.download_dir + self.playlist_name,
+                                                                          unit="auto")
+
+                DwnMenu.Download.all_downloads_complete(completed=completed, total=self.num_items,
+                                                        path_dir=self.download_dir, size=self.dwn_size)
+
+            except Exception as e:
+                # Catch any errors when getting download size
+                DwnProblem.Error.dwn_size_error(error=e)
+
+                # Display downloads complete without size
+                DwnMenu.Download.all_downloads_complete(completed=completed, total=self.num_items,
+                                                        path_dir=self.download_dir)
+
+        # Display how many items were skipped because they are in the download archive
+        if self.dwn_stats.get("archived"):
+            DwnMenu.Download.archived_items(count=self.dwn_stats["archived"])
+
+        # Display bandwidth saved by audio-only downloads
+        if self.dwn_stats.get("bytes_saved"):
+            DwnMenu.Download.bytes_saved(saved=MiscUtilities.convert_bytes(self.dwn_stats["bytes_saved"]))
+
+        # Display the time and size of each output
+        if self.outputs:
+            self.output_summary(elapsed_ms=elapsed_ms, completed=max(completed, 0))
+
+        # Display how many items were linked from local copies instead of downloaded
+        if self.dwn_stats.get("dedup_files"):
+            self.dedup_summary()
+
+        # Display how long the thumbnails took to finish converting after the last download
+        if self.dwn_stats.get("artwork_converted"):
+            DwnMenu.Download.artwork_conversions(converted=self.dwn_stats["artwork_converted"],
+                                                 skipped=self.dwn_stats["artwork_skipped"],
+                                                 file_ext=self.file_ext.upper(),
+                                                 tail=MiscUtilities.convert_time(self.dwn_stats["artwork_tail_ms"]))
+
+        # Display how many items were extracted from local copies instead of downloaded
+        if self.dwn_stats.get("local_copies"):
+            DwnMenu.Download.local_copies(count=self.dwn_stats["local_copies"],
+                                          size=MiscUtilities.convert_bytes(self.dwn_stats["local_bytes"]))
+
+        # Display the items that were downloaded because their local copy couldn't be used
+        if self.local_failed:
+            DwnMenu.Download.local_failed_list(count=len(self.local_failed), items=self.local_failed)
+
+        # Display how many audio files were stream-copied instead of transcoded
+        if self.dwn_stats.get("audio_remuxed") or self.dwn_stats.get("audio_transcoded"):
+            DwnMenu.Download.audio_conversions(remuxed=self.dwn_stats.get("audio_remuxed", 0),
+                                               transcoded=self.dwn_stats.get("audio_transcoded", 0))
+
+        # Display how much post-processing wrote to disk
+        if self.dwn_stats.get("ffmpeg_passes"):
+            written: str = MiscUtilities.convert_bytes(self.dwn_stats["bytes_written"])
+            DwnMenu.Download.post_processing_writes(passes=self.dwn_stats["ffmpeg_passes"], written=written)
+
+        # Display the videos that had to be re-encoded to fit the file format
+        if self.reencoded:
+            DwnMenu.Download.reencoded_list(count=len(self.reencoded), items=self.reencoded)
+
+        # Display the CPU budget of ffmpeg and what the processes used, to tune it for this machine
+        if self.dwn_stats.get("ffmpeg_runs"):
+            DwnMenu.Download.ffmpeg_usage(settings=self.cpu_budget.settings(), runs=self.dwn_stats["ffmpeg_runs"],
+                                          peak=self.dwn_stats["ffmpeg_peak"],
+                                          run_time=MiscUtilities.convert_time(self.dwn_stats["ffmpeg_ms"]),
+                                          cpu_time=MiscUtilities.convert_time(self.dwn_stats["ffmpeg_cpu_ms"]),
+                                          wait_time=MiscUtilities.convert_time(self.dwn_stats["ffmpeg_wait_ms"]))
 
         # Display failed downloads
         if len(self.failed_downloads) > 0:
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""
+bench_archive.py: Compares lookups in the download archive against a flat archive file, at several archive sizes
+
+For each size, an archive of random video IDs is built, then:
+- Archive: DownloadArchive (SQLite table + Bloom filter). Time to open, and time per lookup of archived and
+  new items
+- Flat file: yt-dlp style archive file, one 'extractor id' per line. Time to load it into a set, and time per lookup
+  of a new item when the file is scanned line by line
+
+Runs fully offline.
+
+Usage: python benchmarks/bench_archive.py [--sizes 10000,100000,1000000] [--lookups 10000]
+"""
+
+import argparse
+import random
+import string
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Allow running from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from archive import DownloadArchive
+
+PROFILE: str = DownloadArchive.profile(dwn_type=1, file_format=1)
+
+
+def random_ids(count: int, seed: str) -> list[str]:
+    """
+    Make YouTube-like video IDs
+    """
+
+    rng = random.Random(seed)
+    alphabet: str = string.ascii_letters + string.digits + "-_"
+
+    return ["".join(rng.choices(alphabet, k=11)) for _ in range(count)]
+
+
+def bench_archive(directory: str, ids: list[str], hits: list[str], misses: list[str]) -> dict[str, float]:
+    """
+    Build the archive, then time opening it and looking items up
+    :return: Dictionary of timings in seconds, and microseconds per lookup
+    """
+
+    start: float = time.perf_counter()
+    archive = DownloadArchive(directory=directory)
+
+    for video_id in ids:
+        archive.add(extractor="Youtube", video_id=video_id, profile=PROFILE)
+
+    archive.close()
+    build: float = time.perf_counter() - start
+
+    # Opening an archive that was closed loads the saved Bloom filter
+    start = time.perf_counter()
+    archive = DownloadArchive(directory=directory)
+    opened: float = time.perf_counter() - start
+
+    timings: dict[str, float] = {"build": build, "open": opened}
+
+    for name, lookups in (("hit", hits), ("miss", misses)):
+        start = time.perf_counter()
+        found: int = sum(("Youtube", video_id, PROFILE) in archive for video_id in lookups)
+        timings[name] = (time.perf_counter() - start) / len(lookups) * 1e6
+
+        if found != (len(lookups) if name == "hit" else 0):
+            raise RuntimeError(f"Wrong result for {name} lookups: {found} of {len(lookups)} found")
+
+    archive.close()
+
+    return timings
+
+
+def bench_flat(path: Path, ids: list[str], misses: list[str], scans: int) -> dict[str, float]:
+    """
+    Write a flat archive file, then time loading it and scanning it for new items. A new item is the worst case,
+    since the whole file is read
+    :param scans: Number of lookups to time by scanning. Scanning is slow, so fewer are timed
+    :return: Dictionary of timings in seconds, and microseconds per lookup
+    """
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(f"youtube {video_id}\n" for video_id in ids)
+
+    # yt-dlp reads the whole file into a set on every run
+    start: float = time.perf_counter()
+
+    with open(path, "r", encoding="utf-8") as f:
+        loaded: set[str] = {line.strip() for line in f}
+
+    timings: dict[str, float] = {"open": time.perf_counter() - start}
+
+    start = time.perf_counter()
+
+    for video_id in misses[:scans]:
+        line: str = f"youtube {video_id}\n"
+
+        with open(path, "r", encoding="utf-8") as f:
+            any(existing == line for existing in f)
+
+    timings["miss"] = (time.perf_counter() - start) / len(misses[:scans]) * 1e6
+
+    del loaded
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the download archive against a flat archive file")
+    parser.add_argument("--sizes", type=str, default="10000,100000,1000000", help="Archive sizes to test")
+    parser.add_argument("--lookups", type=int, default=10000, help="Lookups of archived and of new items")
+    parser.add_argument("--scans", type=int, default=20, help="Lookups to time by scanning the flat file")
+    args = parser.parse_args()
+
+    print(f"{'Items':>9}  {'Build':>8}  {'Open':>8}  {'Hit':>9}  {'Miss':>9}  {'Flat load':>9}  "
+          f"{'Flat scan':>10}")
+
+    for size in map(int, args.sizes.split(",")):
+        ids: list[str] = random_ids(count=size, seed=f"archived {size}")
+        rng = random.Random(0)
+
+        hits: list[str] = rng.sample(ids, k=min(args.lookups, size))
+        misses: list[str] = random_ids(count=args.lookups, seed=f"new {size}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            archive: dict[str, float] = bench_archive(directory=tmp, ids=ids, hits=hits, misses=misses)
+            flat: dict[str, float] = bench_flat(path=Path(tmp) / "archive.txt", ids=ids, misses=misses,
+                                                scans=args.scans)
+
+        print(f"{size:>9}  {archive['build']:>7.2f}s  {archive['open'] * 1000:>6.1f}ms  {archive['hit']:>7.1f}us  "
+              f"{archive['miss']:>7.1f}us  {flat['open'] * 1000:>7.1f}ms  {flat['miss']:>8.0f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+bench_artwork_encode.py: Compares the encode settings of artwork, to trade CPU time against bytes on disk
+
+Thumbnails in the sizes YouTube serves (120x90 to 1280x720) are decoded once, then encoded with each setting of
+`ImageConverter.encode`. Prints the encode time and size per image of each setting, relative to the defaults of
+.default_config.yml. Runs fully offline.
+
+Usage: python benchmarks/bench_artwork_encode.py [--copies N] [--format png,jpg]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from wand.image import Image
+
+# Allow running from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from imageconverter import ImageConverter
+
+# Thumbnail sizes of YouTube: default, mqdefault, hqdefault, sddefault and maxresdefault
+SIZES: list[tuple[int, int]] = [(120, 90), (320, 180), (480, 360), (640, 480), (1280, 720)]
+
+# Defaults of .default_config.yml
+DEFAULTS: dict = {
+    "png_compression_level": 7,
+    "png_compression_filter": 5,
+    "jpeg_quality": 92,
+    "jpeg_progressive": False,
+    "jpeg_optimize": True
+}
+
+# Settings to compare for each format, as (name, changes to the defaults)
+SETTINGS: dict[str, list[tuple[str, dict]]] = {
+    "png": [
+        ("default (level 7, adaptive)", {}),
+        ("level 1, adaptive", {"png_compression_level": 1}),
+        ("level 3, adaptive", {"png_compression_level": 3}),
+        ("level 6, adaptive", {"png_compression_level": 6}),
+        ("level 9, adaptive", {"png_compression_level": 9}),
+        ("level 1, no filter", {"png_compression_level": 1, "png_compression_filter": 0}),
+        ("level 7, no filter", {"png_compression_filter": 0}),
+        ("level 7, paeth", {"png_compression_filter": 4})
+    ],
+    "jpg": [
+        ("default (q92, optimized)", {}),
+        ("q75, optimized", {"jpeg_quality": 75}),
+        ("q85, optimized", {"jpeg_quality": 85}),
+        ("q95, optimized", {"jpeg_quality": 95}),
+        ("q92, not optimized", {"jpeg_optimize": False}),
+        ("q92, progressive", {"jpeg_progressive": True}),
+        ("q85, progressive", {"jpeg_quality": 85, "jpeg_progressive": True})
+    ]
+}
+
+
+def make_corpus(copies: int) -> list[bytes]:
+    """
+    Make WEBP thumbnails in every YouTube size, with enough detail to take a realistic time to encode
+    :param copies: Thumbnails of each size
+    """
+
+    corpus: list[bytes] = []
+
+    for width, height in SIZES:
+        for _ in range(copies):
+            with Image(width=width, height=height, pseudo="plasma:") as image:
+                corpus.append(image.make_blob("webp"))
+
+    return corpus
+
+
+def bench(images: list[Image], ext: str, settings: dict) -> tuple[float, float]:
+    """
+    Encode every image with the settings
+    :return: (milliseconds per image, KiB per image)
+    """
+
+    size: int = 0
+    start: float = time.perf_counter()
+
+    for image in images:
+        with image.clone() as copy:
+            size += len(ImageConverter.encode(image=copy, ext=ext, settings=settings))
+
+    return (time.perf_counter() - start) / len(images) * 1000, size / len(images) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the encode settings of artwork")
+    parser.add_argument("--copies", type=int, default=4, help="Thumbnails of each size")
+    parser.add_argument("--format", type=str, default="png,jpg", help="Formats to compare")
+    args = parser.parse_args()
+
+    corpus: list[bytes] = make_corpus(copies=args.copies)
+    images: list[Image] = [Image(blob=blob) for blob in corpus]
+
+    print(f"{len(images)} thumbnails, {args.copies} of each size from "
+          f"{SIZES[0][0]}x{SIZES[0][1]} to {SIZES[-1][0]}x{SIZES[-1][1]}")
+
+    for ext in args.format.split(","):
+        print(f"\n{ext.upper():<28}  {'Time':>9}  {'Size':>10}  {'Time':>6}  {'Size':>6}")
+
+        baseline: tuple[float, float] | None = None
+
+        for name, changes in SETTINGS[ext]:
+            ms, kib = bench(images=images, ext=ext, settings={**DEFAULTS, **changes})
+            baseline = baseline or (ms, kib)
+
+            print(f"{name:<28}  {ms:>7.1f}ms  {kib:>6.1f} KiB  {ms / baseline[0]:>5.2f}x  {kib / baseline[1]:>5.2f}x")
+
+    for image in images:
+        image.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+bench_artwork_io.py: Compares converting fetched thumbnails through files on disk against converting them in memory
+
+For each thumbnail, already fetched into memory:
+- Disk: the thumbnail is written as .webp, read back by ImageMagick, written as PNG/JPG, then the .webp is deleted
+  (how artwork was converted before)
+- Memory: the thumbnail is decoded and encoded as blobs, and only the converted image is written, atomically.
+  See `ImageConverter.convert`
+
+Counts the read and write system calls of the process (from /proc/self/io, Linux only) and the file operations made
+from Python (opens, renames, deletes, from audit events), and times both. ImageMagick opens files on its own, which
+the audit events don't show, so the file operations of the disk path are a lower bound.
+Point --dir at a network mount to see the difference there. Runs fully offline.
+
+Usage: python benchmarks/bench_artwork_io.py [--items N] [--size 1280x720] [--format png] [--dir DIRECTORY]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from wand.image import Image
+
+# Allow running from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from imageconverter import ImageConverter
+
+# Audit events of file operations
+FILE_EVENTS: set[str] = {"open", "os.remove", "os.rename", "os.mkdir"}
+
+# File operations counted by the audit hook
+file_ops: list[int] = [0]
+
+
+def count_file_ops(event: str, _args) -> None:
+    if event in FILE_EVENTS:
+        file_ops[0] += 1
+
+
+def io_syscalls() -> tuple[int, int]:
+    """
+    Get the read and write system calls of this process so far
+    :return: (reads, writes). (0, 0) where /proc/self/io is unavailable
+    """
+
+    try:
+        with open("/proc/self/io", "r", encoding="utf-8") as f:
+            counters: dict[str, int] = dict((key, int(value)) for key, value in (line.split(": ") for line in f))
+
+    except OSError:
+        return 0, 0
+
+    return counters["syscr"], counters["syscw"]
+
+
+def make_thumbnail(width: int, height: int) -> bytes:
+    """
+    Make a WEBP thumbnail with enough detail to take a realistic time to convert
+    """
+
+    with Image(width=width, height=height, pseudo="plasma:") as image:
+        return image.make_blob("webp")
+
+
+def on_disk(thumbnail: bytes, base: str, ext: str) -> None:
+    """
+    Convert a thumbnail the way it was before: through a .webp file on disk
+    """
+
+    with open(f"{base}.webp", "wb") as f:
+        f.write(thumbnail)
+
+    with Image(filename=f"{base}.webp") as image:
+        image.convert(ext).save(filename=f"{base}.{ext}")
+
+    os.remove(f"{base}.webp")
+
+
+def in_memory(thumbnail: bytes, base: str, ext: str) -> None:
+    """
+    Convert a thumbnail from memory
+    """
+
+    ImageConverter.convert(source=thumbnail, target=f"{base}.{ext}")
+
+
+def bench(convert, thumbnail: bytes, count: int, directory: str, ext: str) -> dict[str, float]:
+    """
+    Convert the thumbnails one by one in this process, so every system call is counted
+    :return: Dictionary of system calls and file operations per image, and the time per image in milliseconds
+    """
+
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        # The first conversion loads the codecs
+        convert(thumbnail, os.path.join(tmp, "warmup"), ext)
+
+        reads, writes = io_syscalls()
+        ops: int = file_ops[0]
+        start: float = time.perf_counter()
+
+        for i in range(count):
+            convert(thumbnail, os.path.join(tmp, str(i)), ext)
+
+        elapsed: float = time.perf_counter() - start
+        end_reads, end_writes = io_syscalls()
+        end_ops: int = file_ops[0]
+
+    return {"reads": (end_reads - reads) / count, "writes": (end_writes - writes) / count,
+            "ops": (end_ops - ops) / count, "ms": elapsed / count * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark converting thumbnails on disk and in memory")
+    parser.add_argument("--items", type=int, default=200, help="Number of thumbnails")
+    parser.add_argument("--size", type=str, default="1280x720", help="Size of the thumbnails")
+    parser.add_argument("--format", type=str, default="png", choices=["png", "jpg"], help="Artwork file format")
+    parser.add_argument("--dir", type=str, default=None, help="Directory to write to. Default: temporary directory")
+    args = parser.parse_args()
+
+    width, height = map(int, args.size.split("x"))
+    thumbnail: bytes = make_thumbnail(width=width, height=height)
+
+    sys.addaudithook(count_file_ops)
+
+    print(f"{args.items} thumbnails of {args.size} ({len(thumbnail) // 1024} KiB WEBP) to {args.format.upper()}\n")
+    print(f"{'Path':<8}  {'Reads':>7}  {'Writes':>7}  {'File ops':>8}  {'Time':>9}")
+
+    for name, convert in (("Disk", on_disk), ("Memory", in_memory)):
+        result: dict[str, float] = bench(convert=convert, thumbnail=thumbnail, count=args.items, directory=args.dir,
+                                         ext=args.format)
+
+        print(f"{name:<8}  {result['reads']:>7.1f}  {result['writes']:>7.1f}  {result['ops']:>8.1f}  "
+              f"{result['ms']:>7.1f}ms")
+
+    print("\nPer image. Reads and writes are system calls, file ops are opens, renames and deletes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+"""
+bench_artwork_suite.py: Benchmark suite of the artwork conversion stage, with machine-readable results to track
+regressions across releases
+
+A corpus of WEBP and JPEG thumbnails in the sizes YouTube serves (120x90 to 1280x720) is generated once into --corpus,
+and reused by later runs so they convert the same images. Every scenario converts the whole corpus of one source
+format, and is repeated --repeats times:
+- Serial / pooled: `ImageConverter.convert` one by one in this process, or `ImageConverter.convert_all` in the pool of
+  processes. Pooled times include starting the pool, like a download does
+- Memory / disk: the thumbnails are converted from memory, or written to disk first and converted from the files
+  (how artwork was converted before). See bench_artwork_io.py for the system calls of each
+- Encode settings: each setting of bench_artwork_encode.py, serial from memory
+
+The results are written to --output as JSON, with the machine and versions they were measured with. Pass the results
+of an earlier run as --baseline to print the change of each scenario. Runs fully offline.
+
+Usage: python benchmarks/bench_artwork_suite.py [--copies N] [--repeats N] [--workers N] [--corpus DIRECTORY]
+[--output FILE] [--baseline FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from wand.image import Image
+from wand.version import MAGICK_VERSION, VERSION as WAND_VERSION
+
+# Allow running from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_artwork_encode import DEFAULTS, SETTINGS, SIZES
+from imageconverter import ImageConverter
+
+# Formats of the thumbnails YouTube serves, by extension
+SOURCES: list[str] = ["webp", "jpg"]
+
+# Artwork file formats, by extension
+TARGETS: list[str] = ["png", "jpg"]
+
+
+def make_corpus(directory: str, copies: int) -> dict[str, list[str]]:
+    """
+    Generate the thumbnails. Thumbnails already in the directory are kept, so every run converts the same images
+    :param directory: Directory of the corpus
+    :param copies: Thumbnails of each size
+    :return: Paths of the thumbnails of each source format: {extension: [paths]}
+    """
+
+    corpus: dict[str, list[str]] = {ext: [] for ext in SOURCES}
+
+    for width, height in SIZES:
+        for i in range(copies):
+            paths: dict[str, str] = {ext: os.path.join(directory, f"{width}x{height}_{i}.{ext}") for ext in SOURCES}
+
+            # The same image in every source format
+            if not all(map(os.path.exists, paths.values())):
+                with Image(width=width, height=height, pseudo="plasma:") as image:
+                    for ext, path in paths.items():
+                        ImageConverter.write(path=path, data=image.make_blob(ext))
+
+            for ext, path in paths.items():
+                corpus[ext].append(path)
+
+    return corpus
+
+
+def convert(mode: str, io: str, thumbnails: list[bytes], target_ext: str, settings: dict, workers: int,
+            directory: str) -> tuple[float, int]:
+    """
+    Convert every thumbnail once
+    :param mode: 'serial' or 'pooled'
+    :param io: 'memory' or 'disk'
+    :param thumbnails: The thumbnails, as fetched
+    :param target_ext: Extension of the artwork file format
+    :param settings: Encode settings. See `ImageConverter.encode`
+    :param workers: Processes of the pool. 0 = Number of CPU cores
+    :param directory: Directory to write to. Emptied afterwards
+    :return: (seconds, bytes written)
+    """
+
+    targets: list[str] = [os.path.join(directory, f"{i}.{target_ext}") for i in range(len(thumbnails))]
+    start: float = time.perf_counter()
+
+    if io == "disk":
+        sources: list[str | bytes] = []
+
+        for i, thumbnail in enumerate(thumbnails):
+            sources.append(os.path.join(directory, f"{i}.source"))
+            ImageConverter.write(path=sources[-1], data=thumbnail)
+
+    else:
+        sources: list[str | bytes] = list(thumbnails)
+
+    if mode == "serial":
+        for source, target in zip(sources, targets):
+            ImageConverter.convert(source=source, target=target, settings=settings)
+
+    else:
+        results: list = ImageConverter(workers=workers, settings=settings).convert_all(jobs=list(zip(sources,
+                                                                                                     targets)))
+        failed: list = [result for result in results if isinstance(result, Exception)]
+
+        if failed:
+            raise RuntimeError(f"{len(failed)} conversion(s) failed: {failed[0]}")
+
+    elapsed: float = time.perf_counter() - start
+    size: int = sum(os.path.getsize(target) for target in targets)
+
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+
+    return elapsed, size
+
+
+def scenarios() -> list[dict]:
+    """
+    List the scenarios to run
+    :return: List of {'name', 'mode', 'io', 'source', 'target', 'settings'}
+    """
+
+    listed: list[dict] = []
+
+    for mode in ("serial", "pooled"):
+        for io in ("memory", "disk"):
+            for source in SOURCES:
+                for target in TARGETS:
+                    # Saved without converting. See `ImageConverter.submit`
+                    if ImageConverter.EXTENSIONS[source] == ImageConverter.EXTENSIONS[target]:
+                        continue
+
+                    listed.append({"name": f"{mode}/{io} {source}->{target}", "mode": mode, "io": io,
+                                   "source": source, "target": target, "settings": DEFAULTS})
+
+    for target in TARGETS:
+        for name, changes in SETTINGS[target]:
+            listed.append({"name": f"settings {target}: {name}", "mode": "serial", "io": "memory", "source": "webp",
+                           "target": target, "settings": {**DEFAULTS, **changes}})
+
+    return listed
+
+
+def run(scenario: dict, thumbnails: list[bytes], repeats: int, workers: int) -> dict:
+    """
+    Run a scenario
+    :return: The scenario with its results. Times are the median of the repeats
+    """
+
+    times: list[float] = []
+    size: int = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(repeats):
+            elapsed, size = convert(mode=scenario["mode"], io=scenario["io"], thumbnails=thumbnails,
+                                    target_ext=scenario["target"], settings=scenario["settings"], workers=workers,
+                                    directory=tmp)
+            times.append(elapsed)
+
+    seconds: float = statistics.median(times)
+    input_bytes: int = sum(map(len, thumbnails))
+
+    return {**scenario, "images": len(thumbnails), "input_bytes": input_bytes, "output_bytes": size,
+            "seconds": seconds, "seconds_min": min(times), "ms_per_image": seconds / len(thumbnails) * 1000,
+            "images_per_s": len(thumbnails) / seconds, "input_mib_per_s": input_bytes / 1024 ** 2 / seconds}
+
+
+def environment() -> dict:
+    """
+    Get the machine and versions the results are measured with
+    """
+
+    try:
+        commit: str | None = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                            cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "wand": WAND_VERSION,
+        "imagemagick": MAGICK_VERSION
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite of the artwork conversion stage")
+    parser.add_argument("--copies", type=int, default=4, help="Thumbnails of each size")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs of each scenario")
+    parser.add_argument("--workers", type=int, default=0, help="Conversion processes. 0 = Number of CPU cores")
+    parser.add_argument("--corpus", type=str, default=os.path.join(tempfile.gettempdir(), "artwork-corpus"),
+                        help="Directory of the corpus. Generated if missing")
+    parser.add_argument("--output", type=str, default="bench_artwork_suite.json", help="File to write the results to")
+    parser.add_argument("--baseline", type=str, default=None, help="Results of an earlier run to compare to")
+    args = parser.parse_args()
+
+    corpus: dict[str, list[str]] = make_corpus(directory=args.corpus, copies=args.copies)
+    thumbnails: dict[str, list[bytes]] = {ext: [Path(path).read_bytes() for path in paths]
+                                          for ext, paths in corpus.items()}
+
+    baseline: dict[str, dict] = {}
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = {result["name"]: result for result in json.load(f)["results"]}
+
+    workers: int = args.workers or os.cpu_count() or 1
+
+    print(f"{sum(map(len, corpus.values()))} thumbnails in {args.corpus}, {args.copies} of each size from "
+          f"{SIZES[0][0]}x{SIZES[0][1]} to {SIZES[-1][0]}x{SIZES[-1][1]}, {args.repeats} run(s), {workers} worker(s)\n")
+    print(f"{'Scenario':<44}  {'Time':>9}  {'Rate':>9}  {'Size':>10}{'  Change' if baseline else ''}")
+
+    results: list[dict] = []
+
+    for scenario in scenarios():
+        result: dict = run(scenario=scenario, thumbnails=thumbnails[scenario["source"]], repeats=args.repeats,
+                           workers=args.workers)
+        results.append(result)
+
+        change: str = ""
+
+        if scenario["name"] in baseline:
+            change = f"  {result['ms_per_image'] / baseline[scenario['name']]['ms_per_image'] - 1:>+6.1%}"
+
+        print(f"{scenario['name']:<44}  {result['ms_per_image']:>7.1f}ms  {result['images_per_s']:>5.1f}/s  "
+              f"{result['output_bytes'] / result['images'] / 1024:>6.1f} KiB{change}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "corpus": {"directory": args.corpus, "copies": args.copies,
+                                                             "sizes": SIZES},
+                   "repeats": args.repeats, "workers": workers, "results": results}, f, indent=2)
+
+    print(f"\nPer image, median of {args.repeats} run(s). Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+bench_artwork_tail.py: Measures how long artwork conversion runs after the last thumbnail is downloaded
+
+Thumbnails arrive one by one, like a playlist download, and are converted to PNG or JPG:
+- After: every thumbnail is converted once the last one has arrived (conversion after `ydl.download` returns)
+- Streamed: each thumbnail is handed to the image converter as it arrives, like `ArtworkPP` does
+
+The tail is the time from the last arrival to the last finished conversion. Downloads are simulated with a fixed
+time per thumbnail, so it runs fully offline.
+
+Usage: python benchmarks/bench_artwork_tail.py [--items N] [--fetch-ms MS] [--size 1280x720] [--format png]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from wand.image import Image
+
+# Allow running from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from imageconverter import ImageConverter
+
+
+def make_thumbnail(width: int, height: int) -> bytes:
+    """
+    Make a WEBP thumbnail with enough detail to take a realistic time to convert
+    """
+
+    with Image(width=width, height=height, pseudo="plasma:") as image:
+        return image.make_blob("webp")
+
+
+def arrive(directory: str, thumbnail: bytes, count: int, fetch_ms: int, on_arrival) -> float:
+    """
+    Write the thumbnails one by one, as if each took fetch_ms to download
+    :param on_arrival: Called with the path of each thumbnail once it is written
+    :return: `time.perf_counter()` when the last thumbnail arrived
+    """
+
+    for i in range(count):
+        time.sleep(fetch_ms / 1000)
+
+        path: str = os.path.join(directory, f"{i}.webp")
+
+        with open(path, "wb") as f:
+            f.write(thumbnail)
+
+        on_arrival(path)
+
+    return time.perf_counter()
+
+
+def bench(mode: str, thumbnail: bytes, count: int, fetch_ms: int, ext: str, workers: int) -> dict[str, float]:
+    """
+    Download and convert the thumbnails
+    :param mode: 'after' or 'streamed'
+    :return: Dictionary of the total time and the tail in seconds
+    """
+
+    with tempfile.TemporaryDirectory() as tmp:
+        converter: ImageConverter = ImageConverter(workers=workers)
+
+        # Workers are started before the downloads in both modes, so only the conversions are timed
+        converter.start()
+
+        arrived: list[str] = []
+        start: float = time.perf_counter()
+
+        if mode == "after":
+            last_arrival: float = arrive(directory=tmp, thumbnail=thumbnail, count=count, fetch_ms=fetch_ms,
+                                         on_arrival=arrived.append)
+            results: list = converter.convert_all(jobs=[(path, f"{os.path.splitext(path)[0]}.{ext}")
+                                                        for path in arrived])
+
+        else:
+            last_arrival: float = arrive(directory=tmp, thumbnail=thumbnail, count=count, fetch_ms=fetch_ms,
+                                         on_arrival=lambda path: converter.submit(
+                                             source=path, target=f"{os.path.splitext(path)[0]}.{ext}"))
+            results: list = converter.finish()
+
+        end: float = time.perf_counter()
+
+        failed: list = [result for result in results if isinstance(result, Exception)]
+
+        if failed:
+            raise RuntimeError(f"{len(failed)} conversion(s) failed: {failed[0]}")
+
+    return {"total": end - start, "tail": end - last_arrival}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the artwork conversion tail")
+    parser.add_argument("--items", type=int, default=100, help="Number of thumbnails")
+    # yt-dlp extracts each video before writing its thumbnail, so each item takes a while
+    parser.add_argument("--fetch-ms", type=int, default=250, help="Download time of each thumbnail in milliseconds")
+    parser.add_argument("--size", type=str, default="1280x720", help="Size of the thumbnails")
+    parser.add_argument("--format", type=str, default="png", choices=["png", "jpg"], help="Artwork file format")
+    parser.add_argument("--workers", type=int, default=0, help="Conversion processes. 0 = Number of CPU cores")
+    args = parser.parse_args()
+
+    width, height = map(int, args.size.split("x"))
+    thumbnail: bytes = make_thumbnail(width=width, height=height)
+
+    print(f"{args.items} thumbnails of {args.size} to {args.format.upper()}, {args.fetch_ms} ms per download, "
+          f"{args.workers or os.cpu_count()} worker(s)\n")
+    print(f"{'Mode':<10}  {'Total':>8}  {'Tail':>8}")
+
+    for mode in ("after", "streamed"):
+        timings: dict[str, float] = bench(mode=mode, thumbnail=thumbnail, count=args.items, fetch_ms=args.fetch_ms,
+                                          ext=args.format, workers=args.workers)
+
+        print(f"{mode:<10}  {timings['total']:>7.2f}s  {timings['tail'] * 1000:>6.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
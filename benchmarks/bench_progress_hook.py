@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+bench_progress_hook.py: Measures the cost of drawing the download status from yt-dlp's progress hook
+
+yt-dlp calls the progress hook for every chunk it receives, on the download thread. Each report is handled:
+- None: not drawn at all, the cost of the hook itself
+- Direct: drawn on the download thread with `DwnMenu.Download.download_status` (how every report was drawn before)
+- Renderer: handed to `ProgressRenderer.update`, and drawn by the renderer at its refresh rate
+
+Prints the time each report takes on the download thread, and how many times the status was drawn. The status is
+drawn to os.devnull, or to the terminal with --terminal, which is slower and closer to a real download.
+Runs fully offline.
+
+Usage: python benchmarks/bench_progress_hook.py [--events N] [--interval SECONDS] [--terminal]
+"""
+
+import argparse
+import os
+import sys
+import time
+from contextlib import nullcontext, redirect_stdout
+from pathlib import Path
+
+# Allow running from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from menu.menu_downloader import DwnMenu
+from progressrenderer import ProgressRenderer
+
+# Size of the simulated download
+TOTAL_BYTES: int = 1024 ** 3
+
+
+def reports(count: int):
+    """
+    Generate the progress reports of a download, as `Backend.download_callback` passes them on
+    """
+
+    for i in range(1, count + 1):
+        downloaded: int = TOTAL_BYTES * i // count
+
+        yield {"cur_item": 1, "total_items": 1, "downloaded": downloaded, "total": TOTAL_BYTES,
+               "dwn_percent": round(downloaded / TOTAL_BYTES * 100, 1), "status": 1, "title": "Benchmark"}
+
+
+def bench(mode: str, count: int, interval: float) -> tuple[float, int]:
+    """
+    Report the progress of a download
+    :param mode: 'none', 'direct' or 'renderer'
+    :return: (microseconds per report on the reporting thread, times the status was drawn)
+    """
+
+    draws: list[int] = [0]
+
+    def render(**report) -> None:
+        draws[0] += 1
+        DwnMenu.Download.download_status(**report)
+
+    renderer: ProgressRenderer = ProgressRenderer(render=render, interval=interval)
+
+    match mode:
+        case "none":
+            hook = lambda **report: None
+
+        case "direct":
+            hook = render
+
+        case _:
+            hook = renderer.update
+            renderer.start()
+
+    start: float = time.perf_counter()
+
+    for report in reports(count=count):
+        hook(**report)
+
+    elapsed: float = time.perf_counter() - start
+
+    renderer.stop()
+
+    return elapsed / count * 1_000_000, draws[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark drawing the download status from the progress hook")
+    parser.add_argument("--events", type=int, default=100000, help="Progress reports of the download")
+    parser.add_argument("--interval", type=float, default=ProgressRenderer.INTERVAL,
+                        help="Seconds between draws of the renderer")
+    parser.add_argument("--terminal", action="store_true", help="Draw to the terminal instead of os.devnull")
+    args = parser.parse_args()
+
+    results: dict[str, tuple[float, int]] = {}
+
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        for mode in ("none", "direct", "renderer"):
+            with nullcontext() if args.terminal else redirect_stdout(devnull):
+                results[mode] = bench(mode=mode, count=args.events, interval=args.interval)
+
+            if args.terminal:
+                print()
+
+    print(f"{args.events} progress reports, drawn to {'the terminal' if args.terminal else 'os.devnull'}, "
+          f"renderer at {1 / args.interval:.0f} Hz\n")
+    print(f"{'Mode':<10}  {'Per report':>11}  {'Draws':>8}")
+
+    for mode, (us, draws) in results.items():
+        print(f"{mode.capitalize():<10}  {us:>9.2f}us  {draws:>8}")
+
+
+if __name__ == "__main__":
+    main()
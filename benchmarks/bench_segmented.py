@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""
+bench_segmented.py: Compares the segmented multi-connection downloader against yt-dlp's single-connection downloader
+
+A local HTTP server limits the speed of each connection, like many media servers do. The same file is downloaded:
+- Native: yt-dlp's HttpFD over one connection
+- Segmented: SegmentedFD over N connections, picked by SegmentedYoutubeDL
+
+Runs fully offline.
+
+Usage: python benchmarks/bench_segmented.py [--size MIB] [--rate KIB_PER_S] [--connections 2,4,8]
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Allow running from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import yt_dlp as yt
+
+from segmented import SegmentedYoutubeDL
+from utility.utils_misc import MiscUtilities
+
+
+def make_handler(data: bytes, rate: int) -> type[BaseHTTPRequestHandler]:
+    """
+    Make a request handler that serves a file with Range support, at a limited speed per connection
+    :param data: Content of the file
+    :param rate: Bytes per second for each connection
+    """
+
+    class ThrottledHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            start, end = 0, len(data) - 1
+            match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range") or "")
+
+            if match:
+                start = int(match.group(1))
+                end = min(int(match.group(2)), end) if match.group(2) else end
+
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+
+            else:
+                self.send_response(200)
+
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Content-Type", "video/mp4")
+            self.end_headers()
+
+            # Send in small steps, sleeping to keep each connection at the rate
+            step: int = max(rate // 20, 1)
+            sent_at: float = time.perf_counter()
+
+            try:
+                for offset in range(start, end + 1, step):
+                    self.wfile.write(data[offset:min(offset + step, end + 1)])
+
+                    sent_at += step / rate
+                    time.sleep(max(sent_at - time.perf_counter(), 0))
+
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    return ThrottledHandler
+
+
+def download(url: str, path: Path, size: int, connections: int) -> float:
+    """
+    Download the file and check it
+    :param connections: Number of connections. 0 = yt-dlp's native downloader
+    :return: Seconds taken
+    """
+
+    params: dict = {"quiet": True, "noprogress": True, "logger": None, "retries": 3}
+
+    if connections:
+        params["concurrent_fragment_downloads"] = connections
+
+    info: dict = {"id": "bench", "url": url, "ext": "mp4", "protocol": "http", "http_headers": {}}
+
+    with (SegmentedYoutubeDL if connections else yt.YoutubeDL)(params) as ydl:
+        start: float = time.perf_counter()
+        ydl.dl(str(path), info)
+        elapsed: float = time.perf_counter() - start
+
+    if os.path.getsize(path) != size:
+        raise RuntimeError(f"Incomplete download: {os.path.getsize(path)} of {size} bytes")
+
+    path.unlink()
+
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark segmented vs single-connection downloads")
+    parser.add_argument("--size", type=int, default=16, help="File size in MiB")
+    parser.add_argument("--rate", type=int, default=2048, help="Speed limit of each connection in KiB/s")
+    parser.add_argument("--connections", type=str, default="2,4,8", help="Connection counts to test")
+    args = parser.parse_args()
+
+    size: int = args.size * 1024 ** 2
+    data: bytes = os.urandom(size)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(data=data, rate=args.rate * 1024))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    url: str = f"http://127.0.0.1:{server.server_port}/media.mp4"
+
+    print(f"{MiscUtilities.convert_bytes(size)} file, {args.rate} KiB/s per connection\n")
+    print(f"{'Downloader':<16} {'Time':>8} {'Speed':>14}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for connections in [0, *map(int, args.connections.split(","))]:
+            name: str = f"segmented x{connections}" if connections else "native"
+            elapsed: float = download(url=url, path=Path(tmp) / "media.mp4", size=size, connections=connections)
+
+            print(f"{name:<16} {elapsed:>7.2f}s {MiscUtilities.convert_bytes(int(size / elapsed)) + '/s':>14}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""
+bench_singlepass.py: Compares the single-pass post-processing chain against chained yt-dlp post-processors
+
+For each item, a generated audio track is converted to MP3 with metadata and cover art:
+- Chained: FFmpegExtractAudio -> FFmpegMetadata -> EmbedThumbnail. Each rewrites the whole file
+- Single-pass: AudioPP with metadata and thumbnail enabled. Writes the file once
+
+Runs fully offline. Requires ffmpeg.
+
+Usage: python benchmarks/bench_singlepass.py [--items N] [--duration SECONDS]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Allow running from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import yt_dlp as yt
+from yt_dlp.postprocessor import EmbedThumbnailPP, FFmpegExtractAudioPP, FFmpegMetadataPP
+
+from postprocessors import AudioPP
+from utility.utils_misc import MiscUtilities
+
+
+def make_sources(work_dir: Path, duration: int) -> tuple[Path, Path]:
+    """
+    Generate an Opus track and a JPEG thumbnail
+    :param work_dir: Directory to write to
+    :param duration: Length of the track in seconds
+    :return: Paths to the track and the thumbnail
+    """
+
+    track: Path = work_dir / "source.webm"
+    thumbnail: Path = work_dir / "source.jpg"
+
+    subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi",
+                    "-i", f"sine=frequency=440:duration={duration}",
+                    "-c:a", "libopus", "-b:a", "128k", str(track)], check=True)
+    subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc=size=1280x720",
+                    "-frames:v", "1", str(thumbnail)], check=True)
+
+    return track, thumbnail
+
+
+def make_info(track: Path, thumbnail: Path, work_dir: Path, name: str) -> dict:
+    """
+    Copy the sources and build a yt-dlp info dictionary for them
+    """
+
+    item_track: Path = work_dir / f"{name}.webm"
+    item_thumb: Path = work_dir / f"{name}.jpg"
+
+    shutil.copyfile(track, item_track)
+    shutil.copyfile(thumbnail, item_thumb)
+
+    return {
+        "id": name,
+        "title": f"Benchmark {name}",
+        "uploader": "yt-dlp-adv2",
+        "upload_date": "20250101",
+        "webpage_url": "https://www.youtube.com/watch?v=benchmark",
+        "ext": "webm",
+        "acodec": "opus",
+        "vcodec": "none",
+        "filepath": str(item_track),
+        "thumbnails": [{"id": "0", "url": "https://example.invalid/0.jpg", "filepath": str(item_thumb)}],
+        "__files_to_move": {}
+    }
+
+
+def run_chained(ydl: yt.YoutubeDL, info: dict) -> tuple[int, int]:
+    """
+    Run the chained post-processors
+    :return: (ffmpeg passes, bytes written)
+    """
+
+    passes: int = 0
+    written: int = 0
+
+    for pp in (FFmpegExtractAudioPP(ydl, preferredcodec="mp3", preferredquality="0"),
+               FFmpegMetadataPP(ydl, add_metadata=True),
+               EmbedThumbnailPP(ydl)):
+        info = ydl.run_pp(pp, info)
+
+        # Every post-processor writes the whole file again
+        passes += 1
+        written += os.path.getsize(info["filepath"])
+
+    return passes, written
+
+
+def run_single(ydl: yt.YoutubeDL, info: dict) -> tuple[int, int]:
+    """
+    Run the single-pass post-processor
+    :return: (ffmpeg passes, bytes written)
+    """
+
+    stats: dict[str, int] = {}
+    ydl.run_pp(AudioPP(ydl, file_format=1, metadata=True, thumbnail=True, stats=stats), info)
+
+    return stats["ffmpeg_passes"], stats["bytes_written"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark single-pass vs chained post-processing")
+    parser.add_argument("--items", type=int, default=5, help="Number of items per approach")
+    parser.add_argument("--duration", type=int, default=240, help="Track length in seconds")
+    args = parser.parse_args()
+
+    if not shutil.which("ffmpeg"):
+        print("ffmpeg is required for this benchmark.")
+        sys.exit(1)
+
+    ydl = yt.YoutubeDL({"quiet": True, "logger": None})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir: Path = Path(tmp)
+        track, thumbnail = make_sources(work_dir=work_dir, duration=args.duration)
+
+        results: dict[str, list[float]] = {}
+
+        for name, runner in (("chained", run_chained), ("single-pass", run_single)):
+            passes: int = 0
+            written: int = 0
+            start: float = time.perf_counter()
+
+            for i in range(args.items):
+                p, w = runner(ydl, make_info(track, thumbnail, work_dir, f"{name}-{i}"))
+                passes += p
+                written += w
+
+            results[name] = [passes / args.items, written / args.items, (time.perf_counter() - start) / args.items]
+
+    print(f"{'Approach':<12} {'Passes/item':>12} {'Written/item':>14} {'Time/item':>10}")
+
+    for name, (passes, written, seconds) in results.items():
+        print(f"{name:<12} {passes:>12.1f} {MiscUtilities.convert_bytes(int(written)):>14} {seconds:>9.2f}s")
+
+
+if __name__ == "__main__":
+    main()
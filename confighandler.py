@@ -7,6 +7,8 @@ from pathlib import PurePosixPath
 
 from ruamel.yaml import YAML
 
+from ffmpegbudget import FFmpegBudget
+from imageconverter import ImageConverter
 from menu.menu_configeditor import ConfigMenu
 from menu.menu_input import Input
 from menu.menu_misc import MiscMenu
@@ -176,7 +178,14 @@ class ConfigValidator:
         self.path_prefs: list[str] = [
             "video_directory",
             "audio_directory",
-            "artwork_directory"
+            "artwork_directory",
+            "library_directory"
+        ]
+
+        # Preferences that are a number of connections or threads, so at least 1
+        self.positive_prefs: list[str] = [
+            "download_connections",
+            "artwork_workers"
         ]
 
         self.validate_config()
@@ -227,6 +236,51 @@ class ConfigValidator:
 
                 self.validate_pnformat(key=key)
 
+            elif key == "ffmpeg_ionice" and value not in FFmpegBudget.IONICE_CLASSES:
+                # Validate I/O scheduling class
+
+                err: ConfigError = ConfigError(err_code=2,
+                                               msg=f"'{key}': Value must be one of "
+                                                   f"{", ".join(f"'{c}'" for c in FFmpegBudget.IONICE_CLASSES)}"
+                                                   f"\n      Current value: '{value}'")
+                self.config_errors.append(err)
+
+            elif key == "ffmpeg_nice" and isinstance(value, int):
+                # Validate niceness
+                lowest, highest = FFmpegBudget.NICE_RANGE
+
+                if not lowest <= value <= highest:
+                    err: ConfigError = ConfigError(err_code=2, msg=f"'{key}': Value must be from {lowest} to {highest}"
+                                                                   f"\n      Current value: '{value}'")
+                    self.config_errors.append(err)
+
+            elif key == "artwork_variants" and isinstance(value, str):
+                # Validate artwork variants
+
+                try:
+                    ImageConverter.parse_variants(variants=value, default_ext="png")
+
+                except ValueError as e:
+                    err: ConfigError = ConfigError(err_code=2, msg=f"'{key}': {e}. e.g. '640, 320:jpg'"
+                                                                   f"\n      Current value: '{value}'")
+                    self.config_errors.append(err)
+
+            elif key in ImageConverter.ENCODE_RANGES and isinstance(value, int):
+                # Validate encode settings
+                lowest, highest = ImageConverter.ENCODE_RANGES[key]
+
+                if not lowest <= value <= highest:
+                    err: ConfigError = ConfigError(err_code=2, msg=f"'{key}': Value must be from {lowest} to {highest}"
+                                                                   f"\n      Current value: '{value}'")
+                    self.config_errors.append(err)
+
+            elif key in self.positive_prefs and isinstance(value, int) and value < 1:
+                # Validate number of connections or threads
+
+                err: ConfigError = ConfigError(err_code=2, msg=f"'{key}': Value must be 1 or more"
+                                                               f"\n      Current value: '{value}'")
+                self.config_errors.append(err)
+
             if isinstance(value, str) and key in self.path_prefs:
                 # Validate path
 
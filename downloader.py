@@ -1,18 +1,197 @@
+import os
+import sys
+import time
 from math import ceil
 from pathlib import Path
-from threading import Thread
+from contextlib import nullcontext
+from threading import Thread, Event
 
 import yt_dlp as yt
-
+from yt_dlp.utils import PostProcessingError
+
+from archive import DownloadArchive
+from ffmpegbudget import FFmpegBudget
+from formatselector import FormatSelector
+from library import Library
+from postprocessors import ArchivePP, ArtworkPP, AudioPP, ContainerPP, LibraryPP, OutputsPP, VideoTagPP
+from segmented import SegmentedFD, SegmentedYoutubeDL
+from utility.utils_downloader import DwnUtilities
+from utility.utils_misc import MiscUtilities
 from videoquality import VideoQuality
 
 
+class DownloadControl:
+    """
+    Cooperative pause, resume and cancel for a running download.
+    All methods are safe to call from any thread, so the same object can be driven by the
+    terminal key bindings or directly by other code (e.g. a job runner)
+    """
+
+    # Key bindings for the terminal
+    KEY_PAUSE: str = "p"
+    KEY_RESUME: str = "r"
+    KEY_CANCEL: str = "c"
+
+    def __init__(self):
+        self.paused: bool = False
+        self.cancelled: bool = False
+
+        # Set while not paused
+        self._resume_event: Event = Event()
+        self._resume_event.set()
+
+        # Set to stop the key listener
+        self._stop_event: Event = Event()
+        self._listener: Thread | None = None
+
+        # Set while no download thread is running. After CTRL+C, `Downloader.download` can return while the thread
+        # is still in a stage that can't be cancelled
+        self.idle: Event = Event()
+        self.idle.set()
+
+    def pause(self) -> None:
+        """
+        Request a pause. yt-dlp is stopped at the next progress update and the .part file is kept
+        """
+
+        if not self.cancelled:
+            self.paused = True
+            self._resume_event.clear()
+
+    def resume(self) -> None:
+        """
+        Resume a paused download
+        """
+
+        self.paused = False
+        self._resume_event.set()
+
+    def cancel(self) -> None:
+        """
+        Request a cancel. yt-dlp is stopped at the next progress update and the .part file is kept
+        """
+
+        self.cancelled = True
+        self.paused = False
+        self._resume_event.set()
+
+    def check(self, pause: bool = True) -> None:
+        """
+        Called from the progress hook, the match filter and before each post-processor. Raises DownloadCancelled to
+        stop yt-dlp if a pause or cancel was requested
+        :param pause: If False, only stop for a cancel. Post-processing isn't paused half-way through an item
+        """
+
+        if self.cancelled:
+            raise yt.DownloadCancelled("Download cancelled")
+
+        if self.paused and pause:
+            raise yt.DownloadCancelled("Download paused")
+
+    def wait_for_resume(self) -> bool:
+        """
+        Block while paused
+        :return: True if resumed, False if cancelled
+        """
+
+        # Wait in small steps so CTRL+C still reaches the main thread
+        while not self._resume_event.wait(timeout=0.2):
+            pass
+
+        return not self.cancelled
+
+    def start_key_listener(self) -> bool:
+        """
+        Listen for the pause/resume/cancel keys on the terminal in a background thread
+        :return: True if the listener was started. Not started if stdin is not a terminal
+        """
+
+        if not sys.stdin.isatty():
+            return False
+
+        self._stop_event.clear()
+        self._listener = Thread(target=self._listen_keys, daemon=True)
+        self._listener.start()
+
+        return True
+
+    def stop_key_listener(self) -> None:
+        """
+        Stop the key listener and restore the terminal
+        """
+
+        self._stop_event.set()
+
+        if self._listener:
+            self._listener.join()
+            self._listener = None
+
+    def _listen_keys(self) -> None:
+        import select
+        import termios
+        import tty
+
+        fd: int = sys.stdin.fileno()
+        old_settings = termios.tcgetattr(fd)
+
+        try:
+            # Read single keys without echoing them into the status line
+            tty.setcbreak(fd)
+
+            while not self._stop_event.is_set():
+                ready, _, _ = select.select([fd], [], [], 0.2)
+
+                if not ready:
+                    continue
+
+                match sys.stdin.read(1).lower():
+                    case DownloadControl.KEY_PAUSE:
+                        self.pause()
+
+                    case DownloadControl.KEY_RESUME:
+                        self.resume()
+
+                    case DownloadControl.KEY_CANCEL:
+                        self.cancel()
+
+        finally:
+            termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
+
+
 class Downloader:
     """
     Handles the downloading of videos, audio, and thumbnails
     Basically, all the yt-dlp functionality
     """
 
+    # Key in the yt-dlp options for custom post-processors: list of (class, kwargs, when)
+    # The classes are created for each download, since yt-dlp only accepts built-in post-processors as options
+    CUSTOM_PPS: str = "adv_postprocessors"
+
+    # Key in the yt-dlp options for the size and bitrate limits: {"item_bytes": int, "job_bytes": int, "vbr": int}
+    # 0 = No limit. Enforced by the match filter and progress hook in `Downloader.download`
+    LIMITS: str = "adv_limits"
+
+    # Key in the yt-dlp options for reusing local files: {'library', 'entry', 'dedup', 'derive_audio'}.
+    # See `Downloader.link_copy` and `Downloader.derive_audio`
+    LIBRARY: str = "adv_library"
+
+    # Key in the yt-dlp options for the CPU budget of ffmpeg. See `FFmpegBudget`
+    CPU_BUDGET: str = "adv_cpu_budget"
+
+    # Key in the yt-dlp options for skipping archived items: {'archive', 'profile'}. See `DownloadArchive`
+    ARCHIVE: str = "adv_archive"
+
+    # Key in the yt-dlp options for downloading single-file formats over several connections: bool.
+    # See `SegmentedYoutubeDL`
+    SEGMENTED: str = "adv_segmented"
+
+    # Seconds to wait for the download to stop after CTRL+C
+    CANCEL_TIMEOUT: float = 10.0
+
+    # Keys only used by the Downloader, not passed to yt-dlp
+    CUSTOM_KEYS: tuple[str, ...] = (CUSTOM_PPS, LIMITS, LIBRARY, CPU_BUDGET, ARCHIVE, SEGMENTED)
+
     # Silence yt-dlp output
     class QuietLogger:
 
@@ -25,6 +204,113 @@ class Downloader:
         # Silence errors
         def error(self, msg): pass
 
+    class LimitExceeded(yt.DownloadCancelled):
+        """
+        Raised from the progress hook to stop an item that goes over a size limit
+        """
+
+        def __init__(self, reason: str, item: int):
+            """
+            :param reason: Why the item was stopped
+            :param item: Number of the item in the download
+            """
+
+            super().__init__(reason)
+
+            self.reason: str = reason
+            self.item: int = item
+
+    @staticmethod
+    def check_limits(info: dict, limits: dict[str, int], job_bytes: int) -> str | None:
+        """
+        Check an item against the size and bitrate limits, once its formats have been chosen
+        :param info: yt-dlp info dictionary with the chosen formats
+        :param limits: Limits. See `Downloader.LIMITS`
+        :param job_bytes: Bytes already downloaded in this job
+        :return: Reason the item doesn't fit, or None if it does
+        """
+
+        size: int = FormatSelector.estimate_bytes(info, info.get("duration"))
+
+        if limits["item_bytes"] and size > limits["item_bytes"]:
+            return (f"Larger than the item size limit ({MiscUtilities.convert_bytes(size)} > "
+                    f"{MiscUtilities.convert_bytes(limits['item_bytes'])})")
+
+        if limits["job_bytes"] and job_bytes + size > limits["job_bytes"]:
+            return (f"Would go over the job size limit ({MiscUtilities.convert_bytes(job_bytes + size)} > "
+                    f"{MiscUtilities.convert_bytes(limits['job_bytes'])})")
+
+        # Bitrate of the video stream
+        streams: list[dict] = info.get("requested_formats") or [info]
+        vbr: float = max([f.get("vbr") or f.get("tbr") or 0 for f in streams
+                          if f.get("vcodec") not in (None, "none")], default=0)
+
+        if limits["vbr"] and vbr > limits["vbr"]:
+            return f"Video bitrate is above the limit ({vbr:.0f} > {limits['vbr']} KBit/s)"
+
+        return None
+
+    @staticmethod
+    def link_copy(ydl: yt.YoutubeDL, record: dict, info: dict, stats: dict[str, int],
+                  symlink: bool = False) -> tuple[str, dict] | None:
+        """
+        Link a local copy of an item to its path in this download, instead of downloading it again
+        :param ydl: yt-dlp YoutubeDL instance of the download. Used for the output template
+        :param record: Library record of the local copy
+        :param info: yt-dlp info dictionary of the item. Can be a playlist entry
+        :param stats: Dictionary to add statistics to
+        :param symlink: If True, fall back to a symbolic link instead of a copy
+        :return: Path of the new file and its metadata, or None if a file already exists at the path
+        """
+
+        start: float = time.perf_counter()
+
+        # Use the metadata saved with the copy, with the playlist fields of this download
+        meta: dict = {**record["meta"], **{k: v for k, v in info.items() if k.startswith("playlist") and v is not None}}
+        source: str = Library.source_path(record)
+        path: str = ydl.prepare_filename({**meta, "ext": Path(source).suffix[1:]})
+
+        # Same file, or another file at the path. Leave it to yt-dlp
+        if os.path.exists(path):
+            return None
+
+        method: str = DwnUtilities.link_file(source=source, target=path, symlink=symlink)
+
+        for key, value in (("dedup_files", 1), (f"dedup_{method}", 1), ("dedup_bytes", record["size"]),
+                           ("dedup_ms", round((time.perf_counter() - start) * 1000))):
+            stats[key] = stats.get(key, 0) + value
+
+        return path, meta
+
+    @staticmethod
+    def derive_audio(ydl: yt.YoutubeDL, record: dict, info: dict, pp_args: dict,
+                     stats: dict[str, int]) -> tuple[str, dict]:
+        """
+        Extract the audio of a local video file, instead of downloading the item again
+        :param ydl: yt-dlp YoutubeDL instance of the download. Used for the output template
+        :param record: Library record of the video file
+        :param info: yt-dlp info dictionary of the item. Can be a playlist entry
+        :param pp_args: Options for AudioPP
+        :param stats: Dictionary to add statistics to
+        :return: Path of the audio file and its info dictionary
+        """
+
+        # Use the metadata saved with the video, with the playlist fields of this download
+        meta: dict = {**record["meta"], **{k: v for k, v in info.items() if k.startswith("playlist") and v is not None}}
+
+        pp: AudioPP = AudioPP(ydl, stats=stats, **pp_args)
+        output_path: str = ydl.prepare_filename({**meta, "ext": pp.output_ext(meta)})
+
+        source: str = Library.source_path(record)
+
+        meta = pp.derive(info={**meta, "filepath": source, "ext": Path(source).suffix[1:]},
+                         output_path=output_path)
+
+        stats["local_copies"] = stats.get("local_copies", 0) + 1
+        stats["local_bytes"] = stats.get("local_bytes", 0) + record["size"]
+
+        return output_path, meta
+
     @staticmethod
     def get_title_count(url: str) -> int:
         titles: list[str] = []
@@ -53,26 +339,28 @@ class Downloader:
         return len(titles)
 
     @staticmethod
-    def get_download_size(path: str, unit: str) -> str:
+    def get_download_size(path: str | list[str], unit: str) -> str:
         """
         Get the size of the downloaded file or directory
-        :param path: Direct path to a file or directory
+        :param path: Direct path to a file or directory, or a list of them
         :param unit: Unit name: "KB", "MB", "GB", "Auto"
         :return: String containing the size and unit (bytes)
         """
 
         size_b: int = 0
 
-        # Check if path is a file or directory
-        if Path(path).is_dir():
+        for p in path if isinstance(path, list) else [path]:
 
-            # Iterate through all files in the directory and calculate the size
-            for file in Path(path).iterdir():
-                size_b += file.stat().st_size
+            # Check if path is a file or directory
+            if Path(p).is_dir():
 
-        else:
-            # Get size of single file
-            size_b = Path(path).stat().st_size
+                # Iterate through all files in the directory and calculate the size
+                for file in Path(p).iterdir():
+                    size_b += file.stat().st_size
+
+            else:
+                # Get size of single file
+                size_b += Path(p).stat().st_size
 
         # Convert bytes to desired unit
         match unit.upper():
@@ -145,7 +433,13 @@ class Downloader:
 
     @staticmethod
     def setup_ytdlp_options(dwn_type: int, file_format: int, item_count: int, dwn_dir: str, ff_mode: int,
-                            filename_format: list[str], playlist_name: str, video_quality: str) -> dict:
+                            filename_format: list[str], playlist_name: str, video_quality: str,
+                            embed: dict[str, bool] = None, video_format: str = None,
+                            limits: dict[str, int] = None, sections: str = None, exact_cuts: bool = False,
+                            library: Library = None, derive_audio: bool = False, dedup: bool = False,
+                            outputs: dict[str, dict] = None, connections: int = 1,
+                            cpu_budget: FFmpegBudget = None, reencoded: list[tuple[str, str]] = None,
+                            archive: DownloadArchive = None, artwork_callback=None) -> dict:
         """
         Sets up the yt-dlp options
         :param dwn_type: Download type: 1 = Video, 2 = Audio, 3 = Artwork
@@ -156,9 +450,43 @@ class Downloader:
         :param filename_format: Filename format list
         :param playlist_name: Playlist name
         :param video_quality: Video quality if specified
+        :param embed: What to embed into Video/Audio downloads: {"metadata": bool, "thumbnail": bool, "chapters": bool}
+        :param video_format: yt-dlp format string for Video downloads, if chosen beforehand. See
+        `FormatSelector.smallest_video`
+        :param limits: Size and bitrate limits: {"max_item_size": MB, "max_job_size": MB, "max_video_bitrate": KBit/s}.
+        0 = No limit
+        :param sections: Only download these sections of each item. See `DwnUtilities.parse_sections`
+        :param exact_cuts: If True, re-encode around the cuts so sections start and end exactly
+        :param library: Library to add the finished files to
+        :param derive_audio: Audio: If True, extract the audio of videos already in the library instead of downloading
+        :param dedup: If True, link files already in the library with the same video ID, file format and quality,
+        instead of downloading them again
+        :param outputs: Video: Extra outputs made from each video. {'audio': {'file_format', 'dwn_dir'},
+        'artwork': {'file_format', 'dwn_dir'}}. Either can be left out
+        :param connections: Number of connections for each file. Single files over HTTP are downloaded in segments,
+        and fragmented formats download this many fragments at once
+        :param cpu_budget: Threads, number of processes and priority of ffmpeg
+        :param reencoded: Video: List to add items that had to be re-encoded to fit the file format to, as
+        (title, reason)
+        :param archive: Archive to skip items already downloaded with the same output profile in, and to add
+        finished items to
+        :param artwork_callback: Artwork: Called with each thumbnail as soon as it is fetched into memory. See
+        `ArtworkPP`. None = Let yt-dlp write the thumbnails
         :return: dictionary containing all yt-dlp options
         """
 
+        # Metadata, cover art and chapters are added in the same ffmpeg pass as the audio extraction, or in one pass
+        # after the merge for videos
+        embed = {key: bool((embed or {}).get(key)) for key in ("metadata", "thumbnail", "chapters")}
+
+        # Limits in bytes and KBit/s
+        limits = limits or {}
+        ytdlp_limits: dict[str, int] = {
+            "item_bytes": limits.get("max_item_size", 0) * 1024 ** 2,
+            "job_bytes": limits.get("max_job_size", 0) * 1024 ** 2,
+            "vbr": limits.get("max_video_bitrate", 0)
+        }
+
         # Qualities to yt-dlp format
         ytdlp_qualities: dict[str, str] = {
 
@@ -168,6 +496,7 @@ class Downloader:
             "480p": "bestvideo[height=480]",
             "720p": "bestvideo[height=720][fps<60]",
             "720p60": "bestvideo[height=720][fps=60]",
+            "1080p": "bestvideo[height=1080][fps<60]",
             "1080p60": "bestvideo[height=1080][fps=60]",
             "2K": "bestvideo[height=1440]",
             "4K": "bestvideo[height=2160]",
@@ -195,6 +524,16 @@ class Downloader:
             else:
                 ytdlp_format: str = f"{ytdlp_qualities[video_quality]}+bestaudio"
 
+            # Prefer streams that fit the file format, so they are merged without re-encoding
+            ytdlp_format = FormatSelector.container_format(ytdlp_format=ytdlp_format, file_format=file_format)
+
+            # Use the formats chosen beforehand, falling back to the quality filter
+            if video_format:
+                ytdlp_format = f"{video_format}/{ytdlp_format}"
+
+            if FormatSelector.CONTAINER_SORT[file_format]:
+                ytdlp_options["format_sort"] = FormatSelector.CONTAINER_SORT[file_format]
+
             # Video
             match file_format:
                 case 1:
@@ -209,43 +548,156 @@ class Downloader:
                     ytdlp_options["format"] = ytdlp_format
                     ytdlp_options["merge_output_format"] = "webm"
 
+            # Streams that still don't fit are merged into MKV, then re-encoded. Before tagging, so the tags are
+            # written to the final file
+            if file_format in ContainerPP.TARGETS:
+                container_args: dict = {"file_format": file_format, "log": reencoded}
+
+                ytdlp_options[Downloader.CUSTOM_PPS] = [(ContainerPP, container_args, "video"),
+                                                        (ContainerPP, container_args, "post_process")]
+
+            if any(embed.values()):
+                ytdlp_options.setdefault(Downloader.CUSTOM_PPS, []).append((VideoTagPP, embed, "post_process"))
+
         elif dwn_type == 2:
 
             # Audio
-            match file_format:
-                case 1:
-                    ytdlp_options["postprocessors"] = [{
-                        "key": "FFmpegExtractAudio",
-                        "preferredcodec": "mp3",
-                        "preferredquality": "0",
-                    }]
+            # Only fetch an audio stream. Falls back to a combined file if no audio-only stream exists
+            ytdlp_options["format"] = FormatSelector.audio_format(file_format=file_format)
+            ytdlp_options["format_sort"] = FormatSelector.AUDIO_SORT
 
-                case 2:
-                    ytdlp_options["postprocessors"] = [{
-                        "key": "FFmpegExtractAudio",
-                        "preferredcodec": "vorbis",
-                        "preferredquality": "0",
-                    }]
-
-                case 3:
-                    ytdlp_options["postprocessors"] = [{
-                        "key": "FFmpegExtractAudio",
-                        "preferredcodec": "wav",
-                        "preferredquality": "0",
-                    }]
+            # Extract the audio. Stream-copies when the source codec already fits the target container
+            ytdlp_options[Downloader.CUSTOM_PPS] = [(AudioPP, {"file_format": file_format, **embed}, "post_process")]
 
-                case 4:
-                    ytdlp_options["postprocessors"] = [{
-                        "key": "FFmpegExtractAudio",
-                        "preferredcodec": "flac",
-                        "preferredquality": "0",
-                    }]
+        # Thumbnail for the cover art
+        if dwn_type != 3 and embed["thumbnail"]:
+            ytdlp_options["writethumbnail"] = True
 
-        elif dwn_type == 3:
+        if dwn_type == 3:
 
             # Artwork
             ytdlp_options["skip_download"] = True
-            ytdlp_options["writethumbnail"] = True
+
+            if artwork_callback:
+                # Each thumbnail is fetched into memory and converted while the next ones are downloaded
+                artwork_args: dict = {"callback": artwork_callback, "file_ext": OutputsPP.ARTWORK_EXTS[file_format]}
+
+                ytdlp_options.setdefault(Downloader.CUSTOM_PPS, []).append((ArtworkPP, artwork_args, "before_dl"))
+
+            else:
+                ytdlp_options["writethumbnail"] = True
+
+        elif any(ytdlp_limits.values()):
+
+            # Prefer formats within the limits
+            ytdlp_options["format"] = FormatSelector.apply_limits(ytdlp_format=ytdlp_options["format"],
+                                                                  max_bytes=ytdlp_limits["item_bytes"],
+                                                                  max_vbr=ytdlp_limits["vbr"] if dwn_type == 1 else 0)
+
+            ytdlp_options[Downloader.LIMITS] = ytdlp_limits
+
+        # -------------------------------------------------------------------------------
+        #                               Setup Connections
+        # -------------------------------------------------------------------------------
+
+        if connections > 1 and dwn_type != 3:
+            # Servers often throttle each connection. Progressive formats are fetched in ranges over several
+            # connections, and DASH/HLS formats fetch several fragments at once
+            ytdlp_options[Downloader.SEGMENTED] = True
+            ytdlp_options["concurrent_fragment_downloads"] = connections
+
+        # -------------------------------------------------------------------------------
+        #                               Setup CPU Budget
+        # -------------------------------------------------------------------------------
+
+        if cpu_budget and dwn_type != 3:
+            ytdlp_options.update(cpu_budget.ytdlp_args())
+            ytdlp_options[Downloader.CPU_BUDGET] = cpu_budget
+
+        # -------------------------------------------------------------------------------
+        #                               Setup Sections
+        # -------------------------------------------------------------------------------
+
+        filename: str = filename_format[2]
+
+        if sections and dwn_type != 3:
+            chapters, ranges = DwnUtilities.parse_sections(sections=sections)
+
+            # Only the sections are fetched. yt-dlp hands them to ffmpeg, which seeks with HTTP range requests,
+            # so the transfer is about the length of the sections instead of the whole item
+            ytdlp_options["download_ranges"] = yt.utils.download_range_func(chapters, ranges)
+            ytdlp_options["force_keyframes_at_cuts"] = exact_cuts
+
+            # Several sections of an item need their own files. Add the chapter title or the start time
+            if chapters or len(ranges) > 1:
+                suffix: str = " - %(section_title,section_start)s"
+
+                if filename.endswith(".%(ext)s"):
+                    filename = filename[:-len(".%(ext)s")] + suffix + ".%(ext)s"
+
+                else:
+                    filename += suffix
+
+        # -------------------------------------------------------------------------------
+        #                               Setup Library
+        # -------------------------------------------------------------------------------
+
+        if library and dwn_type != 3:
+            entry: dict = {"dwn_type": dwn_type, "file_format": file_format, "quality": video_quality,
+                           "sections": sections}
+
+            ytdlp_options.setdefault(Downloader.CUSTOM_PPS, []).append(
+                (LibraryPP, {"library": library, "entry": entry}, "after_move"))
+
+            # Sections would have to be cut again, and can be several files, so only whole items are reused
+            reuse: dict = {
+                "library": library,
+                "entry": entry,
+                "dedup": dedup and not sections,
+                "derive_audio": derive_audio and dwn_type == 2 and not sections
+            }
+
+            if reuse["dedup"] or reuse["derive_audio"]:
+                ytdlp_options[Downloader.LIBRARY] = reuse
+
+        # -------------------------------------------------------------------------------
+        #                               Setup Archive
+        # -------------------------------------------------------------------------------
+
+        # Only whole items are archived
+        if archive and dwn_type != 3 and not sections:
+            archived: dict = {
+                "archive": archive,
+                "profile": DownloadArchive.profile(dwn_type=dwn_type, file_format=file_format, quality=video_quality,
+                                                   outputs=list(outputs or {}) if dwn_type == 1 else None)
+            }
+
+            ytdlp_options[Downloader.ARCHIVE] = archived
+            ytdlp_options.setdefault(Downloader.CUSTOM_PPS, []).append((ArchivePP, archived, "after_move"))
+
+        # -------------------------------------------------------------------------------
+        #                               Setup Outputs
+        # -------------------------------------------------------------------------------
+
+        if outputs and dwn_type == 1:
+            audio: dict | None = outputs.get("audio")
+            artwork: dict | None = outputs.get("artwork")
+
+            if artwork:
+                ytdlp_options["writethumbnail"] = True
+
+            pp_args: dict = {
+                "video_dir": dwn_dir,
+                "audio": {"dwn_dir": audio["dwn_dir"], "pp_args": {"file_format": audio["file_format"], **embed}}
+                if audio else None,
+                "artwork": artwork,
+                "keep_thumbnail": embed["thumbnail"],
+                "library": library,
+                "sections": sections
+            }
+
+            # Before the video is tagged, so the thumbnail is still on disk
+            ytdlp_options.setdefault(Downloader.CUSTOM_PPS, []).insert(0, (OutputsPP, pp_args, "post_process"))
 
         # -------------------------------------------------------------------------------
         #                               Setup Path
@@ -255,12 +707,12 @@ class Downloader:
             case 1:
                 # Single item
 
-                ytdlp_options["outtmpl"] = f"{dwn_dir}{filename_format[2]}"
+                ytdlp_options["outtmpl"] = f"{dwn_dir}{filename}"
 
             case 2:
                 # Playlist
 
-                ytdlp_options["outtmpl"] = f"{dwn_dir}{playlist_name}/{filename_format[2]}"
+                ytdlp_options["outtmpl"] = f"{dwn_dir}{playlist_name}/{filename}"
 
         return ytdlp_options
 
@@ -348,7 +800,9 @@ class Downloader:
     @staticmethod
     def download(url: str, ytdlp_options: dict, dwn_type: int, item_count: int, ff_mode: int,
                  filename_format: list[str], titles: list[str], extracted_info: dict[str, list[str]],
-                 progress_callback=None) -> [int, int]:
+                 progress_callback=None, control: DownloadControl = None, stats: dict[str, int] = None,
+                 skipped: list[tuple[str, str]] = None, files: list[str] = None,
+                 local_failed: list[tuple[str, str]] = None) -> [int, int]:
         """
         Download an item
         :param url: YouTube URL
@@ -360,7 +814,14 @@ class Downloader:
         :param titles: List of titles
         :param extracted_info: Dictionary of extracted info
         :param progress_callback: Progress callback
-        :return: Returns True if successful
+        :param control: Pause/resume/cancel control. If None, the download can't be paused
+        :param stats: Dictionary to add download statistics to, if provided
+        :param skipped: List to add items skipped by the size/bitrate limits to, as (title, reason)
+        :param files: List to add the paths of the finished files to, after post-processing
+        :param local_failed: List to add items downloaded because their local copy couldn't be used to, as
+        (title, reason)
+        :return: Returns the download status and the current item.
+        Status is 0 if finished, -1 if failed, -2 if cancelled
         """
 
         dwn_status: int = 0
@@ -372,16 +833,243 @@ class Downloader:
         s_downloaded: int = 0
         s_total: int = 0
 
+        # Last downloaded/total/percent. Used for the paused status
+        l_downloaded: int = 0
+        l_total: int = 1
+        l_percent: float = 0.0
+
         post_processing: bool = False
 
+        if control is None:
+            control = DownloadControl()
+
+        if stats is None:
+            stats = {}
+
+        stats.setdefault("bytes_saved", 0)
+
+        if skipped is None:
+            skipped = []
+
+        if local_failed is None:
+            local_failed = []
+
+        # IDs already counted in the statistics. Finished files are reported again after a resume
+        counted_ids: set[str] = set()
+
+        # Size and bitrate limits
+        limits: dict[str, int] | None = ytdlp_options.get(Downloader.LIMITS)
+
+        # Bytes of finished files in this job, and in the current item
+        job_bytes: int = 0
+        item_bytes: int = 0
+        limit_item: int = 0
+
+        # Files of the current item, deleted if the item goes over a limit
+        item_files: list[str] = []
+
+        def restart_at(item: int) -> None:
+            """
+            Reset the item counters to continue from an item
+            """
+
+            nonlocal cur_item, new_item, cur_process, post_processing
+
+            cur_item = item
+            cur_process = (cur_item - 1) * 2 + 1
+            new_item = cur_item
+            post_processing = False
+
+        def skip_item(item: int, reason: str, downloaded: int = 0, total: int = 0, percent: float = 0.0) -> None:
+            """
+            Record an item skipped by the limits and show it
+            """
+
+            title: str = titles[min(item, len(titles)) - 1]
+            skipped.append((title, reason))
+
+            if progress_callback:
+                progress_callback("skipped", False, downloaded, total, percent, item, len(titles), title)
+                print()
+
+        # Archive of items that are already downloaded
+        archived: dict | None = ytdlp_options.get(Downloader.ARCHIVE)
+
+        # Library to reuse local files from, and the options to extract the audio of videos
+        reuse: dict | None = ytdlp_options.get(Downloader.LIBRARY)
+        library: Library | None = reuse["library"] if reuse else None
+        audio_pp_args: dict = next((args for pp_class, args, _ in ytdlp_options.get(Downloader.CUSTOM_PPS, [])
+                                    if pp_class is AudioPP), {})
+
+        # YoutubeDL instance of the running download
+        active_ydl: yt.YoutubeDL | None = None
+
+        # IDs of items whose local copy couldn't be used. The match filter runs more than once for each item
+        unusable_ids: set[str] = set()
+
+        def reuse_local(info: dict) -> str | None:
+            """
+            Link or extract the item from a local file
+            :return: Path of the new file, or None if there is no usable local file
+            """
+
+            result: tuple[str, dict] | None = None
+
+            if info["id"] in unusable_ids:
+                return None
+
+            # Same item in the same format and quality
+            if reuse["dedup"]:
+                record: dict | None = library.find(info["id"], exact=True, **reuse["entry"])
+
+                if record:
+                    result = Downloader.link_copy(ydl=active_ydl, record=record, info=info, stats=stats,
+                                                  symlink=library.use_store)
+
+            # Audio of a video
+            if not result and reuse["derive_audio"]:
+                record: dict | None = library.find(info["id"], dwn_type=1)
+
+                if record:
+                    # Not caught by the download thread. The item is downloaded instead
+                    try:
+                        result = Downloader.derive_audio(ydl=active_ydl, record=record, info=info,
+                                                         pp_args=audio_pp_args, stats=stats)
+
+                    except (PostProcessingError, OSError) as e:
+                        unusable_ids.add(info["id"])
+                        active_ydl.report_warning(f"Unable to extract the audio of the local copy: {e}")
+                        local_failed.append((titles[min(info.get("playlist_index") or 1, len(titles)) - 1], str(e)))
+
+            if not result:
+                return None
+
+            path, meta = result
+
+            library.add(info=meta, path=path, **reuse["entry"])
+
+            return path
+
+        def match_filter(info: dict, *, incomplete: bool = False) -> str | None:
+            """
+            Reuse items that are already on disk, and skip items that don't fit the limits.
+            Local copies are checked as early as possible, so the item's info doesn't have to be extracted
+            """
+
+            # Runs before each item is extracted, so a pause or cancel doesn't wait for the next download
+            control.check()
+
+            item: int = info.get("playlist_index") or 1
+
+            # Flat playlist entries only have the extractor's key
+            extractor: str | None = info.get("extractor_key") or info.get("ie_key")
+
+            if (archived and extractor and info.get("id") and
+                    (extractor, info["id"], archived["profile"]) in archived["archive"]):
+                # Counted apart from the skipped items, since it was downloaded before
+                stats["archived"] = stats.get("archived", 0) + 1
+
+                if progress_callback:
+                    progress_callback("skipped", False, 0, 0, 0.0, item, len(titles),
+                                      titles[min(item, len(titles)) - 1])
+                    print()
+
+                restart_at(min(item + 1, len(titles)))
+
+                return "Already downloaded"
+
+            path: str | None = reuse_local(info=info) if library and info.get("id") else None
+
+            if path:
+                if files is not None:
+                    files.append(path)
+
+                if archived and extractor:
+                    archived["archive"].add(extractor=extractor, video_id=info["id"], profile=archived["profile"])
+
+                if progress_callback:
+                    size: int = Path(path).stat().st_size
+                    progress_callback("local", False, size, size, 100.0, item, len(titles),
+                                      titles[min(item, len(titles)) - 1])
+                    print()
+
+                restart_at(min(item + 1, len(titles)))
+
+                return "Reused a local copy"
+
+            if not limits or incomplete or "format_id" not in info:
+                return None
+
+            reason: str | None = Downloader.check_limits(info=info, limits=limits, job_bytes=job_bytes)
+
+            if reason:
+                skip_item(item=item, reason=reason)
+                restart_at(min(item + 1, len(titles)))
+
+            return reason
+
+        ytdlp_options["match_filter"] = match_filter
+
+        # Stop a cancelled download before each post-processor, including the custom ones
+        ytdlp_options["postprocessor_hooks"] = [lambda _: control.check(pause=False)]
+
         # Setup progress hook
         def progress_hook(data: dict):
 
             nonlocal dwn_status, cur_item, new_item, cur_process, post_processing, s_downloaded, s_total
+            nonlocal l_downloaded, l_total, l_percent, job_bytes, item_bytes, limit_item
+
+            # Stop yt-dlp if a pause or cancel was requested
+            control.check()
 
             # Get status
             status: str = data.get("status")
 
+            info: dict = data.get("info_dict") or {}
+
+            # Stop the item if it goes over a size limit. Only exact sizes are trusted, not estimates
+            if limits and status in ("downloading", "finished"):
+                item: int = info.get("playlist_index") or 1
+
+                if item != limit_item:
+                    limit_item, item_bytes = item, 0
+                    item_files.clear()
+
+                if data.get("tmpfilename"):
+                    item_files.append(data["tmpfilename"])
+
+                size: int = max(data.get("downloaded_bytes") or 0, data.get("total_bytes") or 0)
+
+                if limits["item_bytes"] and item_bytes + size > limits["item_bytes"]:
+                    raise Downloader.LimitExceeded(
+                        reason=f"Went over the item size limit ({MiscUtilities.convert_bytes(limits['item_bytes'])})",
+                        item=item)
+
+                if limits["job_bytes"] and job_bytes + size > limits["job_bytes"]:
+                    raise Downloader.LimitExceeded(
+                        reason=f"Went over the job size limit ({MiscUtilities.convert_bytes(limits['job_bytes'])})",
+                        item=item)
+
+                if status == "finished":
+                    item_bytes += size
+                    job_bytes += size
+
+                    if data.get("filename"):
+                        item_files.append(data["filename"])
+
+            # Transfer rate of this download. Used to estimate the time saved by reusing local files
+            if status == "finished" and data.get("elapsed"):
+                stats["fetch_bytes"] = stats.get("fetch_bytes", 0) + (data.get("downloaded_bytes") or 0)
+                stats["fetch_ms"] = stats.get("fetch_ms", 0) + round(data["elapsed"] * 1000)
+
+            # Audio: Count the video stream that the default format would have downloaded as well
+
+            if status == "finished" and dwn_type == 2 and info.get("id") not in counted_ids:
+                counted_ids.add(info.get("id"))
+
+                if info.get("vcodec") in (None, "none"):
+                    stats["bytes_saved"] += FormatSelector.estimate_video_bytes(info=info)
+
             # Get title
             title: str = titles[cur_item - 1]
 
@@ -392,6 +1080,8 @@ class Downloader:
 
                 dwn_percent: float = round((downloaded / total) * 100, 1)
 
+                l_downloaded, l_total, l_percent = downloaded, total, dwn_percent
+
                 # Increment current process when download is finished
                 if status == "finished" and cur_process < len(titles) * 2:
                     cur_process += 1
@@ -433,31 +1123,137 @@ class Downloader:
         if dwn_type != 3:
             ytdlp_options["progress_hooks"] = [progress_hook]
 
+        # Record the final path of each file
+        if files is not None:
+            ytdlp_options["post_hooks"] = [files.append]
+
+        # Exception raised in the download thread, if any
+        thread_error: Exception | None = None
+
+        # Set when the download thread ends. Waited on instead of the thread itself, since a join interrupted by
+        # CTRL+C marks the thread as stopped while it still runs
+        thread_done: Event = control.idle
+
         def download_thread():
-            with yt.YoutubeDL(ytdlp_options) as ydl:
-                ydl.download([url])
+            nonlocal thread_error, active_ydl
+
+            try:
+                params: dict = {k: v for k, v in ytdlp_options.items() if k not in Downloader.CUSTOM_KEYS}
+                budget: FFmpegBudget | None = ytdlp_options.get(Downloader.CPU_BUDGET)
+                ydl_class: type = SegmentedYoutubeDL if ytdlp_options.get(Downloader.SEGMENTED) else yt.YoutubeDL
+
+                with budget.applied(stats=stats) if budget else nullcontext(), ydl_class(params) as ydl:
+                    active_ydl = ydl
+
+                    # Add custom post-processors
+                    for pp_class, pp_args, when in ytdlp_options.get(Downloader.CUSTOM_PPS, []):
+                        ydl.add_post_processor(pp_class(ydl, stats=stats, **pp_args), when=when)
+
+                    ydl.download([url])
+
+            except (yt.DownloadError, yt.DownloadCancelled) as e:
+                thread_error = e
+
+            finally:
+                thread_done.set()
+
+        listening: bool = control.start_key_listener() if dwn_type != 3 else False
 
         try:
-            thread: Thread = Thread(target=download_thread)
-            thread.start()
+            while True:
+                thread_error = None
+                thread_done.clear()
+
+                # Not waited for on exit, so a second CTRL+C doesn't wait for a stage that can't be cancelled
+                thread: Thread = Thread(target=download_thread, daemon=True)
+                thread.start()
+
+                try:
+                    # Wait for the download to finish
+                    # Wait in small steps so CTRL+C can be turned into a clean cancel
+                    while not thread_done.wait(timeout=0.2):
+                        pass
+
+                except KeyboardInterrupt:
+                    # Let yt-dlp stop at its next check, keeping the .part file. Extraction and ffmpeg can't be
+                    # stopped half-way, so only wait a while for them. A second CTRL+C stops waiting
+                    control.cancel()
+
+                    try:
+                        thread_done.wait(timeout=Downloader.CANCEL_TIMEOUT)
+
+                    except KeyboardInterrupt:
+                        pass
 
-            # Wait for the download to finish
-            thread.join()
+                    raise
 
-            return dwn_status, cur_item
+                thread.join()
 
-        except (yt.DownloadError, yt.DownloadCancelled) as _:
+                if isinstance(thread_error, Downloader.LimitExceeded):
+                    # Delete the partial files of the item and continue with the next one
+                    for file in item_files:
+                        Path(file).unlink(missing_ok=True)
+                        Path(SegmentedFD.state_path(file)).unlink(missing_ok=True)
+
+                    skip_item(item=thread_error.item, reason=thread_error.reason, downloaded=l_downloaded,
+                              total=l_total, percent=l_percent)
+
+                    if thread_error.item >= len(titles):
+                        thread_error = None
+                        break
+
+                    ytdlp_options["playlist_items"] = f"{thread_error.item + 1}:"
+                    restart_at(thread_error.item + 1)
+                    continue
+
+                if not isinstance(thread_error, yt.DownloadCancelled):
+                    break
+
+                if not control.paused:
+                    # Cancelled
+                    if progress_callback:
+                        progress_callback("cancelled", False, l_downloaded, l_total, l_percent, cur_item,
+                                          len(titles), titles[cur_item - 1])
+                        print()
+
+                    return -2, cur_item
+
+                # Paused: yt-dlp has stopped and the connection is closed. Wait until resumed or cancelled
+                if progress_callback:
+                    progress_callback("paused", False, l_downloaded, l_total, l_percent, cur_item,
+                                      len(titles), titles[cur_item - 1])
+
+                if not control.wait_for_resume():
+                    if progress_callback:
+                        progress_callback("cancelled", False, l_downloaded, l_total, l_percent, cur_item,
+                                          len(titles), titles[cur_item - 1])
+                        print()
+
+                    return -2, cur_item
+
+                # Resume from the current item. Finished items are skipped, the .part file is continued
+                if item_count == 2:
+                    ytdlp_options["playlist_items"] = f"{cur_item}:"
+
+                restart_at(cur_item)
+
+        finally:
+            if listening:
+                control.stop_key_listener()
+
+        if thread_error is not None:
             return -1, cur_item
 
+        return dwn_status, cur_item
+
     @staticmethod
-    def get_video_qualities(url: str) -> list[str]:
+    def get_video_info(url: str) -> dict:
         """
-        Get the available video qualities
+        Get the info of a video, including all formats
         :param url: URL of the YouTube video
-        :return: list of all available video qualities, sorted from highest to lowest
+        :return: yt-dlp info dictionary. Empty if it couldn't be extracted
         """
 
-        qualities: set[str] = set()
         yt_args = {
             "noplaylist": True,
             "quiet": True,
@@ -465,9 +1261,28 @@ class Downloader:
 
         with yt.YoutubeDL(yt_args) as ydl:
             try:
+                return ydl.extract_info(url, download=False)
 
-                # Get formats
-                info: dict = ydl.extract_info(url, download=False)
+            except Exception as e:
+                print(f"Error: {e}")
+                return {}
+
+    @staticmethod
+    def get_video_qualities(url: str, info: dict = None) -> list[str]:
+        """
+        Get the available video qualities
+        :param url: URL of the YouTube video
+        :param info: yt-dlp info dictionary from `Downloader.get_video_info`. Extracted from the URL if not provided
+        :return: list of all available video qualities, sorted from highest to lowest
+        """
+
+        qualities: set[str] = set()
+
+        if info is None:
+            info = Downloader.get_video_info(url=url)
+
+        if info:
+            try:
 
                 for fmt in info.get("formats", []):
                     height: int = fmt.get("height")
@@ -504,3 +1319,5 @@ class Downloader:
             except Exception as e:
                 print(f"Error: {e}")
                 return []
+
+        return []
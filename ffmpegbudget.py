@@ -0,0 +1,239 @@
+"""
+ffmpegbudget.py: Limits the CPU used by ffmpeg during post-processing
+"""
+
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from threading import BoundedSemaphore, Lock
+
+from yt_dlp.downloader import external
+from yt_dlp.postprocessor import ffmpeg
+from yt_dlp.utils import Popen
+
+try:
+    import resource
+
+except ImportError:
+    # Windows
+    resource = None
+
+
+class FFmpegBudget:
+    """
+    CPU budget for the ffmpeg processes of a download: merging, converting, tagging and section downloads.
+    Several ffmpeg processes that each use every core starve each other and the connections of running downloads.
+
+    - The number of threads of each process is passed to ffmpeg with yt-dlp's own options. See `FFmpegBudget.ytdlp_args`
+    - The number of processes at once and their priority are applied while `FFmpegBudget.applied` is active
+    """
+
+    # I/O scheduling classes of ionice. 'none' = Unchanged
+    IONICE_CLASSES: dict[str, int] = {
+        "none": 0,
+        "best-effort": 2,
+        "idle": 3
+    }
+
+    # Niceness of ffmpeg processes: 0 (normal) to 19 (lowest). Raising the priority needs root
+    NICE_RANGE: tuple[int, int] = (0, 19)
+
+    def __init__(self, threads: int = 0, max_processes: int = 0, nice: int = 0, ionice: str = "none"):
+        """
+        :param threads: Threads of each ffmpeg process. 0 = Chosen by ffmpeg
+        :param max_processes: Number of ffmpeg processes that can run at once. 0 = No limit
+        :param nice: Niceness of each ffmpeg process. 0 = Unchanged
+        :param ionice: I/O scheduling class of each ffmpeg process. See `FFmpegBudget.IONICE_CLASSES`
+        """
+
+        self.threads: int = max(threads, 0)
+        self.max_processes: int = max(max_processes, 0)
+        self.nice: int = nice
+        self.ionice: str = ionice if ionice in FFmpegBudget.IONICE_CLASSES else "none"
+
+        # Free slots for ffmpeg processes
+        self.slots: BoundedSemaphore | None = BoundedSemaphore(self.max_processes) if self.max_processes else None
+
+        # Running ffmpeg processes
+        self.running: int = 0
+        self.lock: Lock = Lock()
+
+        # Programs that lower the priority of the command after them. Skipped where they aren't installed
+        self.prefix: list[str] = []
+
+        if self.nice and shutil.which("nice"):
+            self.prefix += ["nice", "-n", str(self.nice)]
+
+        if self.ionice != "none" and shutil.which("ionice"):
+            self.prefix += ["ionice", "-c", str(FFmpegBudget.IONICE_CLASSES[self.ionice])]
+
+    def ytdlp_args(self) -> dict:
+        """
+        Get the yt-dlp options that pass the number of threads to ffmpeg
+        :return: Dictionary of yt-dlp options. Empty if ffmpeg chooses the threads
+        """
+
+        if not self.threads:
+            return {}
+
+        threads: list[str] = ["-threads", str(self.threads)]
+
+        return {
+            # Post-processors: merger, conversions and the custom post-processors
+            "postprocessor_args": {"ffmpeg": threads},
+            # Section downloads
+            "external_downloader_args": {"ffmpeg_o": threads}
+        }
+
+    def settings(self) -> dict[str, str]:
+        """
+        Get the settings in effect, for display
+        :return: Dictionary of setting: value
+        """
+
+        priority: list[str] = []
+
+        if self.nice:
+            priority.append(f"nice {self.nice}" if "nice" in self.prefix else f"nice {self.nice} (unavailable)")
+
+        if self.ionice != "none":
+            priority.append(f"ionice {self.ionice}" if "ionice" in self.prefix
+                            else f"ionice {self.ionice} (unavailable)")
+
+        return {
+            "threads": str(self.threads) if self.threads else "auto",
+            "processes": str(self.max_processes) if self.max_processes else "unlimited",
+            "priority": ", ".join(priority) or "normal"
+        }
+
+    @staticmethod
+    def is_ffmpeg(args) -> bool:
+        """
+        Check if a command runs ffmpeg. Probes and other programs are not limited
+        """
+
+        program: str = args[0] if isinstance(args, (list, tuple)) else str(args).split(" ")[0]
+
+        return os.path.splitext(os.path.basename(program))[0] == "ffmpeg"
+
+    @contextmanager
+    def applied(self, stats: dict[str, int] = None):
+        """
+        Apply the process limit and priority to the ffmpeg processes that yt-dlp starts in this block
+        :param stats: Dictionary to add statistics to, if provided.
+        'ffmpeg_runs', 'ffmpeg_ms' (run time), 'ffmpeg_wait_ms' (time waiting for a slot), 'ffmpeg_peak'
+        (most processes at once) and 'ffmpeg_cpu_ms' (CPU time of all child processes)
+        """
+
+        if stats is None:
+            stats = {}
+
+        for key in ("ffmpeg_runs", "ffmpeg_ms", "ffmpeg_wait_ms", "ffmpeg_peak", "ffmpeg_cpu_ms"):
+            stats.setdefault(key, 0)
+
+        budget: FFmpegBudget = self
+
+        class BudgetPopen(Popen):
+            """
+            yt-dlp's Popen, waiting for a free slot and lowering the priority of ffmpeg processes
+            """
+
+            def __init__(self, args, *remaining, **kwargs):
+                self.budgeted: bool = FFmpegBudget.is_ffmpeg(args)
+
+                if not self.budgeted:
+                    super().__init__(args, *remaining, **kwargs)
+                    return
+
+                waited: float = time.perf_counter()
+
+                if budget.slots:
+                    budget.slots.acquire()
+
+                self.started: float = time.perf_counter()
+
+                with budget.lock:
+                    budget.running += 1
+
+                    stats["ffmpeg_wait_ms"] += round((self.started - waited) * 1000)
+                    stats["ffmpeg_peak"] = max(stats["ffmpeg_peak"], budget.running)
+
+                try:
+                    super().__init__([*budget.prefix, *args] if isinstance(args, (list, tuple)) else args,
+                                     *remaining, **kwargs)
+
+                except BaseException:
+                    self.release()
+                    raise
+
+            def release(self) -> None:
+                """
+                Free the slot of this process. Only the first call does anything
+                """
+
+                if not self.budgeted:
+                    return
+
+                self.budgeted = False
+
+                with budget.lock:
+                    budget.running -= 1
+
+                    stats["ffmpeg_runs"] += 1
+                    stats["ffmpeg_ms"] += round((time.perf_counter() - self.started) * 1000)
+
+                if budget.slots:
+                    budget.slots.release()
+
+            def wait(self, timeout=None):
+                returncode = super().wait(timeout)
+                self.release()
+
+                return returncode
+
+            def kill(self, *, timeout=0):
+                # yt-dlp doesn't wait for a process it kills with timeout=0
+                try:
+                    super().kill(timeout=timeout)
+
+                finally:
+                    self.release()
+
+            def __exit__(self, exc_type, value, traceback):
+                # Doesn't wait for the process after CTRL+C
+                try:
+                    return super().__exit__(exc_type, value, traceback)
+
+                finally:
+                    self.release()
+
+        # Modules of yt-dlp that start ffmpeg
+        modules: tuple = (ffmpeg, external)
+        cpu_start: float = FFmpegBudget.children_cpu()
+
+        for module in modules:
+            module.Popen = BudgetPopen
+
+        try:
+            yield self
+
+        finally:
+            for module in modules:
+                module.Popen = Popen
+
+            stats["ffmpeg_cpu_ms"] += round((FFmpegBudget.children_cpu() - cpu_start) * 1000)
+
+    @staticmethod
+    def children_cpu() -> float:
+        """
+        Get the CPU time used by finished child processes
+        :return: Seconds of user and system time. 0 where unsupported
+        """
+
+        if resource is None:
+            return 0.0
+
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+        return usage.ru_utime + usage.ru_stime
@@ -0,0 +1,381 @@
+"""
+formatselector.py: Chooses which yt-dlp formats to download
+"""
+
+from videoquality import VideoQuality
+
+
+class FormatSelector:
+    """
+    Format selection policies for yt-dlp
+    """
+
+    # Preferred source audio codecs for each audio file format, in order of preference
+    # Codecs are matched as prefixes of yt-dlp's 'acodec' field
+    # Codecs that can be stream-copied into the target container come first, so no transcode is needed
+    AUDIO_CODEC_PREFS: dict[int, list[str]] = {
+        # MP3
+        1: ["mp3"],
+
+        # OGG
+        2: ["vorbis", "opus"],
+
+        # WAV: Transcoded anyway, pick by bitrate
+        3: [],
+
+        # FLAC: Lossless sources first
+        4: ["flac", "alac"],
+
+        # OPUS
+        5: ["opus"],
+
+        # M4A
+        6: ["mp4a", "aac", "alac"]
+    }
+
+    # Sort order for audio streams: Highest bitrate, then highest sample rate
+    AUDIO_SORT: list[str] = ["abr", "asr"]
+
+    # yt-dlp 'vcodec'/'acodec' prefixes to codec families
+    CODEC_FAMILIES: dict[str, str] = {
+        "avc1": "avc",
+        "h264": "avc",
+        "vp09": "vp9",
+        "vp9": "vp9",
+        "av01": "av1",
+        "hev1": "hevc",
+        "hvc1": "hevc",
+        "mp4a": "aac",
+        "aac": "aac",
+        "opus": "opus",
+        "vorbis": "vorbis",
+        "mp3": "mp3"
+    }
+
+    # Picture quality per bit relative to AVC. A VP9 stream needs about 1/1.4 of the bitrate of an AVC stream for
+    # the same quality
+    CODEC_EFFICIENCY: dict[str, float] = {
+        "avc": 1.0,
+        "vp9": 1.4,
+        "hevc": 1.5,
+        "av1": 1.8
+    }
+
+    # Codec families each video file format holds without re-encoding: (video, audio). None = any
+    # Other codecs are re-encoded by `ContainerPP`, and only picked when nothing else is available
+    CONTAINER_CODECS: dict[int, tuple[set[str] | None, set[str] | None]] = {
+        # MP4: Only the codecs every player supports in MP4. VP9/AV1/HEVC and Opus in MP4 play back in few players
+        1: ({"avc"}, {"aac", "mp3"}),
+
+        # MKV
+        2: (None, None),
+
+        # WEBM
+        3: ({"vp9", "av1"}, {"opus", "vorbis"})
+    }
+
+    # Sort order for each video file format, on top of yt-dlp's default. At the same resolution and frame rate, the
+    # codecs that players support best in the container come first: AVC/AAC for MP4, Opus for WEBM
+    CONTAINER_SORT: dict[int, list[str]] = {
+        # MP4
+        1: ["res", "fps", "vcodec:avc", "acodec:aac"],
+
+        # MKV
+        2: [],
+
+        # WEBM
+        3: ["res", "fps", "acodec:opus"]
+    }
+
+    # A candidate is acceptable if its efficiency-weighted bitrate is at least this share of the best candidate's
+    MIN_QUALITY_RATIO: float = 0.75
+
+    @staticmethod
+    def audio_format(file_format: int) -> str:
+        """
+        Get the yt-dlp format string for an audio download. Audio-only streams are always preferred so the video
+        stream is never downloaded just to be thrown away
+        :param file_format: Audio file format
+        :return: yt-dlp format string with a fallback chain
+        """
+
+        chain: list[str] = []
+
+        # Preferred codecs first
+        for codec in FormatSelector.AUDIO_CODEC_PREFS.get(file_format, []):
+            chain.append(f"bestaudio[acodec^={codec}]")
+
+        # Any audio-only stream
+        chain.append("bestaudio")
+
+        # Last resort: A single file with both video and audio
+        chain.append("best")
+
+        return "/".join(chain)
+
+    @staticmethod
+    def codec_regex(families: set[str]) -> str:
+        """
+        Get a regex matching the yt-dlp codec strings of codec families. e.g. {'avc'} -> '^(avc1|h264)'
+        :param families: Codec families. See `FormatSelector.CODEC_FAMILIES`
+        :return: Regex for a yt-dlp '~=' filter
+        """
+
+        prefixes: list[str] = [prefix for prefix, family in FormatSelector.CODEC_FAMILIES.items() if family in families]
+
+        return "^(" + "|".join(prefixes) + ")"
+
+    @staticmethod
+    def container_format(ytdlp_format: str, file_format: int) -> str:
+        """
+        Prefer streams that the video file format can hold without re-encoding. Each video + audio alternative is
+        tried first with both streams compatible, then with only the video compatible (the audio is cheap to
+        re-encode), then as is. See `ContainerPP` for the re-encoding fallback
+        :param ytdlp_format: yt-dlp format string. e.g. 'bestvideo[height=1080]+bestaudio'
+        :param file_format: Video file format
+        :return: yt-dlp format string with the fallbacks
+        """
+
+        v_codecs, a_codecs = FormatSelector.CONTAINER_CODECS.get(file_format, (None, None))
+
+        if v_codecs is None and a_codecs is None:
+            return ytdlp_format
+
+        v_filter: str = f"[vcodec~='{FormatSelector.codec_regex(v_codecs)}']" if v_codecs is not None else ""
+        a_filter: str = f"[acodec~='{FormatSelector.codec_regex(a_codecs)}']" if a_codecs is not None else ""
+
+        chain: list[str] = []
+
+        for alternative in ytdlp_format.split("/"):
+            streams: list[str] = alternative.split("+")
+
+            if len(streams) == 2:
+                chain.append(f"{streams[0]}{v_filter}+{streams[1]}{a_filter}")
+                chain.append(f"{streams[0]}{v_filter}+{streams[1]}")
+
+            chain.append(alternative)
+
+        return "/".join(dict.fromkeys(chain))
+
+    @staticmethod
+    def apply_limits(ytdlp_format: str, max_bytes: int = 0, max_vbr: int = 0) -> str:
+        """
+        Add size and bitrate filters to a yt-dlp format string. Formats with an unknown size or bitrate pass the
+        filters. The unfiltered format string is kept as the last fallback, so an item that can't fit is skipped by
+        the match filter with a reason, instead of failing the whole download
+        :param ytdlp_format: yt-dlp format string. e.g. '248+251/bestvideo+bestaudio'
+        :param max_bytes: Maximum size of an item in bytes. 0 = No limit
+        :param max_vbr: Maximum video bitrate in KBit/s. 0 = No limit
+        :return: yt-dlp format string with the filters
+        """
+
+        if not max_bytes and not max_vbr:
+            return ytdlp_format
+
+        size_filter: str = f"[filesize<?{max_bytes}][filesize_approx<?{max_bytes}]" if max_bytes else ""
+        vbr_filter: str = f"[tbr<?{max_vbr}]" if max_vbr else ""
+
+        chain: list[str] = []
+
+        for alternative in ytdlp_format.split("/"):
+            streams: list[str] = alternative.split("+")
+
+            if len(streams) == 2:
+                # Merged download: Filter the video stream, so 'bestvideo' picks the best stream that fits, then the
+                # merged size
+                chain.append(f"({streams[0]}{vbr_filter}{size_filter}+{streams[1]}){size_filter}")
+
+            else:
+                chain.append(f"{alternative}{size_filter}")
+
+        chain.append(ytdlp_format)
+
+        return "/".join(chain)
+
+    @staticmethod
+    def estimate_bytes(fmt: dict, duration: float | None) -> int:
+        """
+        Estimate the size of a format
+        :param fmt: yt-dlp format dictionary
+        :param duration: Duration of the media in seconds
+        :return: Size in bytes. 0 if unknown
+        """
+
+        size = fmt.get("filesize") or fmt.get("filesize_approx")
+
+        if size:
+            return int(size)
+
+        # Fallback to the bitrate. tbr is in KBit/s
+        if fmt.get("tbr") and duration:
+            return int(fmt["tbr"] * 1000 / 8 * duration)
+
+        return 0
+
+    @staticmethod
+    def codec_family(codec: str | None) -> str | None:
+        """
+        Get the codec family of a yt-dlp codec string. e.g. 'vp09.00.40.08' -> 'vp9'
+        :param codec: yt-dlp 'vcodec' or 'acodec'
+        :return: Codec family. The codec itself if unknown, None if no codec
+        """
+
+        if not codec or codec == "none":
+            return None
+
+        name: str = codec.split(".")[0].lower()
+
+        return FormatSelector.CODEC_FAMILIES.get(name, name)
+
+    @staticmethod
+    def quality_filter(fmt: dict, height: int, is_60fps: bool) -> bool:
+        """
+        Checks if a format matches a video quality
+        :param fmt: yt-dlp format dictionary
+        :param height: Height in pixels
+        :param is_60fps: If True, only 60 fps formats match. Otherwise, only formats below 60 fps
+        :return: True if the format matches
+        """
+
+        if fmt.get("height") != height:
+            return False
+
+        fps: float = fmt.get("fps") or 0
+
+        return fps == 60 if is_60fps else fps < 60
+
+    @staticmethod
+    def smallest_video(info: dict, video_quality: str, file_format: int) -> "FormatSelector.VideoChoice | None":
+        """
+        Pick the smallest video + audio combination for a video quality that the file format can hold without
+        re-encoding. Formats are scored by their expected size, and formats whose efficiency-weighted bitrate is
+        noticeably lower than the best candidate's are not accepted
+        :param info: yt-dlp info dictionary with all formats
+        :param video_quality: Video quality. e.g. '1080p60'
+        :param file_format: Video file format
+        :return: The chosen formats, or None if no format could be estimated
+        """
+
+        height, is_60fps = VideoQuality.resolution_sort_key(v_quality=video_quality)
+        duration: float | None = info.get("duration")
+        formats: list[dict] = info.get("formats") or []
+
+        v_codecs, a_codecs = FormatSelector.CONTAINER_CODECS.get(file_format, (None, None))
+
+        # Video-only streams at the chosen quality
+        videos: list[dict] = [f for f in formats if f.get("acodec") in (None, "none")
+                              and FormatSelector.codec_family(f.get("vcodec"))
+                              and FormatSelector.quality_filter(fmt=f, height=height, is_60fps=is_60fps)]
+
+        # Audio-only streams
+        audios: list[dict] = [f for f in formats if f.get("vcodec") in (None, "none")
+                              and FormatSelector.codec_family(f.get("acodec"))]
+
+        if not videos or not audios:
+            return None
+
+        # What 'bestvideo[height=...]+bestaudio' would download
+        default_bytes: int = (FormatSelector.estimate_bytes(FormatSelector.best_video(videos), duration) +
+                              FormatSelector.estimate_bytes(max(audios, key=FormatSelector.audio_rank), duration))
+
+        # Only keep codecs the container can hold
+        if v_codecs is not None:
+            videos = [f for f in videos if FormatSelector.codec_family(f.get("vcodec")) in v_codecs]
+
+        if a_codecs is not None:
+            audios = [f for f in audios if FormatSelector.codec_family(f.get("acodec")) in a_codecs]
+
+        # Formats without a size can't be compared
+        videos = [f for f in videos if FormatSelector.estimate_bytes(f, duration)]
+        audios = [f for f in audios if FormatSelector.estimate_bytes(f, duration)]
+
+        if not videos or not audios:
+            return None
+
+        def quality(fmt: dict) -> float:
+            efficiency: float = FormatSelector.CODEC_EFFICIENCY.get(FormatSelector.codec_family(fmt.get("vcodec")), 1.0)
+            return FormatSelector.estimate_bytes(fmt, duration) * efficiency
+
+        best_quality: float = max(quality(f) for f in videos)
+        acceptable: list[dict] = [f for f in videos if quality(f) >= best_quality * FormatSelector.MIN_QUALITY_RATIO]
+
+        # Smallest acceptable video. On a tie, prefer the more efficient codec
+        video: dict = min(acceptable, key=lambda f: (FormatSelector.estimate_bytes(f, duration), -quality(f)))
+
+        # Audio is small compared to video, so keep the best compatible stream
+        audio: dict = max(audios, key=FormatSelector.audio_rank)
+
+        return FormatSelector.VideoChoice(video=video, audio=audio, duration=duration, default_bytes=default_bytes)
+
+    @staticmethod
+    def estimate_video_bytes(info: dict) -> int:
+        """
+        Estimate the size of the video stream yt-dlp picks by default ('bestvideo*+bestaudio')
+        :param info: yt-dlp info dictionary with all formats
+        :return: Size in bytes. 0 if unknown
+        """
+
+        videos: list[dict] = [f for f in info.get("formats") or [] if f.get("vcodec") not in (None, "none")]
+
+        if not videos:
+            return 0
+
+        return FormatSelector.estimate_bytes(FormatSelector.best_video(videos), info.get("duration"))
+
+    @staticmethod
+    def best_video(videos: list[dict]) -> dict:
+        """
+        Get the format yt-dlp's default sort ranks best: highest resolution, then frame rate, then bitrate. The order
+        of the formats can't be relied on, since the info may have been extracted with another 'format_sort'
+        :param videos: yt-dlp format dictionaries with video. Not empty
+        :return: The best format
+        """
+
+        return max(videos, key=lambda f: (f.get("height") or 0, f.get("fps") or 0, f.get("tbr") or 0))
+
+    @staticmethod
+    def audio_rank(fmt: dict) -> tuple[float, float]:
+        """
+        Sort key of audio formats, following `FormatSelector.AUDIO_SORT`: highest bitrate, then highest sample rate
+        :param fmt: yt-dlp format dictionary
+        """
+
+        return fmt.get("abr") or 0, fmt.get("asr") or 0
+
+    class VideoChoice:
+        """
+        Video + audio formats chosen by `FormatSelector.smallest_video`
+        """
+
+        def __init__(self, video: dict, audio: dict, duration: float | None, default_bytes: int):
+            """
+            :param video: yt-dlp format dictionary of the video stream
+            :param audio: yt-dlp format dictionary of the audio stream
+            :param duration: Duration of the media in seconds
+            :param default_bytes: Estimated size of the default format choice
+            """
+
+            self.video: dict = video
+            self.audio: dict = audio
+
+            self.est_bytes: int = (FormatSelector.estimate_bytes(video, duration) +
+                                   FormatSelector.estimate_bytes(audio, duration))
+
+            self.saved_bytes: int = max(default_bytes - self.est_bytes, 0)
+
+        def format_string(self) -> str:
+            """
+            Get the yt-dlp format string. e.g. '248+251'
+            """
+
+            return f"{self.video['format_id']}+{self.audio['format_id']}"
+
+        def description(self) -> str:
+            """
+            Get a short description of the chosen formats. e.g. 'VP9 1920x1080 + OPUS'
+            """
+
+            v_codec: str = FormatSelector.codec_family(self.video.get("vcodec")).upper()
+            a_codec: str = FormatSelector.codec_family(self.audio.get("acodec")).upper()
+
+            return f"{v_codec} {self.video.get('width')}x{self.video.get('height')} + {a_codec}"
@@ -0,0 +1,366 @@
+"""
+imageconverter.py: Converts thumbnails to the chosen image format
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from threading import Lock
+
+from wand.image import Image
+from wand.resource import limits
+from yt_dlp.utils import prepend_extension
+
+
+class ImageConverter:
+    """
+    Converts images in a pool of processes. Decoding and encoding are CPU-bound, so each image is converted in its own
+    process, and ImageMagick is limited to one thread per process so the processes don't compete for the cores.
+    Images can be submitted while they are still being downloaded, so the conversions run alongside the downloads
+    """
+
+    # Signatures at the start of image files: (offset, bytes): format
+    SIGNATURES: dict[tuple[int, bytes], str] = {
+        (0, b"\xff\xd8\xff"): "jpeg",
+        (0, b"\x89PNG\r\n\x1a\n"): "png",
+        (8, b"WEBP"): "webp",
+        (0, b"GIF8"): "gif"
+    }
+
+    # Extensions to formats
+    EXTENSIONS: dict[str, str] = {
+        "jpg": "jpeg",
+        "jpeg": "jpeg",
+        "png": "png",
+        "webp": "webp",
+        "gif": "gif"
+    }
+
+    # Formats variants can be written in
+    VARIANT_EXTS: set[str] = {"png", "jpg"}
+
+    # Filter to resize variants with. Bilinear is much faster than ImageMagick's default (Lanczos), and each variant
+    # is made from the next larger one, so no step shrinks the image enough to alias
+    VARIANT_FILTER: str = "triangle"
+
+    # Encode settings with their range: (lowest, highest). See `ImageConverter.encode`
+    ENCODE_RANGES: dict[str, tuple[int, int]] = {
+        "png_compression_level": (0, 9),
+        "png_compression_filter": (0, 5),
+        "jpeg_quality": (1, 100)
+    }
+
+    def __init__(self, workers: int = 0, memory_limit: int = 0, callback=None, variants: list[tuple[int, str]] = None,
+                 settings: dict = None):
+        """
+        :param workers: Number of processes. 0 = Number of CPU cores
+        :param memory_limit: Memory ImageMagick can use in each process, in MiB. 0 = ImageMagick's default
+        :param callback: Called as callback(tag, result) when an image is done, in the order they finish. result is
+        the path of the converted image, or the exception if it failed
+        :param variants: Smaller copies to make of each image, as (width, extension). See
+        `ImageConverter.parse_variants`
+        :param settings: Encode settings. See `ImageConverter.encode`
+        """
+
+        self.workers: int = workers or os.cpu_count() or 1
+        self.memory_limit: int = memory_limit
+        self.callback = callback
+        self.variants: list[tuple[int, str]] = sorted(variants or [], reverse=True)
+        self.settings: dict = settings or {}
+
+        # Started with the first image
+        self.pool: ProcessPoolExecutor | None = None
+
+        # Result of each submitted image, in the order they were submitted
+        self.futures: list[Future] = []
+
+        # Submissions come from the download thread, and results from the pool's thread
+        self.lock: Lock = Lock()
+
+        # Images already in the format of their target, saved without converting
+        self.skipped: int = 0
+
+    @staticmethod
+    def parse_variants(variants: str, default_ext: str) -> list[tuple[int, str]]:
+        """
+        Parse the variants of the artwork. Each variant is separated by a comma, and is a width, optionally followed
+        by a format. e.g. '640, 320:jpg'
+        :param variants: Variants string. Empty = No variants
+        :param default_ext: Extension of variants without a format
+        :return: List of (width, extension)
+        :raises ValueError: If a variant is invalid
+        """
+
+        parsed: list[tuple[int, str]] = []
+
+        for variant in filter(None, map(str.strip, variants.split(","))):
+            width, _, ext = map(str.strip, variant.partition(":"))
+            ext = ext.lower() or default_ext
+
+            if not width.isdigit() or int(width) == 0 or ext not in ImageConverter.VARIANT_EXTS:
+                raise ValueError(f"Invalid artwork variant '{variant}'")
+
+            parsed.append((int(width), ext))
+
+        return parsed
+
+    @staticmethod
+    def variant_path(target: str, width: int, ext: str) -> str:
+        """
+        Get the path of a variant. e.g. 'Title.640.png' for 'Title.png'
+        """
+
+        return f"{os.path.splitext(target)[0]}.{width}.{ext}"
+
+    @staticmethod
+    def init_worker(memory_limit: int) -> None:
+        """
+        Set the ImageMagick limits of a worker process
+        :param memory_limit: Memory limit in MiB. 0 = ImageMagick's default
+        """
+
+        limits["thread"] = 1
+
+        if memory_limit:
+            limits["memory"] = memory_limit * 1024 ** 2
+
+    @staticmethod
+    def write(path: str, data: bytes) -> None:
+        """
+        Write a file in one go. Written to a temporary file first, so the file is never left half-written
+        :param path: Path of the file. Its directory is created if it doesn't exist
+        :param data: Contents of the file
+        """
+
+        temp_path: str = prepend_extension(path, "temp")
+
+        # The directory usually exists. Only created when needed, to save a call for every image
+        try:
+            f = open(temp_path, "wb")
+
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            f = open(temp_path, "wb")
+
+        with f:
+            f.write(data)
+
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def sniff(source: str | bytes) -> str | None:
+        """
+        Get the real format of an image from its first bytes. The extension of a thumbnail doesn't always match
+        :param source: The image, or its path
+        :return: Format. e.g. 'jpeg', 'png'. None if unknown
+        """
+
+        if isinstance(source, bytes):
+            header: bytes = source[:16]
+
+        else:
+            with open(source, "rb") as f:
+                header: bytes = f.read(16)
+
+        for (offset, signature), image_format in ImageConverter.SIGNATURES.items():
+            if header[offset:offset + len(signature)] == signature:
+                return image_format
+
+        return None
+
+    @staticmethod
+    def keep(source: str | bytes, target: str) -> str:
+        """
+        Save an image that is already in the format of its target, without converting it
+        :param source: The image, or its path. A path is moved to the target
+        :param target: Path of the image
+        :return: Path of the image
+        """
+
+        if isinstance(source, bytes):
+            ImageConverter.write(path=target, data=source)
+
+        elif source != target:
+            os.replace(source, target)
+
+        return target
+
+    @staticmethod
+    def encode(image: Image, ext: str, settings: dict = None) -> bytes:
+        """
+        Encode an image with the settings of its format. Most of the CPU time of a conversion is spent here
+        :param image: Image to encode
+        :param ext: Extension of the format
+        :param settings: Encode settings. Missing settings are left to ImageMagick.
+        'png_compression_level': zlib level, from 0 (fastest) to 9 (smallest).
+        'png_compression_filter': Row filter. 0 = None, 1 = Sub, 2 = Up, 3 = Average, 4 = Paeth, 5 = Adaptive.
+        'jpeg_quality': From 1 to 100.
+        'jpeg_progressive': If True, save as progressive.
+        'jpeg_optimize': If True, optimize the Huffman tables
+        :return: The encoded image
+        """
+
+        settings = settings or {}
+
+        match ext:
+            case "png":
+                for key, option in (("png_compression_level", "png:compression-level"),
+                                    ("png_compression_filter", "png:compression-filter")):
+                    if key in settings:
+                        image.options[option] = str(settings[key])
+
+            case "jpg" | "jpeg":
+                if "jpeg_quality" in settings:
+                    image.compression_quality = settings["jpeg_quality"]
+
+                if "jpeg_progressive" in settings:
+                    image.interlace_scheme = "plane" if settings["jpeg_progressive"] else "no"
+
+                if "jpeg_optimize" in settings:
+                    image.options["jpeg:optimize-coding"] = "true" if settings["jpeg_optimize"] else "false"
+
+        return image.make_blob(ext)
+
+    @staticmethod
+    def convert(source: str | bytes, target: str, variants: list[tuple[int, str]] = None, kept: bool = False,
+                settings: dict = None) -> str:
+        """
+        Convert an image, and make its variants from the same decode. Only the converted images are written
+        :param source: The image, or its path. A path is deleted after converting
+        :param target: Path of the converted image. The format is taken from the extension
+        :param variants: Smaller copies to make, as (width, extension), largest first. Written next to the target. See
+        `ImageConverter.variant_path`
+        :param kept: If True, the image is already in the format of the target, and is only saved
+        :param settings: Encode settings. See `ImageConverter.encode`
+        :return: Path of the converted image
+        """
+
+        with Image(blob=source) if isinstance(source, bytes) else Image(filename=source) as image:
+            if kept:
+                ImageConverter.keep(source=source, target=target)
+
+            else:
+                ImageConverter.write(path=target, data=ImageConverter.encode(image=image,
+                                                                             ext=os.path.splitext(target)[1][1:],
+                                                                             settings=settings))
+
+            # Each variant is resized from the previous one. Images are never enlarged
+            for width, ext in variants or []:
+                if width < image.width:
+                    image.resize(width, max(round(image.height * width / image.width), 1),
+                                 filter=ImageConverter.VARIANT_FILTER)
+
+                ImageConverter.write(path=ImageConverter.variant_path(target=target, width=width, ext=ext),
+                                     data=ImageConverter.encode(image=image, ext=ext, settings=settings))
+
+        if isinstance(source, str) and source != target and not kept:
+            os.remove(source)
+
+        return target
+
+    def start(self) -> None:
+        """
+        Start the pool of processes. The pool is started by the first `ImageConverter.submit` if not started before
+        """
+
+        if self.pool is not None:
+            return
+
+        # The downloads run on their own thread, and forking a process with threads can deadlock.
+        # The fork server forks the workers from a process without threads
+        context = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods()
+                                              else None)
+
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                        initializer=ImageConverter.init_worker, initargs=(self.memory_limit,))
+
+    def submit(self, source: str | bytes, target: str, tag=None) -> None:
+        """
+        Queue an image for conversion. Returns right away
+        :param source: The image, or its path
+        :param target: Path of the converted image. See `ImageConverter.convert`
+        :param tag: Passed to the callback to identify the image. e.g. its index
+        """
+
+        # Done right away, without the pool
+        future: Future | None = None
+
+        # Already in the right format. Only saved, without encoding
+        kept: bool = False
+
+        try:
+            target_format: str | None = ImageConverter.EXTENSIONS.get(os.path.splitext(target)[1][1:].lower())
+            kept = ImageConverter.sniff(source) == target_format
+
+            # Nothing to decode it for
+            if kept and not self.variants:
+                future = Future()
+                future.set_result(ImageConverter.keep(source=source, target=target))
+
+        except OSError as e:
+            future = Future()
+            future.set_exception(e)
+
+        with self.lock:
+            if future is None:
+                self.start()
+                future = self.pool.submit(ImageConverter.convert, source, target, self.variants, kept, self.settings)
+
+            self.futures.append(future)
+
+        future.add_done_callback(lambda done: self.done(tag=tag, future=done, kept=kept))
+
+    def done(self, tag, future: Future, kept: bool = False) -> None:
+        """
+        Pass the result of an image to the callback
+        :param kept: If True, the image was saved without converting
+        """
+
+        try:
+            result: str | Exception = future.result()
+
+        except Exception as e:
+            result = e
+
+        with self.lock:
+            if kept and not isinstance(result, Exception):
+                self.skipped += 1
+
+            if self.callback:
+                self.callback(tag, result)
+
+    def finish(self) -> list[str | Exception]:
+        """
+        Wait for the submitted images and stop the pool
+        :return: For each image in the order they were submitted, the path of the converted image, or the exception if
+        it failed
+        """
+
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+
+        results: list[str | Exception] = []
+
+        for future in self.futures:
+            try:
+                results.append(future.result())
+
+            except Exception as e:
+                results.append(e)
+
+        self.futures.clear()
+
+        return results
+
+    def convert_all(self, jobs: list[tuple[str | bytes, str]]) -> list[str | Exception]:
+        """
+        Convert images in parallel. The callback is called with the index of each job as the tag
+        :param jobs: List of (source, target). See `ImageConverter.convert`
+        :return: For each job, the path of the converted image, or the exception if it failed
+        """
+
+        for i, (source, target) in enumerate(jobs):
+            self.submit(source=source, target=target, tag=i)
+
+        return self.finish()
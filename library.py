@@ -0,0 +1,313 @@
+"""
+library.py: Index of downloaded files
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import yt_dlp as yt
+
+from utility.utils_downloader import DwnUtilities
+
+
+class Library:
+    """
+    Index of downloaded files, keyed by video ID. Used to reuse local files instead of downloading them again.
+    The whole index is written at once, so new records are written in batches
+    """
+
+    INDEX_FILENAME: str = "library.json"
+
+    # Records added before the index is written. Also written when `Library.flush` is called
+    BATCH_SIZE: int = 100
+
+    # Seconds after which added records are written, even if the batch isn't full
+    FLUSH_INTERVAL: float = 5.0
+
+    # Directory of the content store, inside the library directory
+    STORE_DIRNAME: str = "store"
+
+    # Metadata kept for each file, so it can be processed again without extracting the info
+    META_KEYS: tuple[str, ...] = ("id", "title", "uploader", "upload_date", "duration", "acodec", "vcodec", "artist",
+                                  "album", "track", "webpage_url", "chapters")
+
+    def __init__(self, directory: str, use_store: bool = False):
+        """
+        :param directory: Directory of the library. Created when the index is first saved
+        :param use_store: If True, keep every file once in the content store, and link it into the download
+        directories. See `Library.store_file`
+        """
+
+        self.directory: Path = Path(os.path.expandvars(os.path.expanduser(directory)))
+        self.index_path: Path = self.directory / Library.INDEX_FILENAME
+        self.store_dir: Path = self.directory / Library.STORE_DIRNAME
+
+        self.use_store: bool = use_store
+
+        # Video ID: [file record]
+        self.entries: dict[str, list[dict]] = {}
+
+        # Records added since the index was last written
+        self.pending: int = 0
+        self.last_flush: float = time.monotonic()
+
+        self.load()
+
+    def load(self) -> None:
+        """
+        Load the index from disk. A missing or damaged index is treated as empty
+        """
+
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self) -> None:
+        """
+        Write the index to disk. Written to a temporary file first, so the index is never left half-written
+        """
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temp_path: Path = self.index_path.with_suffix(".tmp")
+
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+
+        os.replace(temp_path, self.index_path)
+
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def flush(self) -> None:
+        """
+        Write the index if records were added since it was last written
+        """
+
+        if self.pending:
+            self.save()
+
+    def add(self, info: dict, path: str, dwn_type: int, file_format: int, quality: str = None,
+            sections: str = None) -> dict:
+        """
+        Add a downloaded file to the index. Replaces any record of the same path. Written with the next batch
+        :param info: yt-dlp info dictionary of the item
+        :param path: Path of the file
+        :param dwn_type: Download type
+        :param file_format: File format
+        :param quality: Video quality, if chosen
+        :param sections: Sections, if only part of the item was downloaded
+        :return: The new record
+        """
+
+        record: dict = {
+            "path": str(Path(path).absolute()),
+            "dwn_type": dwn_type,
+            "file_format": file_format,
+            "quality": quality,
+            "sections": sections,
+            "size": os.path.getsize(path),
+            "meta": {key: info[key] for key in Library.META_KEYS if info.get(key) is not None}
+        }
+
+        # Sections of an item are several files with the same key
+        if self.use_store and not sections:
+            record["blob"], record["link"] = self.store_file(path=record["path"], video_id=info["id"],
+                                                             key=Library.blob_key(record))
+
+        records: list[dict] = [r for r in self.entries.get(info["id"], []) if r["path"] != record["path"]]
+        self.entries[info["id"]] = records + [record]
+
+        self.pending += 1
+
+        if self.pending >= Library.BATCH_SIZE or time.monotonic() - self.last_flush >= Library.FLUSH_INTERVAL:
+            self.save()
+
+        return record
+
+    @staticmethod
+    def blob_key(record: dict) -> str:
+        """
+        Get the key of a file in the content store. Files of a video with the same download type, file format, quality
+        and sections have the same key
+        :param record: Library record
+        :return: Key. e.g. '3f2a9c0d1b7e'
+        """
+
+        fields: str = json.dumps([record["dwn_type"], record["file_format"], record["quality"], record["sections"]])
+
+        return hashlib.sha1(fields.encode()).hexdigest()[:12]
+
+    def blob_path(self, video_id: str, key: str, ext: str) -> Path:
+        """
+        Get the path of a file in the content store
+        :param video_id: Video ID
+        :param key: Key of the file. See `Library.blob_key`
+        :param ext: Extension, including the dot
+        :return: Path. e.g. '<store>/dQw4w9WgXcQ/3f2a9c0d1b7e.mp4'
+        """
+
+        return self.store_dir / yt.utils.sanitize_filename(video_id, restricted=True) / f"{key}{ext}"
+
+    def store_file(self, path: str, video_id: str, key: str) -> tuple[str, str]:
+        """
+        Move a file into the content store, and link it back to its path. A file that already links to the store is
+        left as it is. A newer download of the same file replaces the stored file in one step, so symbolic links to it
+        never point at nothing
+        :param path: Path of the file
+        :param video_id: Video ID
+        :param key: Key of the file. See `Library.blob_key`
+        :return: Path of the file in the store, and how the path links to it. See `DwnUtilities.link_file`
+        """
+
+        blob: Path = self.blob_path(video_id=video_id, key=key, ext=Path(path).suffix)
+
+        if blob.exists() and os.path.samefile(path, blob):
+            return str(blob), "symlink" if os.path.islink(path) else "hardlink"
+
+        # Moved next to the stored file first, since the download directory can be on another filesystem
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        temp_blob: Path = blob.with_name(f"{blob.name}.tmp")
+
+        shutil.move(path, temp_blob)
+        os.replace(temp_blob, blob)
+
+        link: str = DwnUtilities.link_file(source=str(blob), target=path, symlink=True)
+
+        return str(blob), link
+
+    @staticmethod
+    def links_to_blob(record: dict) -> bool:
+        """
+        Checks if the file at the path of a record is still the one linked from the content store. Reflinks and
+        copies have their own inode, so they are only checked by size
+        :param record: Library record with a file in the store
+        :return: True if the file at the path was linked from the stored file, and wasn't replaced since
+        """
+
+        path: str = record["path"]
+        blob: str = record["blob"]
+
+        if not os.path.exists(blob):
+            return False
+
+        match record.get("link"):
+            case "symlink":
+                return os.path.realpath(path) == os.path.realpath(blob)
+
+            case "reflink" | "copy":
+                return not os.path.islink(path) and os.path.getsize(path) == record["size"]
+
+            case _:
+                # Hardlinks, and records from before the link was recorded
+                return os.path.samefile(path, blob)
+
+    @staticmethod
+    def source_path(record: dict) -> str:
+        """
+        Get the path to read a file from. The file in the store if there is one, so files can be linked again after
+        their path was moved or deleted
+        :param record: Library record
+        :return: Path
+        """
+
+        return record.get("blob") or record["path"]
+
+    def find(self, video_id: str, dwn_type: int = None, file_format: int = None, quality: str = None,
+             sections: str = None, exact: bool = False) -> dict | None:
+        """
+        Find a file of a video that is still on disk
+        :param video_id: Video ID
+        :param dwn_type: Download type. Any if None
+        :param file_format: File format. Any if None
+        :param quality: Video quality. Any if None
+        :param sections: Sections. Only files with the same sections match, so None only matches whole items
+        :param exact: If True, every field must match. None only matches files without that field
+        :return: The most recent matching record, or None if there is none
+        """
+
+        for record in reversed(self.entries.get(video_id, [])):
+            if (dwn_type is not None or exact) and record["dwn_type"] != dwn_type:
+                continue
+
+            if (file_format is not None or exact) and record["file_format"] != file_format:
+                continue
+
+            if (quality is not None or exact) and record["quality"] != quality:
+                continue
+
+            if record.get("sections") != sections:
+                continue
+
+            # Skip files that were moved, deleted, or changed
+            source: str = Library.source_path(record)
+
+            if not os.path.isfile(source) or os.path.getsize(source) != record["size"]:
+                continue
+
+            return record
+
+        return None
+
+    def collect_garbage(self) -> tuple[int, int]:
+        """
+        Delete files in the content store that no file in the download directories links to anymore, and forget
+        files that were deleted
+        :return: Number of files deleted from the store, and their size in bytes
+        """
+
+        referenced: set[str] = set()
+
+        for video_id, records in list(self.entries.items()):
+            kept: list[dict] = []
+
+            for record in records:
+                path: str = record["path"]
+                blob: str | None = record.get("blob")
+
+                if not os.path.exists(path):
+                    continue
+
+                # The file at the path was replaced by another file
+                if blob and not Library.links_to_blob(record):
+                    record.pop("blob")
+                    record.pop("link", None)
+                    blob = None
+
+                kept.append(record)
+
+                if blob:
+                    referenced.add(blob)
+
+            if kept:
+                self.entries[video_id] = kept
+
+            else:
+                del self.entries[video_id]
+
+        deleted: int = 0
+        deleted_bytes: int = 0
+
+        if self.store_dir.is_dir():
+            for blob in self.store_dir.glob("*/*"):
+                if str(blob) in referenced:
+                    continue
+
+                deleted += 1
+                deleted_bytes += blob.stat().st_size
+                blob.unlink()
+
+            # Remove empty video directories
+            for video_dir in self.store_dir.iterdir():
+                if video_dir.is_dir() and not any(video_dir.iterdir()):
+                    video_dir.rmdir()
+
+        self.save()
+
+        return deleted, deleted_bytes
@@ -18,15 +18,34 @@ import getopt
 import sys
 
 from backend import Backend
-from confighandler import ConfigEditor
+from confighandler import ConfigEditor, ConfigHandler
 from filenamecreator import FCEditMode
+from library import Library
 from menu.menu_misc import MiscMenu, ArgumentMenu
 from menu.menu_problems import MiscProblem
+from utility.utils_configeditor import ConfigUtilities
+from utility.utils_downloader import DwnUtilities
 from utility.utils_misc import MiscUtilities
 
 # Arguments
 _BYPASS_DEFAULTS: bool = False
 
+# Size and bitrate limits passed as arguments
+_LIMITS: dict[str, int] = {}
+
+# Sections to download passed as an argument
+_SECTIONS: str | None = None
+
+# Limit arguments to config keys. These can be combined with other arguments
+_LIMIT_ARGS: dict[str, str] = {
+    "--max-item-size": "max_item_size",
+    "--max-job-size": "max_job_size",
+    "--max-bitrate": "max_video_bitrate"
+}
+
+# Arguments with a value. These can be combined with other arguments
+_VALUE_ARGS: list[str] = [*_LIMIT_ARGS, "--sections"]
+
 
 def handle_args() -> int:
     """
@@ -34,18 +53,45 @@ def handle_args() -> int:
     :return: 0 If no arguments are passed, 1 if program should exit, 2 otherwise.
     """
 
-    global _BYPASS_DEFAULTS
+    global _BYPASS_DEFAULTS, _SECTIONS
 
-    options: str = "hvcfB"
-    long_options: list[str] = ["help", "version", "config", "format-editor", "bypass-defaults"]
+    options: str = "hvcfBg"
+    long_options: list[str] = ["help", "version", "config", "format-editor", "bypass-defaults", "collect-garbage",
+                               "max-item-size=", "max-job-size=", "max-bitrate=", "sections="]
 
     # Get command line arguments
     cmd_args: list = sys.argv[1:]
-    num_args: int = len(cmd_args)
 
     try:
         args, _ = getopt.getopt(cmd_args, options, long_options)
 
+        # Get arguments with a value
+        for arg, value in args:
+            if arg in _LIMIT_ARGS:
+                if not value.isnumeric():
+                    MiscProblem.Error.error_msg(error=Exception(f"{arg}: Expected a whole number, but got '{value}'."))
+                    return 1
+
+                _LIMITS[_LIMIT_ARGS[arg]] = int(value)
+
+            elif arg == "--sections":
+                try:
+                    DwnUtilities.parse_sections(sections=value)
+
+                except ValueError as e:
+                    MiscProblem.Error.error_msg(error=Exception(f"{arg}: {e}"))
+                    return 1
+
+                _SECTIONS = value
+
+        # Other arguments can't be combined
+        args = [(arg, value) for arg, value in args if arg not in _VALUE_ARGS]
+        num_args: int = len(args)
+
+        # Only arguments with a value were passed
+        if (_LIMITS or _SECTIONS) and num_args == 0:
+            return 2
+
         # Check arguments
         for arg, value in args:
 
@@ -63,15 +109,24 @@ def handle_args() -> int:
             elif arg in ("-c", "--config") and num_args == 1:
                 # Open the Config Editor
                 if ConfigEditor().launch_downloader:
-                    Backend()
+                    Backend(limits=_LIMITS, sections=_SECTIONS)
 
                 return 1
 
             elif arg in ("-f", "--format-editor") and num_args == 1:
                 # Open the Format Editor
                 if FCEditMode().launch_downloader:
-                    Backend()
+                    Backend(limits=_LIMITS, sections=_SECTIONS)
+
+                return 1
+
+            elif arg in ("-g", "--collect-garbage") and num_args == 1:
+                # Delete unused files from the content store
+                config: dict = ConfigHandler(file=ConfigUtilities.CONFIG_FILENAME).get_config()
+                library: Library = Library(directory=config["library_directory"])
+                deleted, deleted_bytes = library.collect_garbage()
 
+                ArgumentMenu.garbage_collected(deleted=deleted, size=MiscUtilities.convert_bytes(deleted_bytes))
                 return 1
 
             elif arg in ("-B", "--bypass-defaults") and num_args == 1:
@@ -96,7 +151,7 @@ if __name__ == "__main__":
 
         # Don't execute the program if requested
         if handle_args() != 1:
-            Backend(bypass_defaults=_BYPASS_DEFAULTS)
+            Backend(bypass_defaults=_BYPASS_DEFAULTS, limits=_LIMITS, sections=_SECTIONS)
 
     # Handle abrupt exits, such as CTRL+C or CTRL+D
     except (KeyboardInterrupt, EOFError):
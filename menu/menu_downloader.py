@@ -55,6 +55,7 @@ class DwnMenu:
             print(f"  {col('1', "cyan")}) Videos")
             print(f"  {col('2', "cyan")}) Audio")
             print(f"  {col('3', "cyan")}) Thumbnails")
+            print(f"  {col('4', "cyan")}) Videos + Audio + Thumbnails")
 
         @staticmethod
         def item_count() -> None:
@@ -72,10 +73,36 @@ class DwnMenu:
             """
             print(f"\n{INFO} Enter the YouTube URL:")
 
+        @staticmethod
+        def ask_sections() -> None:
+            """
+            Ask if only part of each item should be downloaded
+            """
+            print(f"\n{INFO} Only download part of each item? (Time ranges or chapters)")
+
+        @staticmethod
+        def get_sections() -> None:
+            """
+            Get the sections to download
+            """
+            print(f"\n{INFO} Enter the sections to download, separated by commas:")
+            print(f"  - Time ranges: {col("1:00-5:30", "cyan")}, {col("2:00:00-", "cyan")} (until the end), "
+                  f"{col("-10:00", "cyan")} (from the start)")
+            print(f"  - Chapter titles: {col("Intro", "cyan")}, {col("Part [0-9]", "cyan")} (regex)")
+
+        @staticmethod
+        def sections_from_args(sections: str) -> None:
+            """
+            Message to display when the sections are passed as an argument
+            :param sections: Sections
+            """
+            print(f"\n{INFO} Only downloading sections: {col(sections, 'cyan')}")
+
         @staticmethod
         def confirmation_screen(dwn_type: int, file_format: int, item_count: int,
                                 pn_format: list[str] or None, pn_mode: int or None,
-                                ff_mode: int, fn_format: list[str], video_quality: str or None) -> None:
+                                ff_mode: int, fn_format: list[str], video_quality: str or None,
+                                sections: str or None = None) -> None:
             """
             Display a confirmation screen with all chosen options
             :param dwn_type: Download type
@@ -86,6 +113,7 @@ class DwnMenu:
             :param ff_mode: Type of filename format
             :param fn_format: Filename format list
             :param video_quality: Video quality
+            :param sections: Sections to download
             """
 
             # Get names of download choices
@@ -119,6 +147,42 @@ class DwnMenu:
             print(f"\n - Video Quality: {col(f"'{video_quality}'", "cyan")}" \
                       if video_quality else "", end="")
 
+            # Show sections if only part of each item is downloaded
+            print(f"\n - Sections: {col(f"'{sections}'", "cyan")}" \
+                      if sections else "", end="")
+
+        @staticmethod
+        def confirmation_outputs(outputs: dict[str, str]) -> None:
+            """
+            Display the outputs made from each video. Comes after `Menu.Main.confirmation_screen`
+            :param outputs: Output name: File format. e.g. {'Audio': 'MP3'}
+            """
+
+            v_outputs: str = ", ".join(f"{output} ({file_format})" for output, file_format in outputs.items())
+
+            print(f"\n - Also Made From Each Video: {col(f"'{v_outputs}'", "cyan")}", end="")
+
+        @staticmethod
+        def confirmation_formats(formats: str, size: str, saved: str = "") -> None:
+            """
+            Display the formats chosen for a video download. Comes after `Menu.Main.confirmation_screen`
+            :param formats: Description of the chosen formats
+            :param size: Size string of the estimated download size
+            :param saved: Size string of the estimated savings over the default formats. If blank, will not display
+            """
+
+            print(f"\n - Formats: {col(f"'{formats}'", "cyan")} (about {col(size, "yellow")}", end="")
+
+            print(f", saves about {col(saved, "yellow")}" if saved else "", end="")
+
+            print(")", end="")
+
+        @staticmethod
+        def confirmation_prompt() -> None:
+            """
+            Ask to proceed with the download. Comes after `Menu.Main.confirmation_screen`
+            """
+
             print("\n")
             print(f"{INFO} Proceed with the download?")
 
@@ -144,6 +208,17 @@ class DwnMenu:
             print(f"\n{ACTION} Starting to download {col(count, "yellow")} {"items" if count > 1 else "item"}. "
                   f"Please be patient as this might take a while...\n")
 
+        @staticmethod
+        def download_controls(k_pause: str, k_resume: str, k_cancel: str) -> None:
+            """
+            Key bindings for controlling the download
+            :param k_pause: Pause key
+            :param k_resume: Resume key
+            :param k_cancel: Cancel key
+            """
+            print(f"{INFO} Press {col(k_pause.upper(), "cyan")} to pause, {col(k_resume.upper(), "cyan")} to resume, "
+                  f"or {col(k_cancel.upper(), "cyan")} to cancel.\n")
+
         @staticmethod
         def download_status(cur_item: int, total_items: int, downloaded: int, total: int, dwn_percent: float,
                             status: int,
@@ -162,6 +237,8 @@ class DwnMenu:
                 - ``0`` = Finished
                 - ``1`` = Downloading
                 - ``2`` = Post-Processing
+                - ``3`` = Paused
+                - ``4`` = Skipped
                 - ``-1`` = Error
             """
 
@@ -181,25 +258,49 @@ class DwnMenu:
                 sym_status: str = col("✘", "red")
             elif status == 2:
                 sym_status: str = col("⧗", "magenta")
+            elif status == 3:
+                sym_status: str = col("⏸", "yellow")
+            elif status == 4:
+                sym_status: str = col("↷", "yellow")
+            elif status == 5:
+                sym_status: str = col("↺", "green")
             else:
                 sym_status: str = col("?", "yellow")
 
             print(
                 f"{col(f"({cur_item}/{total_items})", "yellow")} [{sym_status}] "
                 f"{col(f"\'{title}\'", "cyan")}: {c_downloaded} / {c_total} "
-                f"{col(f"({dwn_percent}%)", "magenta")}", end="")
+                f"{col(f"({dwn_percent}%)", "magenta")}", end="", flush=True)
 
         @staticmethod
-        def download_status_a(cur_item: int, total_items: int, title: str) -> None:
-            """
-            Download status for Artwork downloads. Since yt-dlp skips download, there is no progress_hook. This is
-            simply a workaround to display the progress. Only display cur/total items, and title
-            :param cur_item: Current item
-            :param total_items: Total items
-            :param title: Title of item
-            """
-            print(f"{col(f"({cur_item}/{total_items})", "yellow")} [{col("✔", "green")}] "
-                  f"{col(f"\'{title}\'", "cyan")}")
+        def artwork_status(total: int, fetched: int, converted: int, failed: int, fetch_rate: float,
+                           fetch_speed: float, convert_rate: float, convert_speed: float, eta: float | None,
+                           final: bool = False) -> None:
+            """
+            Download status for Artwork downloads. Thumbnails are fetched and converted at once, so the progress of both
+            is shown on one line, replacing the previous one. See `ArtworkProgress.status`
+            :param total: Total items
+            :param fetched: Thumbnails fetched
+            :param converted: Thumbnails converted
+            :param failed: Items without a thumbnail, or whose thumbnail failed to convert
+            :param fetch_rate: Thumbnails fetched per second
+            :param fetch_speed: Bytes fetched per second
+            :param convert_rate: Thumbnails converted per second
+            :param convert_speed: Bytes converted per second
+            :param eta: Seconds left. None = Unknown
+            :param final: If True, end the line
+            """
+
+            c_eta: str = MiscUtilities.convert_time(round(eta * 1000)) if eta is not None else "--"
+
+            print("", end="\x1b[1K\r")
+            print(f"{col(f"({converted + failed}/{total})", "yellow")} "
+                  f"Fetched {col(fetched, "cyan")} ({MiscUtilities.convert_bytes(round(fetch_speed))}/s, "
+                  f"{fetch_rate:.1f}/s) | "
+                  f"Converted {col(converted, "green")} ({MiscUtilities.convert_bytes(round(convert_speed))}/s, "
+                  f"{convert_rate:.1f}/s) | "
+                  f"{f"Failed {col(failed, "red")} | " if failed else ""}"
+                  f"ETA {col(c_eta, "magenta")}", end="\n" if final else "", flush=True)
 
         @staticmethod
         def all_downloads_complete(completed: int, total: int, path_dir: str, size: str = "") -> None:
@@ -220,16 +321,159 @@ class DwnMenu:
                 print(f"  Used {col(size, "yellow")} of storage.")
 
         @staticmethod
-        def failed_downloads_list(failed: int, items: list[str]) -> None:
+        def archived_items(count: int) -> None:
+            """
+            Displays how many items were skipped because they are in the download archive.
+            Comes after `Menu.Main.all_downloads_complete`
+            :param count: Number of items in the archive
+            """
+            print(f"  Skipped {col(count, "yellow")} item(s) already in the download archive.")
+
+        @staticmethod
+        def bytes_saved(saved: str) -> None:
+            """
+            Displays the estimated bandwidth saved by downloading audio-only streams.
+            Comes after `Menu.Main.all_downloads_complete`
+            :param saved: Size string of the saved bytes
+            """
+            print(f"  Saved about {col(saved, "yellow")} of bandwidth by skipping video streams.")
+
+        @staticmethod
+        def output_timings(timings: list[tuple[str, str, int, str]]) -> None:
+            """
+            Displays the time spent on each output of the download, and where it was saved.
+            Comes after `Menu.Main.all_downloads_complete`
+            :param timings: List of (output, time string, number of files, directory)
+            """
+            print("  Outputs:")
+
+            for output, elapsed, count, path_dir in timings:
+                print(f"    - {col(output, "cyan")}: {col(count, "yellow")} file(s) in {col(elapsed, "yellow")} "
+                      f"→ {col(f"'{path_dir}'", "magenta")}")
+
+        @staticmethod
+        def linked_copies(count: int, methods: dict[str, int], size: str, time_saved: str = "") -> None:
+            """
+            Displays how many items were linked from identical local files instead of downloaded.
+            Comes after `Menu.Main.all_downloads_complete`
+            :param count: Number of items linked
+            :param methods: Method: Number of items. e.g. {'hardlink': 3, 'copy': 1}
+            :param size: Size string of the bytes not downloaded
+            :param time_saved: Time string of the estimated time saved. If blank, will not display
+            """
+
+            v_methods: str = ", ".join(f"{n} {method}" for method, n in methods.items())
+
+            print(f"  Linked {col(count, "yellow")} item(s) from local copies ({v_methods}), saving "
+                  f"{col(size, "yellow")}", end="")
+
+            print(f" and about {col(time_saved, "yellow")}" if time_saved else "", end="")
+
+            print(".")
+
+        @staticmethod
+        def local_copies(count: int, size: str) -> None:
+            """
+            Displays how many items were extracted from local video files instead of downloaded.
+            Comes after `Menu.Main.all_downloads_complete`
+            :param count: Number of items extracted from local copies
+            :param size: Size string of the local video files that were reused
+            """
+            print(f"  Extracted {col(count, "yellow")} item(s) from local copies ({col(size, "yellow")} of video "
+                  f"not downloaded again).")
+
+        @staticmethod
+        def local_failed_list(count: int, items: list[tuple[str, str]]) -> None:
+            """
+            Displays the items that were downloaded because their local copy couldn't be used.
+            Comes after `Menu.Main.all_downloads_complete`
+            :param count: Number of items downloaded instead
+            :param items: List of the items' titles and reasons
+            """
+            print(f"  Downloaded {col(count, "yellow")} item(s) whose local copy couldn't be used:")
+
+            for title, reason in items:
+                print(f"    - {col(f"\'{title}\'", "cyan")}: {reason}")
+
+        @staticmethod
+        def artwork_conversions(converted: int, skipped: int, file_ext: str, tail: str) -> None:
+            """
+            Displays how many thumbnails were converted while downloading, how many were already in the file format,
+            and how long the last conversions took after the last download. Comes after
+            `Menu.Main.all_downloads_complete`
+            :param converted: Number of thumbnails saved, including the ones not converted
+            :param skipped: Number of thumbnails already in the file format, saved without converting
+            :param file_ext: Extension of the file format
+            :param tail: Time string of the conversions after the last download
+            """
+            print(f"  Converted {col(converted - skipped, "yellow")} thumbnail(s) while downloading "
+                  f"({col(skipped, "yellow")} already {file_ext}, saved without converting). The last conversion "
+                  f"finished {col(tail, "yellow")} after the last download.")
+
+        @staticmethod
+        def audio_conversions(remuxed: int, transcoded: int) -> None:
+            """
+            Displays how many audio files were stream-copied and how many were transcoded.
+            Comes after `Menu.Main.all_downloads_complete`
+            :param remuxed: Number of audio files copied without re-encoding
+            :param transcoded: Number of audio files that were re-encoded
+            """
+            print(f"  Audio: {col(remuxed, "yellow")} copied without re-encoding, "
+                  f"{col(transcoded, "yellow")} transcoded.")
+
+        @staticmethod
+        def post_processing_writes(passes: int, written: str) -> None:
+            """
+            Displays how many ffmpeg passes post-processing needed and how much they wrote.
+            Comes after `Menu.Main.all_downloads_complete`
+            :param passes: Number of ffmpeg passes
+            :param written: Size string of the bytes written
+            """
+            print(f"  Post-processing: {col(passes, "yellow")} ffmpeg pass(es), wrote {col(written, "yellow")}.")
+
+        @staticmethod
+        def ffmpeg_usage(settings: dict[str, str], runs: int, peak: int, run_time: str, cpu_time: str,
+                         wait_time: str) -> None:
+            """
+            Displays the CPU budget of ffmpeg and what the ffmpeg processes used.
+            Comes after `Menu.Main.all_downloads_complete`
+            :param settings: Settings of the budget: {'threads', 'processes', 'priority'}. See `FFmpegBudget.settings`
+            :param runs: Number of ffmpeg processes
+            :param peak: Most ffmpeg processes at once
+            :param run_time: Time string of the ffmpeg processes
+            :param cpu_time: Time string of the CPU time used by child processes
+            :param wait_time: Time string spent waiting for a free ffmpeg slot
+            """
+            print(f"  ffmpeg: {col(runs, "yellow")} process(es), at most {col(peak, "yellow")} at once. "
+                  f"Ran for {col(run_time, "yellow")}, used {col(cpu_time, "yellow")} of CPU, "
+                  f"waited {col(wait_time, "yellow")} for a slot.")
+            print(f"    Budget: {col(settings["threads"], "cyan")} thread(s), {col(settings["processes"], "cyan")} "
+                  f"process(es) at once, {col(settings["priority"], "cyan")} priority.")
+
+        @staticmethod
+        def failed_downloads_list(failed: int, items: list[tuple[str, str]]) -> None:
             """
             Displays all failed downloads in a list. Comes after `Menu.Main.all_downloads_complete`
             :param failed: Number of failed downloads
-            :param items: List of failed downloads' titles
+            :param items: List of failed downloads' titles and reasons. The reason is not displayed if blank
             """
             print(f"{FAIL} {col(failed, "red")} item(s) failed to download:")
 
-            for title in items:
-                print(f"  - {col(f"\'{title}\'", "cyan")}")
+            for title, reason in items:
+                print(f"  - {col(f"\'{title}\'", "cyan")}{f": {reason}" if reason else ""}")
+
+        @staticmethod
+        def reencoded_list(count: int, items: list[tuple[str, str]]) -> None:
+            """
+            Displays the items that were re-encoded because their streams didn't fit the file format.
+            Comes after `Menu.Main.all_downloads_complete`
+            :param count: Number of re-encoded items
+            :param items: List of re-encoded items' titles and reasons
+            """
+            print(f"  Re-encoded {col(count, "yellow")} item(s) that had no streams fitting the file format:")
+
+            for title, reason in items:
+                print(f"    - {col(f"\'{title}\'", "cyan")}: {reason}")
 
         @staticmethod
         def redownloading_item(item: str) -> None:
@@ -299,6 +543,8 @@ class DwnMenu:
             print(f"  {col('2', "cyan")}) OGG")
             print(f"  {col('3', "cyan")}) WAV")
             print(f"  {col('4', "cyan")}) FLAC")
+            print(f"  {col('5', "cyan")}) OPUS")
+            print(f"  {col('6', "cyan")}) M4A (AAC)")
 
     class Artwork:
         """
@@ -158,6 +158,26 @@ class Input:
                     else:
                         InputProblem.Error.invalid_url()
 
+        @staticmethod
+        def get_input_sections() -> str:
+            """
+            Get the sections of each item to download
+            :return: Sections string. See `DwnUtilities.parse_sections`
+            """
+
+            while True:
+                sections: str = input(f"> {CYAN}")
+
+                # Reset ANSI codes
+                print(RESET, end="")
+
+                try:
+                    DwnUtilities.parse_sections(sections=sections)
+                    return sections
+
+                except ValueError as e:
+                    InputProblem.Error.invalid_sections(error=e)
+
     class Integer:
         """
         Input functions that return an integer
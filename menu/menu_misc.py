@@ -17,7 +17,27 @@ class ArgumentMenu:
               f"\n{col("-v, --version", "cyan")}: Show script version."
               f"\n{col("-c, --config", "cyan")}: Open the Config Editor."
               f"\n{col("-f, --format-editor", "cyan")}: Open the Format Editor to edit "
-              f"Filename/Playlist Name formats.")
+              f"Filename/Playlist Name formats."
+              f"\n{col("-B, --bypass-defaults", "cyan")}: Ignore default preferences for this session."
+              f"\n{col("-g, --collect-garbage", "cyan")}: Delete files in the content store that are no longer "
+              f"linked from the download directories."
+              f"\n\nLimits (can be combined with other options, 0 = no limit):"
+              f"\n{col("--max-item-size=MB", "cyan")}: Skip items larger than this size."
+              f"\n{col("--max-job-size=MB", "cyan")}: Skip items once the download would go over this size."
+              f"\n{col("--max-bitrate=KBPS", "cyan")}: Skip videos with a higher video bitrate."
+              f"\n\nSections (can be combined with other options):"
+              f"\n{col("--sections=SECTIONS", "cyan")}: Only download part of each item. Time ranges and/or "
+              f"chapter titles, separated by commas."
+              f"\n  e.g. {col("--sections='0:00-10:00, Intro'", "cyan")}")
+
+    @staticmethod
+    def garbage_collected(deleted: int, size: str) -> None:
+        """
+        Displays the result of cleaning the content store
+        :param deleted: Number of files deleted
+        :param size: Size string of the deleted files
+        """
+        print(f"{INFO} Deleted {col(deleted, 'cyan')} unused file(s) from the content store ({col(size, 'cyan')}).")
 
     @staticmethod
     def show_version(v: str) -> None:
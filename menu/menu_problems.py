@@ -198,6 +198,17 @@ class DwnProblem:
             """
             print(f"\n{WARN} {col("Download aborted.", "yellow")}")
 
+        @staticmethod
+        def download_cancelled(completed: int, total: int) -> None:
+            """
+            Message when a running download is cancelled
+            :param completed: Number of items completed before the cancel
+            :param total: Total number of items
+            """
+            print(f"\n{WARN} {col("Download cancelled.", "yellow")} {col(completed, "yellow")} out of "
+                  f"{col(total, "yellow")} item(s) were completed.")
+            print("  Partially downloaded files were kept. Run the same download again to resume.")
+
         @staticmethod
         def url_is_playlist() -> None:
             """
@@ -326,6 +337,14 @@ class InputProblem:
             """
             print(f"\n{FAIL} {col(f"Not a valid YouTube URL: '{"', '".join(allowed_urls)}'", "red")}")
 
+        @staticmethod
+        def invalid_sections(error: Exception) -> None:
+            """
+            Error when the sections are not valid
+            :param error: Error from parsing the sections
+            """
+            print(f"\n{FAIL} {col(f"Invalid sections: {error}", "red")}")
+
 
 class MiscProblem:
     """
@@ -0,0 +1,700 @@
+"""
+postprocessors.py: Custom yt-dlp post-processors
+"""
+
+import os
+import re
+import time
+
+from wand.image import Image
+from yt_dlp.postprocessor import FFmpegPostProcessor, PostProcessor
+from yt_dlp.networking import Request
+from yt_dlp.utils import PostProcessingError, network_exceptions, prepend_extension, replace_extension
+
+from archive import DownloadArchive
+from formatselector import FormatSelector
+from imageconverter import ImageConverter
+from library import Library
+
+
+class SinglePassPP(FFmpegPostProcessor):
+    """
+    Base for post-processors that write their output in a single ffmpeg pass.
+    Metadata, cover art and chapters are added in the same ffmpeg command, instead of separate post-processors
+    that each rewrite the whole file
+    """
+
+    # Containers that store cover art as an attached picture stream
+    COVER_ATTACHED_PIC: set[str] = {"mp3", "m4a", "mp4", "m4v", "mov", "flac"}
+
+    # Containers that store cover art as an attachment
+    COVER_ATTACHMENT: set[str] = {"mkv", "mka"}
+
+    # Image formats that can be stored as cover art without converting
+    COVER_FORMATS: set[str] = {"jpg", "jpeg", "png"}
+
+    def __init__(self, downloader=None, metadata: bool = False, thumbnail: bool = False, chapters: bool = False,
+                 stats: dict[str, int] = None):
+        """
+        :param downloader: yt-dlp YoutubeDL instance
+        :param metadata: If True, add metadata tags (title, uploader, date...)
+        :param thumbnail: If True, add the thumbnail as cover art. Requires 'writethumbnail'
+        :param chapters: If True, add chapter marks
+        :param stats: Dictionary to add statistics to, if provided
+        """
+
+        super().__init__(downloader)
+
+        self.metadata: bool = metadata
+        self.thumbnail: bool = thumbnail
+        self.chapters: bool = chapters
+
+        self.stats: dict[str, int] = stats if stats is not None else {}
+
+        self.stats.setdefault("ffmpeg_passes", 0)
+        self.stats.setdefault("bytes_written", 0)
+
+    def output_ext(self, info: dict) -> str:
+        """
+        Get the extension of the output file. Redefine in subclasses. By default, the extension of the input
+        :param info: yt-dlp info dictionary
+        :return: Extension
+        """
+
+        return info["ext"]
+
+    def stream_args(self, info: dict) -> list[str]:
+        """
+        Get the ffmpeg output arguments for the media streams of the first input. Redefine in subclasses. By default,
+        every media stream is copied, without the data streams
+        :param info: yt-dlp info dictionary
+        :return: List of ffmpeg arguments, including '-map'
+        """
+
+        return ["-map", "0", "-dn", "-c", "copy"]
+
+    def needs_pass(self, info: dict) -> bool:
+        """
+        Checks if the media streams have to be rewritten, even if no metadata, cover art or chapters are added.
+        Redefine in subclasses
+        :param info: yt-dlp info dictionary
+        :return: True if a pass is needed
+        """
+
+        return False
+
+    @staticmethod
+    def thumbnail_path(info: dict) -> str | None:
+        """
+        Get the path of the thumbnail written by yt-dlp
+        :param info: yt-dlp info dictionary
+        :return: Path to the thumbnail, or None if none was written
+        """
+
+        for thumbnail in reversed(info.get("thumbnails") or []):
+            if thumbnail.get("filepath") and os.path.exists(thumbnail["filepath"]):
+                return thumbnail["filepath"]
+
+        return None
+
+    @staticmethod
+    def metadata_args(info: dict) -> list[str]:
+        """
+        Get the ffmpeg arguments for the metadata tags
+        :param info: yt-dlp info dictionary
+        :return: List of ffmpeg arguments
+        """
+
+        tags: dict[str, str] = {
+            "title": info.get("track") or info.get("title"),
+            "artist": info.get("artist") or info.get("uploader"),
+            "album": info.get("album") or info.get("playlist_title"),
+            "track": info.get("playlist_index"),
+            "date": (info.get("upload_date") or "")[:4],
+            "comment": info.get("webpage_url")
+        }
+
+        args: list[str] = []
+
+        for key, value in tags.items():
+            if value:
+                args += ["-metadata", f"{key}={value}"]
+
+        return args
+
+    @staticmethod
+    def write_chapters(chapters: list[dict], path: str) -> None:
+        """
+        Write chapters to an ffmetadata file
+        :param chapters: List of yt-dlp chapters
+        :param path: Path of the ffmetadata file
+        """
+
+        def escape(text: str) -> str:
+            return re.sub(r"([\\=;#\n])", r"\\\1", text)
+
+        lines: list[str] = [";FFMETADATA1"]
+
+        for chapter in chapters:
+            lines += ["[CHAPTER]", "TIMEBASE=1/1000",
+                      f"START={int(chapter['start_time'] * 1000)}",
+                      f"END={int(chapter['end_time'] * 1000)}"]
+
+            if chapter.get("title"):
+                lines.append(f"title={escape(chapter['title'])}")
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    @staticmethod
+    def cover_args(ext: str, thumbnail: str, input_num: int, video_streams: int) -> list[str]:
+        """
+        Get the ffmpeg arguments to add cover art
+        :param ext: Extension of the output file
+        :param thumbnail: Path to the thumbnail
+        :param input_num: Input number of the thumbnail
+        :param video_streams: Number of video streams already mapped to the output
+        :return: List of ffmpeg arguments. Empty if the container can't hold cover art
+        """
+
+        thumb_ext: str = os.path.splitext(thumbnail)[1][1:].lower()
+
+        if ext in SinglePassPP.COVER_ATTACHMENT:
+            mimetype: str = f"image/{thumb_ext.replace('jpg', 'jpeg')}"
+
+            return ["-attach", FFmpegPostProcessor._ffmpeg_filename_argument(thumbnail),
+                    "-metadata:s:t", f"mimetype={mimetype}",
+                    "-metadata:s:t", f"filename=cover.{thumb_ext}"]
+
+        if ext not in SinglePassPP.COVER_ATTACHED_PIC:
+            return []
+
+        # Convert unsupported image formats (e.g. webp) to png in the same pass
+        codec: str = "copy" if thumb_ext in SinglePassPP.COVER_FORMATS else "png"
+
+        args: list[str] = ["-map", f"{input_num}:v:0", f"-c:v:{video_streams}", codec,
+                           f"-disposition:v:{video_streams}", "attached_pic"]
+
+        if ext == "mp3":
+            args += ["-id3v2_version", "3", f"-metadata:s:v:{video_streams}", "title=Album cover",
+                     f"-metadata:s:v:{video_streams}", "comment=Cover (front)"]
+
+        return args
+
+    def video_streams(self, info: dict) -> int:
+        """
+        Number of video streams from the first input mapped to the output. Redefine in subclasses
+        :param info: yt-dlp info dictionary
+        :return: Number of video streams
+        """
+
+        return 0
+
+    def run(self, info: dict):
+        return self.process(info=info, new_path=replace_extension(info["filepath"], self.output_ext(info), info["ext"]))
+
+    def derive(self, info: dict, output_path: str) -> dict:
+        """
+        Process a local file into another path, keeping the source. Used to reuse files that are already on disk
+        :param info: yt-dlp info dictionary. 'filepath' is the source file
+        :param output_path: Path of the output file
+        :return: Updated info dictionary
+        """
+
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+        _, info = self.process(info=info, new_path=output_path)
+
+        return info
+
+    def process(self, info: dict, new_path: str) -> tuple[list[str], dict]:
+        """
+        Write the output file in a single ffmpeg pass
+        :param info: yt-dlp info dictionary
+        :param new_path: Path of the output file
+        :return: Files to delete and the updated info dictionary
+        """
+
+        path: str = info["filepath"]
+        ext: str = self.output_ext(info)
+
+        thumbnail: str | None = self.thumbnail_path(info) if self.thumbnail else None
+        chapters: list[dict] = (info.get("chapters") or []) if self.chapters else []
+
+        # Nothing to add or rewrite
+        if new_path == path and not (self.needs_pass(info) or self.metadata or thumbnail or chapters):
+            return [], info
+
+        temp_path: str = prepend_extension(new_path, "temp")
+        meta_path: str = prepend_extension(new_path, "meta")
+
+        inputs: list[tuple[str, list[str]]] = [(path, [])]
+        args: list[str] = self.stream_args(info)
+
+        if self.metadata:
+            args += self.metadata_args(info)
+
+        if chapters:
+            self.write_chapters(chapters=chapters, path=meta_path)
+
+            inputs.append((meta_path, ["-f", "ffmetadata"]))
+            args += ["-map_chapters", str(len(inputs) - 1)]
+
+        if thumbnail:
+            cover: list[str] = self.cover_args(ext=ext, thumbnail=thumbnail, input_num=len(inputs),
+                                               video_streams=self.video_streams(info))
+
+            # Attachments are not inputs
+            if cover and cover[0] == "-map":
+                inputs.append((thumbnail, []))
+
+            args += cover
+
+        try:
+            self.real_run_ffmpeg(inputs, [(temp_path, args)])
+
+        except Exception as e:
+            raise PostProcessingError(f"{self.pp_key()} failed: {e}")
+
+        finally:
+            if chapters and os.path.exists(meta_path):
+                os.remove(meta_path)
+
+        os.replace(temp_path, new_path)
+
+        self.stats["ffmpeg_passes"] += 1
+        self.stats["bytes_written"] += os.path.getsize(new_path)
+
+        info["filepath"] = new_path
+        info["ext"] = ext
+
+        # Delete the original download if it was replaced, and the thumbnail that was only needed for the cover
+        files_to_delete: list[str] = [path] if new_path != path else []
+
+        if thumbnail:
+            files_to_delete.append(thumbnail)
+
+        return files_to_delete, info
+
+
+class AudioPP(SinglePassPP):
+    """
+    Extracts the audio from a download. Stream-copies the audio into the target container when the source codec
+    allows it, and only transcodes when it doesn't
+    """
+
+    # Audio targets for each audio file format
+    # File format: (extension, ffmpeg encoder, encoder options, source codecs that can be stream-copied)
+    TARGETS: dict[int, tuple[str, str, list[str], set[str]]] = {
+        1: ("mp3", "libmp3lame", ["-q:a", "0"], {"mp3"}),
+        2: ("ogg", "libvorbis", ["-q:a", "10"], {"vorbis", "opus"}),
+        3: ("wav", "pcm_s16le", [], {"pcm_s16le"}),
+        4: ("flac", "flac", [], {"flac"}),
+        5: ("opus", "libopus", [], {"opus"}),
+        6: ("m4a", "aac", ["-q:a", "4"], {"aac", "alac"})
+    }
+
+    # yt-dlp codec names to ffprobe codec names
+    CODEC_ALIASES: dict[str, str] = {
+        "mp4a": "aac",
+        "vrbs": "vorbis",
+        "ac-3": "ac3",
+        "ec-3": "eac3"
+    }
+
+    def __init__(self, downloader=None, file_format: int = 1, **kwargs):
+        """
+        :param downloader: yt-dlp YoutubeDL instance
+        :param file_format: Audio file format
+        :param kwargs: Options for SinglePassPP
+        """
+
+        super().__init__(downloader, **kwargs)
+
+        self.file_format: int = file_format
+
+        self.stats.setdefault("audio_remuxed", 0)
+        self.stats.setdefault("audio_transcoded", 0)
+
+    @classmethod
+    def pp_key(cls):
+        return "AdvAudio"
+
+    def source_codec(self, info: dict) -> str | None:
+        """
+        Get the audio codec of the downloaded file
+        :param info: yt-dlp info dictionary
+        :return: Codec name as used by ffmpeg, or None if unknown
+        """
+
+        # Use the codec of the selected format. e.g. 'mp4a.40.2' -> 'aac'
+        acodec: str | None = info.get("acodec")
+
+        if acodec and acodec != "none":
+            codec: str = acodec.split(".")[0].lower()
+            return AudioPP.CODEC_ALIASES.get(codec, codec)
+
+        # Fallback to ffprobe
+        return self.get_audio_codec(info["filepath"])
+
+    def can_copy(self, info: dict) -> bool:
+        """
+        Checks if the audio of a download can be stream-copied into the target container
+        :param info: yt-dlp info dictionary
+        :return: True if no transcode is needed
+        """
+
+        _, _, _, copyable = AudioPP.TARGETS[self.file_format]
+
+        return self.source_codec(info) in copyable
+
+    def output_ext(self, info: dict) -> str:
+        return AudioPP.TARGETS[self.file_format][0]
+
+    def stream_args(self, info: dict) -> list[str]:
+        _, encoder, options, _ = AudioPP.TARGETS[self.file_format]
+
+        if self.can_copy(info):
+            return ["-map", "0:a:0", "-c:a", "copy"]
+
+        return ["-map", "0:a:0", "-c:a", encoder, *options]
+
+    def needs_pass(self, info: dict) -> bool:
+        # Already in the target format if the audio can be copied and the extension matches
+        return not self.can_copy(info)
+
+    def process(self, info: dict, new_path: str) -> tuple[list[str], dict]:
+        copy: bool = self.can_copy(info)
+        files_to_delete, info = super().process(info=info, new_path=new_path)
+
+        self.stats["audio_remuxed" if copy else "audio_transcoded"] += 1
+
+        return files_to_delete, info
+
+
+class VideoTagPP(SinglePassPP):
+    """
+    Adds metadata, cover art and chapters to a merged video in one pass. The streams are copied, never re-encoded
+    """
+
+    @classmethod
+    def pp_key(cls):
+        return "AdvVideoTag"
+
+    def video_streams(self, info: dict) -> int:
+        # Merged downloads have one video stream
+        return 1 if info.get("vcodec") not in (None, "none") else 0
+
+
+class ContainerPP(SinglePassPP):
+    """
+    Re-encodes merged videos whose streams the chosen container can't hold. Only a fallback: format selection prefers
+    streams that fit (see `FormatSelector.container_format`).
+    Added at two stages:
+    - 'video': Before the file name is set. Formats that don't fit are merged into MKV, which holds any codec
+    - 'post_process': The MKV is converted to the container, copying the streams that fit and re-encoding the rest
+    """
+
+    # File format: (extension, video encoder options, audio encoder options)
+    TARGETS: dict[int, tuple[str, list[str], list[str]]] = {
+        1: ("mp4", ["-c:v", "libx264", "-crf", "20", "-preset", "fast"], ["-c:a", "aac", "-b:a", "192k"]),
+        3: ("webm", ["-c:v", "libvpx-vp9", "-crf", "32", "-b:v", "0", "-row-mt", "1"],
+            ["-c:a", "libopus", "-b:a", "160k"])
+    }
+
+    # Extension the formats are merged into when they don't fit
+    MERGE_EXT: str = "mkv"
+
+    def __init__(self, downloader=None, file_format: int = 1, log: list[tuple[str, str]] = None, **kwargs):
+        """
+        :param downloader: yt-dlp YoutubeDL instance
+        :param file_format: Video file format
+        :param log: List to add re-encoded items to, as (title, reason)
+        :param kwargs: Options for SinglePassPP
+        """
+
+        super().__init__(downloader, **kwargs)
+
+        self.file_format: int = file_format
+        self.log: list[tuple[str, str]] = log if log is not None else []
+
+        self.stats.setdefault("container_reencoded", 0)
+
+    @classmethod
+    def pp_key(cls):
+        return "AdvContainer"
+
+    def misfits(self, info: dict) -> list[str]:
+        """
+        Get the streams of the chosen formats that the container can't hold
+        :param info: yt-dlp info dictionary with the chosen formats
+        :return: List of 'video' and/or 'audio'
+        """
+
+        v_codecs, a_codecs = FormatSelector.CONTAINER_CODECS[self.file_format]
+        v_family: str | None = FormatSelector.codec_family(info.get("vcodec"))
+        a_family: str | None = FormatSelector.codec_family(info.get("acodec"))
+
+        return ([stream for stream, family, codecs in (("video", v_family, v_codecs), ("audio", a_family, a_codecs))
+                 if family and codecs is not None and family not in codecs])
+
+    def output_ext(self, info: dict) -> str:
+        return ContainerPP.TARGETS[self.file_format][0]
+
+    def stream_args(self, info: dict) -> list[str]:
+        _, video_args, audio_args = ContainerPP.TARGETS[self.file_format]
+        misfits: list[str] = info["__adv_misfits"]
+
+        return ["-map", "0:v:0", "-map", "0:a:0?", "-c", "copy",
+                *(video_args if "video" in misfits else []), *(audio_args if "audio" in misfits else [])]
+
+    def needs_pass(self, info: dict) -> bool:
+        return True
+
+    def run(self, info: dict):
+        if self.file_format not in ContainerPP.TARGETS:
+            return [], info
+
+        if "filepath" not in info:
+            # Before the download. Only merged formats are put into the container
+            misfits: list[str] = self.misfits(info) if info.get("requested_formats") else []
+
+            if misfits:
+                info["__adv_misfits"] = misfits
+                info["ext"] = ContainerPP.MERGE_EXT
+
+            return [], info
+
+        if not info.get("__adv_misfits") or info["ext"] != ContainerPP.MERGE_EXT:
+            return [], info
+
+        ext: str = self.output_ext(info)
+        codecs: dict[str, str] = {"video": info.get("vcodec"), "audio": info.get("acodec")}
+        reason: str = ", ".join(f"{FormatSelector.codec_family(codecs[stream]).upper()} {stream}"
+                                for stream in info["__adv_misfits"])
+
+        self.report_warning(f"{ext.upper()} can't hold {reason}. Re-encoding")
+        self.log.append((info.get("title") or info["id"], f"Re-encoded {reason} to fit {ext.upper()}"))
+
+        files_to_delete, info = self.process(info=info, new_path=replace_extension(info["filepath"], ext,
+                                                                                  ContainerPP.MERGE_EXT))
+
+        self.stats["container_reencoded"] += 1
+
+        return files_to_delete, info
+
+
+class LibraryPP(PostProcessor):
+    """
+    Adds finished files to the library index
+    """
+
+    def __init__(self, downloader=None, library: Library = None, entry: dict = None, stats: dict[str, int] = None):
+        """
+        :param downloader: yt-dlp YoutubeDL instance
+        :param library: Library to add the files to
+        :param entry: Fields of the record: dwn_type, file_format, quality, sections. See `Library.add`
+        :param stats: Not used
+        """
+
+        super().__init__(downloader)
+
+        self.library: Library = library
+        self.entry: dict = entry or {}
+
+    @classmethod
+    def pp_key(cls):
+        return "AdvLibrary"
+
+    def run(self, info: dict):
+        # Written in batches. The rest is written when the download finishes
+        self.library.add(info=info, path=info["filepath"], **self.entry)
+
+        return [], info
+
+
+class ArchivePP(PostProcessor):
+    """
+    Adds finished items to the download archive
+    """
+
+    def __init__(self, downloader=None, archive: DownloadArchive = None, profile: str = "",
+                 stats: dict[str, int] = None):
+        """
+        :param downloader: yt-dlp YoutubeDL instance
+        :param archive: Archive to add the items to
+        :param profile: Output profile of the download. See `DownloadArchive.profile`
+        :param stats: Not used
+        """
+
+        super().__init__(downloader)
+
+        self.archive: DownloadArchive = archive
+        self.profile: str = profile
+
+    @classmethod
+    def pp_key(cls):
+        return "AdvArchive"
+
+    def run(self, info: dict):
+        self.archive.add(extractor=info["extractor_key"], video_id=info["id"], profile=self.profile)
+
+        return [], info
+
+
+class ArtworkPP(PostProcessor):
+    """
+    Fetches the thumbnail of each item into memory and hands it on, so it can be converted while the next items are
+    extracted. Runs before the (skipped) download
+    """
+
+    def __init__(self, downloader=None, callback=None, file_ext: str = "png", stats: dict[str, int] = None):
+        """
+        :param downloader: yt-dlp YoutubeDL instance
+        :param callback: Called as callback(index, thumbnail, target) for each item. thumbnail is None if none could
+        be fetched, and target is the path of the artwork
+        :param file_ext: Extension of the artwork file format
+        :param stats: Not used
+        """
+
+        super().__init__(downloader)
+
+        self.callback = callback
+        self.file_ext: str = file_ext
+
+    @classmethod
+    def pp_key(cls):
+        return "AdvArtwork"
+
+    def fetch(self, info: dict) -> bytes | None:
+        """
+        Fetch the best thumbnail that can be fetched. yt-dlp lists thumbnails from worst to best
+        :param info: yt-dlp info dictionary
+        :return: The thumbnail, or None if none could be fetched
+        """
+
+        for thumbnail in reversed(info.get("thumbnails") or []):
+            try:
+                with self._downloader.urlopen(Request(thumbnail["url"],
+                                                      headers=thumbnail.get("http_headers", {}))) as response:
+                    return response.read()
+
+            except network_exceptions as e:
+                self.write_debug(f"Unable to fetch thumbnail {thumbnail.get('id')}: {e}")
+
+        return None
+
+    def run(self, info: dict):
+        # Same path yt-dlp would write the thumbnail to, in the artwork format
+        target: str = replace_extension(self._downloader.prepare_filename(info, "thumbnail"), self.file_ext,
+                                        info.get("ext"))
+
+        self.callback((info.get("playlist_index") or 1) - 1, self.fetch(info), target)
+
+        return [], info
+
+
+class OutputsPP(PostProcessor):
+    """
+    Makes extra outputs from a finished video download: the audio, and the thumbnail as artwork. The media is only
+    fetched once, every other output is made from the local files
+    """
+
+    # Extensions of the artwork file formats
+    ARTWORK_EXTS: dict[int, str] = {
+        1: "png",
+        2: "jpg"
+    }
+
+    def __init__(self, downloader=None, video_dir: str = "", audio: dict = None, artwork: dict = None,
+                 keep_thumbnail: bool = False, library: Library = None, sections: str = None,
+                 stats: dict[str, int] = None):
+        """
+        :param downloader: yt-dlp YoutubeDL instance
+        :param video_dir: Download directory of the video. Outputs keep the path of the video relative to it
+        :param audio: Audio output: {'dwn_dir': directory, 'pp_args': options for AudioPP}. None = No audio
+        :param artwork: Artwork output: {'dwn_dir': directory, 'file_format': artwork file format, 'settings': encode
+        settings (see `ImageConverter.encode`)}. None = No artwork
+        :param keep_thumbnail: If True, leave the thumbnail for the post-processors after this one (cover art)
+        :param library: Library to add the audio files to, if provided
+        :param sections: Sections of the download, recorded with the audio files. See `Library.add`
+        :param stats: Dictionary to add statistics to, if provided
+        """
+
+        super().__init__(downloader)
+
+        self.video_dir: str = video_dir
+        self.audio: dict | None = audio
+        self.artwork: dict | None = artwork
+        self.keep_thumbnail: bool = keep_thumbnail
+        self.library: Library | None = library
+        self.sections: str | None = sections
+
+        self.stats: dict[str, int] = stats if stats is not None else {}
+
+    @classmethod
+    def pp_key(cls):
+        return "AdvOutputs"
+
+    def output_path(self, info: dict, dwn_dir: str, ext: str) -> str:
+        """
+        Get the path of an output. Same path as the video, relative to the output's directory
+        :param info: yt-dlp info dictionary of the video
+        :param dwn_dir: Directory of the output
+        :param ext: Extension of the output
+        :return: Path of the output
+        """
+
+        relative: str = os.path.relpath(info["filepath"], self.video_dir)
+
+        return os.path.join(dwn_dir, replace_extension(relative, ext, info["ext"]))
+
+    def record(self, output: str, start: float, path: str) -> None:
+        """
+        Add the time and size of a finished output to the statistics
+        :param output: Name of the output. e.g. 'audio'
+        :param start: `time.perf_counter()` when the output was started
+        :param path: Path of the output
+        """
+
+        for key, value in ((f"output_count_{output}", 1),
+                           (f"output_ms_{output}", round((time.perf_counter() - start) * 1000)),
+                           (f"output_bytes_{output}", os.path.getsize(path))):
+            self.stats[key] = self.stats.get(key, 0) + value
+
+    def run(self, info: dict):
+        thumbnail: str | None = SinglePassPP.thumbnail_path(info)
+
+        if self.audio:
+            start: float = time.perf_counter()
+
+            pp: AudioPP = AudioPP(self._downloader, stats=self.stats, **self.audio["pp_args"])
+            path: str = self.output_path(info=info, dwn_dir=self.audio["dwn_dir"], ext=pp.output_ext(info))
+
+            # Keep the video's info unchanged for the post-processors after this one
+            audio_info: dict = pp.derive(info=dict(info), output_path=path)
+
+            self.record(output="audio", start=start, path=path)
+
+            if self.library:
+                self.library.add(info=audio_info, path=path, dwn_type=2, file_format=pp.file_format,
+                                 sections=self.sections)
+
+        if self.artwork and thumbnail:
+            start: float = time.perf_counter()
+
+            ext: str = OutputsPP.ARTWORK_EXTS[self.artwork["file_format"]]
+            path: str = self.output_path(info=info, dwn_dir=self.artwork["dwn_dir"], ext=ext)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            with Image(filename=thumbnail) as image:
+                ImageConverter.write(path=path, data=ImageConverter.encode(image=image, ext=ext,
+                                                                           settings=self.artwork.get("settings")))
+
+            self.record(output="artwork", start=start, path=path)
+
+        # The thumbnail was only written for the outputs
+        files_to_delete: list[str] = [thumbnail] if thumbnail and not self.keep_thumbnail else []
+
+        return files_to_delete, info
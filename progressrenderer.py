@@ -0,0 +1,94 @@
+"""
+progressrenderer.py: Draws download progress at a fixed rate, apart from the threads that report it
+"""
+
+from threading import Event, Lock, Thread
+
+
+class ProgressRenderer:
+    """
+    Draws the progress of a download on its own thread, at a fixed rate. yt-dlp reports progress for every chunk it
+    receives, thousands of times per second on fast links, and drawing each report on the download thread slows it
+    down. A report only replaces the latest one, without a lock, and the renderer draws the latest report it hasn't
+    drawn yet. Reports that must be on screen before anything else is printed are drawn with `ProgressRenderer.draw`
+    """
+
+    # Seconds between draws (10 Hz)
+    INTERVAL: float = 0.1
+
+    def __init__(self, render, interval: float = INTERVAL):
+        """
+        :param render: Draws a report. Called as render(**report)
+        :param interval: Seconds between draws
+        """
+
+        self.render = render
+        self.interval: float = interval
+
+        # Latest report. Replacing it is a single assignment, so reporting needs no lock
+        self.latest: dict | None = None
+
+        # Last report drawn
+        self.drawn: dict | None = None
+
+        # Reports are drawn by the renderer, and right away by `ProgressRenderer.draw`. One at a time
+        self.lock: Lock = Lock()
+
+        self.stopped: Event = Event()
+        self.thread: Thread | None = None
+
+    def start(self) -> None:
+        """
+        Start drawing the reports
+        """
+
+        if self.thread is not None:
+            return
+
+        self.stopped.clear()
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop drawing the reports. The latest report is drawn if it wasn't yet
+        """
+
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.thread = None
+
+        self.flush()
+
+    def update(self, **report) -> None:
+        """
+        Report progress. Returns right away, the report is drawn by the renderer unless a newer one replaces it first
+        """
+
+        self.latest = report
+
+    def draw(self, **report) -> None:
+        """
+        Draw a report right away, e.g. before a new line is started. Reports not drawn yet are dropped
+        """
+
+        with self.lock:
+            self.latest = self.drawn = report
+            self.render(**report)
+
+    def flush(self) -> None:
+        """
+        Draw the latest report if it wasn't yet
+        """
+
+        with self.lock:
+            report: dict | None = self.latest
+
+            if report is not None and report is not self.drawn:
+                self.drawn = report
+                self.render(**report)
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self.flush()
@@ -0,0 +1,322 @@
+"""
+segmented.py: Multi-connection HTTP downloader for single-file formats
+"""
+
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
+from math import ceil
+from queue import SimpleQueue
+from threading import Event, Lock
+
+import yt_dlp as yt
+from yt_dlp.downloader import get_suitable_downloader
+from yt_dlp.downloader.external import ExternalFD
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.networking import Request
+from yt_dlp.networking.exceptions import RequestError
+
+
+class SegmentedFD(ExternalFD):
+    """
+    Downloads a single file in byte ranges over several connections at once, into a preallocated file.
+    Servers often throttle each connection, so several connections are faster than one.
+    Each segment is retried on its own, and the progress of every segment is saved so a download can be resumed.
+    Used by `SegmentedYoutubeDL`. The number of connections is yt-dlp's 'concurrent_fragment_downloads' option
+    """
+
+    SUPPORTED_PROTOCOLS = ("http", "https")
+
+    # Smallest segment. Files smaller than this use a single connection
+    MIN_SEGMENT: int = 1024 ** 2
+
+    # Size of each read
+    CHUNK_SIZE: int = 64 * 1024
+
+    # Seconds between progress updates and saves of the segment state
+    PROGRESS_INTERVAL: float = 0.2
+    STATE_INTERVAL: float = 1.0
+
+    # Extension of the file that keeps the progress of each segment
+    STATE_EXT: str = ".segments"
+
+    @classmethod
+    def available(cls, path=None):
+        # Not an external program
+        return True
+
+    @classmethod
+    def supports(cls, info_dict):
+        return super().supports(info_dict) and not info_dict.get("is_live")
+
+    @staticmethod
+    def state_path(tmpfilename: str) -> str:
+        """
+        Get the path of the segment state of a download
+        :param tmpfilename: Path of the partial file
+        :return: Path of the state file
+        """
+
+        return tmpfilename + SegmentedFD.STATE_EXT
+
+    @staticmethod
+    def plan_segments(total: int, connections: int) -> list[list[int]]:
+        """
+        Split a file into byte ranges
+        :param total: Size of the file in bytes
+        :param connections: Maximum number of segments
+        :return: List of [start, end, done]. 'end' is inclusive, 'done' is the number of bytes already written
+        """
+
+        count: int = max(1, min(connections, total // SegmentedFD.MIN_SEGMENT))
+        size: int = ceil(total / count)
+
+        return [[start, min(start + size, total) - 1, 0] for start in range(0, total, size)]
+
+    def request(self, info_dict: dict, start: int, end: int | str = ""):
+        """
+        Open a ranged request for the file
+        :param info_dict: yt-dlp info dictionary of the format
+        :param start: First byte
+        :param end: Last byte. Blank for the rest of the file
+        :return: Response
+        """
+
+        headers: dict = {**(info_dict.get("http_headers") or {}), "Range": f"bytes={start}-{end}"}
+
+        return self.ydl.urlopen(Request(info_dict["url"], headers=headers))
+
+    def load_state(self, tmpfilename: str, total: int) -> list[list[int]] | None:
+        """
+        Load the segments of an interrupted download of the same file
+        :return: Segments, or None if the download can't be resumed
+        """
+
+        if not self.params.get("continuedl", True) or not os.path.isfile(tmpfilename):
+            return None
+
+        try:
+            with open(SegmentedFD.state_path(tmpfilename), "r", encoding="utf-8") as f:
+                state: dict = json.load(f)
+
+        except (OSError, ValueError):
+            return None
+
+        if state.get("total") != total or os.path.getsize(tmpfilename) != total:
+            return None
+
+        return state["segments"]
+
+    @staticmethod
+    def save_state(tmpfilename: str, total: int, segments: list[list[int]]) -> None:
+        """
+        Save the progress of each segment
+        """
+
+        with open(SegmentedFD.state_path(tmpfilename), "w", encoding="utf-8") as f:
+            json.dump({"total": total, "segments": segments}, f)
+
+    def _call_downloader(self, tmpfilename, info_dict):
+        connections: int = max(1, self.params.get("concurrent_fragment_downloads") or 1)
+
+        # Get the size, and check if the server accepts ranges
+        response = self.request(info_dict=info_dict, start=0)
+        content_range = re.fullmatch(r"bytes \d+-\d+/(\d+)", response.headers.get("Content-Range") or "")
+
+        if response.status != 206 or not content_range:
+            # Ranges not supported. Download in one piece
+            return self.download_single(response=response, tmpfilename=tmpfilename, info_dict=info_dict)
+
+        total: int = int(content_range.group(1))
+        segments: list[list[int]] | None = self.load_state(tmpfilename=tmpfilename, total=total)
+
+        if segments is None:
+            segments = SegmentedFD.plan_segments(total=total, connections=connections)
+
+            # Preallocate the file, so each segment can write at its offset
+            with open(tmpfilename, "wb") as f:
+                f.truncate(total)
+
+        # The first connection already started at byte 0. Only reuse it if the first segment starts there
+        first = response if segments[0][2] == 0 else None
+
+        if first is None:
+            response.close()
+
+        lock: Lock = Lock()
+        stop: Event = Event()
+
+        # Retries of the segments, as report_retry arguments. Reported from this thread, like the progress
+        retry_reports: SimpleQueue = SimpleQueue()
+
+        def report_retries() -> None:
+            while not retry_reports.empty():
+                self.report_retry(*retry_reports.get())
+
+        def fetch(segment: list[int], response=None) -> None:
+            retries: int = self.params.get("retries", 10)
+            attempt: int = 0
+
+            with open(tmpfilename, "r+b") as f:
+                while segment[0] + segment[2] <= segment[1]:
+                    try:
+                        if response is None:
+                            response = self.request(info_dict=info_dict, start=segment[0] + segment[2],
+                                                    end=segment[1])
+
+                            # The whole file instead of the range would be written at the wrong offset
+                            if response.status != 206:
+                                raise RequestError(f"Range not accepted (HTTP {response.status})")
+
+                        while not stop.is_set() and segment[0] + segment[2] <= segment[1]:
+                            remaining: int = segment[1] - segment[0] - segment[2] + 1
+                            chunk: bytes = response.read(min(SegmentedFD.CHUNK_SIZE, remaining))
+
+                            if not chunk:
+                                raise RequestError("Connection closed early")
+
+                            os.pwrite(f.fileno(), chunk, segment[0] + segment[2])
+
+                            with lock:
+                                segment[2] += len(chunk)
+
+                        if stop.is_set():
+                            return
+
+                    except (RequestError, OSError) as e:
+                        attempt += 1
+
+                        if attempt > retries or stop.is_set():
+                            raise
+
+                        retry_reports.put((e, attempt, retries))
+                        time.sleep(min(2 ** attempt * 0.1, 5))
+
+                    finally:
+                        if response is not None:
+                            response.close()
+                            response = None
+
+        started: float = time.time()
+        resumed: int = sum(segment[2] for segment in segments)
+        last_save: float = started
+
+        with ThreadPoolExecutor(max_workers=len(segments)) as pool:
+            futures = [pool.submit(fetch, segment, first if i == 0 else None)
+                       for i, segment in enumerate(segments)]
+
+            try:
+                while True:
+                    done, pending = wait(futures, timeout=SegmentedFD.PROGRESS_INTERVAL, return_when=FIRST_EXCEPTION)
+                    report_retries()
+
+                    with lock:
+                        downloaded: int = sum(segment[2] for segment in segments)
+
+                    elapsed: float = time.time() - started
+                    speed: float | None = (downloaded - resumed) / elapsed if elapsed > 0 else None
+
+                    # Progress hooks run here, so a pause or cancel stops the download from this thread
+                    self._hook_progress({
+                        "status": "downloading",
+                        "downloaded_bytes": downloaded,
+                        "total_bytes": total,
+                        "tmpfilename": tmpfilename,
+                        "filename": info_dict.get("_filename"),
+                        "elapsed": elapsed,
+                        "speed": speed,
+                        "eta": (total - downloaded) / speed if speed else None
+                    }, info_dict)
+
+                    if any(future.exception() for future in done):
+                        raise next(future.exception() for future in done if future.exception())
+
+                    if not pending:
+                        break
+
+                    if time.time() - last_save >= SegmentedFD.STATE_INTERVAL:
+                        with lock:
+                            SegmentedFD.save_state(tmpfilename=tmpfilename, total=total, segments=segments)
+
+                        last_save = time.time()
+
+            except BaseException as e:
+                stop.set()
+                wait(futures)
+                report_retries()
+
+                # Keep the progress for a resume
+                SegmentedFD.save_state(tmpfilename=tmpfilename, total=total, segments=segments)
+
+                if isinstance(e, (RequestError, OSError)):
+                    self.report_error(f"Segmented download failed: {e}")
+                    return 1
+
+                raise
+
+        self.try_remove(SegmentedFD.state_path(tmpfilename))
+
+        return 0
+
+    def download_single(self, response, tmpfilename: str, info_dict: dict) -> int:
+        """
+        Download the whole file over one connection. Used when the server doesn't accept ranges
+        :return: 0 on success
+        """
+
+        total: int | None = int(response.headers["Content-Length"]) if response.headers.get("Content-Length") else None
+        downloaded: int = 0
+        started: float = time.time()
+        last_progress: float = 0.0
+
+        with response, open(tmpfilename, "wb") as f:
+            while chunk := response.read(SegmentedFD.CHUNK_SIZE):
+                f.write(chunk)
+                downloaded += len(chunk)
+
+                if time.time() - last_progress < SegmentedFD.PROGRESS_INTERVAL:
+                    continue
+
+                last_progress = time.time()
+
+                self._hook_progress({
+                    "status": "downloading",
+                    "downloaded_bytes": downloaded,
+                    "total_bytes": total,
+                    "tmpfilename": tmpfilename,
+                    "filename": info_dict.get("_filename"),
+                    "elapsed": time.time() - started
+                }, info_dict)
+
+        return 0
+
+
+class SegmentedYoutubeDL(yt.YoutubeDL):
+    """
+    YoutubeDL that downloads single-file formats over HTTP(S) with `SegmentedFD`, in place of yt-dlp's own HTTP
+    downloader. Whatever yt-dlp gives to another downloader (sections, HLS/DASH, an 'external_downloader' of the user)
+    keeps it. Tests and downloads to stdout use the downloader yt-dlp picks as well
+    """
+
+    def dl(self, name, info, subtitle=False, test=False):
+        if (test or name == "-" or not info.get("url") or
+                get_suitable_downloader(info, self.params) is not HttpFD or
+                not SegmentedFD.supports(info)):
+            return super().dl(name, info, subtitle=subtitle, test=test)
+
+        # Set up like the downloader yt-dlp picks
+        fd: SegmentedFD = SegmentedFD(self, self.params)
+
+        for hook in self._progress_hooks:
+            fd.add_progress_hook(hook)
+
+        self.write_debug(f'Invoking {fd.FD_NAME} downloader on "{info["url"]}"')
+
+        new_info: dict = self._copy_infodict(info)
+
+        if new_info.get("http_headers") is None:
+            new_info["http_headers"] = self._calc_headers(new_info)
+
+        return fd.download(name, new_info, subtitle)
@@ -1,4 +1,7 @@
+import fcntl
+import os
 import re
+import shutil
 from pathlib import Path
 
 import yt_dlp as yt
@@ -9,6 +12,55 @@ class DwnUtilities:
     Utilities for the Downloader
     """
 
+    # Time range for sections. e.g. '1:00-5:30', '2:00:00-', '-10:00'
+    TIME_RANGE_RE: str = r"(?P<start>\d+(?::\d{1,2}){0,2}(?:\.\d+)?)?\s*-\s*(?P<end>\d+(?::\d{1,2}){0,2}(?:\.\d+)?)?"
+
+    # ioctl request to clone a file's data into another file (Linux). Supported by Btrfs, XFS and others
+    FICLONE: int = 0x40049409
+
+    @staticmethod
+    def parse_sections(sections: str) -> tuple[list[re.Pattern], list[tuple[float, float]]]:
+        """
+        Parse the sections of an item to download. Each section is separated by a comma, and is either a time range
+        ('start-end', either side can be left out) or a chapter title (regex)
+        e.g. '0:00-10:00, Intro' --> ([re.compile('Intro')], [(0.0, 600.0)])
+        :param sections: Sections string
+        :return: Tuple of (chapter regexes, time ranges in seconds). An open end is 'inf'
+        :raises ValueError: If a section is invalid
+        """
+
+        chapters: list[re.Pattern] = []
+        ranges: list[tuple[float, float]] = []
+
+        for section in map(str.strip, sections.split(",")):
+            if not section:
+                continue
+
+            match = re.fullmatch(DwnUtilities.TIME_RANGE_RE, section)
+
+            if match and (match.group("start") or match.group("end")):
+                # Time range
+                start: float = yt.utils.parse_duration(match.group("start")) if match.group("start") else 0.0
+                end: float = yt.utils.parse_duration(match.group("end")) if match.group("end") else float("inf")
+
+                if end <= start:
+                    raise ValueError(f"'{section}': The end must be after the start")
+
+                ranges.append((start, end))
+                continue
+
+            # Chapter title
+            try:
+                chapters.append(re.compile(section, re.IGNORECASE))
+
+            except re.error as e:
+                raise ValueError(f"'{section}': Invalid chapter title: {e}")
+
+        if not chapters and not ranges:
+            raise ValueError("No sections given")
+
+        return chapters, ranges
+
     @staticmethod
     def get_playlist_name(url: str, pn_format: list[str]) -> str:
         """
@@ -88,6 +140,46 @@ class DwnUtilities:
             # File
             Path(path).unlink()
 
+    @staticmethod
+    def link_file(source: str, target: str, symlink: bool = False) -> str:
+        """
+        Make a file available at another path without copying its data, if possible. Tries a hardlink, then a
+        reflink (copy-on-write clone), and falls back to a copy, e.g. across filesystems
+        :param source: Path of the existing file
+        :param target: Path of the new file. Must not exist
+        :param symlink: If True, fall back to a symbolic link instead of a copy
+        :return: Method used: 'hardlink', 'reflink', 'symlink' or 'copy'
+        :raises FileExistsError: If the target exists
+        """
+
+        if Path(target).exists():
+            raise FileExistsError(f"'{target}' already exists")
+
+        Path(target).parent.mkdir(parents=True, exist_ok=True)
+
+        try:
+            os.link(source, target)
+            return "hardlink"
+
+        except OSError:
+            pass
+
+        try:
+            with open(source, "rb") as src, open(target, "xb") as dst:
+                fcntl.ioctl(dst.fileno(), DwnUtilities.FICLONE, src.fileno())
+
+            return "reflink"
+
+        except OSError:
+            Path(target).unlink(missing_ok=True)
+
+        if symlink:
+            os.symlink(os.path.abspath(source), target)
+            return "symlink"
+
+        shutil.copy2(source, target)
+        return "copy"
+
     @staticmethod
     def sanitize_list(unclean_list: list[str]) -> list[str]:
         """
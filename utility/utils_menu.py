@@ -22,7 +22,9 @@ class MenuUtilities:
             1: "MP3",
             2: "OGG",
             3: "WAV",
-            4: "FLAC"
+            4: "FLAC",
+            5: "OPUS",
+            6: "M4A"
         },
         "file_format_art": {
             1: "PNG",
@@ -29,3 +29,22 @@ class MiscUtilities:
             b /= 1024
 
         return unit_str
+
+    @staticmethod
+    def convert_time(ms: int) -> str:
+        """
+        Convert milliseconds to a human-readable string
+        :param ms: Milliseconds
+        :return: String with converted time + unit. e.g. '850 ms', '12.34 s', '2 m 05 s'
+        """
+
+        if ms < 1000:
+            return f"{ms} ms"
+
+        # Below a minute once rounded
+        if ms < 59_995:
+            return f"{ms / 1000:.2f} s"
+
+        minutes, seconds = divmod(round(ms / 1000), 60)
+
+        return f"{minutes} m {seconds:02} s"